@@ -0,0 +1,96 @@
+"""
+Startup cost of the CLI: import time of the entry point measured with python -X importtime in fresh interpreters.
+Transcriber backends (ctranslate2, torch), yt-dlp and the captions API must only be imported once a job needs them,
+the run fails when one of them is imported at startup or the import takes longer than the budget.
+Usage: PYTHONPATH=src python -m benchmarks.bench_import [--module main] [--budget-ms 1000] [--runs 3] [--top 15]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+SRC = Path(__file__).absolute().parent.parent / "src"
+IMPORT_BUDGET_MS = 1000.0  # ~0.4 s on a laptop, one ML stack alone is over a second
+HEAVY_PACKAGES = ("faster_whisper", "ctranslate2", "whisper", "torch", "yt_dlp", "youtube_transcript_api")
+
+
+@dataclass(slots=True)
+class ImportProfile:
+    module: str
+    total_ms: float
+    modules: dict[str, tuple[float, float]] = field(default_factory=dict)  # name -> (self ms, cumulative ms)
+
+    def heavy(self) -> list[str]:
+        return sorted({name.split(".")[0] for name in self.modules} & set(HEAVY_PACKAGES))
+
+    def top(self, amount: int = 15) -> list[tuple[str, float]]:
+        """
+        :return: list of (module, self ms), the slowest first
+        """
+        slowest = sorted(self.modules.items(), key=lambda item: item[1][0], reverse=True)[:amount]
+        return [(name, self_ms) for name, (self_ms, _) in slowest]
+
+
+def _parse(module: str, stderr: str) -> ImportProfile:
+    profile = ImportProfile(module=module, total_ms=0.0)
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        profile.modules[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+        if name.strip() == module:
+            profile.total_ms = int(cumulative_us) / 1000
+    return profile
+
+
+def profile_import(module: str = "main", runs: int = 3) -> ImportProfile:
+    """
+    Imports the module in fresh interpreters, the fastest run is kept: the first one may compile bytecode.
+    :param module: module importable from src
+    :param runs: amount of interpreters to start
+    :return: ImportProfile of the fastest run
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, (str(SRC), os.getenv("PYTHONPATH"))))}
+    profiles = []
+    for _ in range(runs):
+        process = subprocess.run(  # noqa S603
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if process.returncode != 0:
+            raise RuntimeError(f"Unable to import {module}: {process.stderr.strip().splitlines()[-1]}")
+        profiles.append(_parse(module, process.stderr))
+    return min(profiles, key=lambda profile: profile.total_ms)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    profile = profile_import(args.module, args.runs)
+    result = {
+        "module": args.module,
+        "total_ms": profile.total_ms,
+        "budget_ms": args.budget_ms,
+        "heavy_packages": profile.heavy(),
+        "slowest_ms": dict(profile.top(args.top)),
+    }
+    print(json.dumps(result, indent=2))
+    if profile.heavy() or profile.total_ms > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compares single-pass and chunked parallel transcription of a long local file.
+Usage: PYTHONPATH=src python -m benchmarks.bench_long_file <file> [--model small] [--workers 4] [--reference ref.txt]
+Without a reference transcript WER of the chunked result is computed against the single-pass one.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from benchmarks.utils import word_error_rate
+from transcribers.faster_whisper_transcriber import FasterWhisperTranscriber
+from transcribers.long_file import ChunkedTranscriber
+from transcribers.process_pool import ProcessPoolTranscriber
+
+
+async def run(path: Path, model: str, workers: int | None, chunk_seconds: float, reference: str | None) -> dict:
+    start = time.perf_counter()
+    single = FasterWhisperTranscriber(model).transcribe(path)
+    single_seconds = time.perf_counter() - start
+
+    pool = ProcessPoolTranscriber(FasterWhisperTranscriber, model, workers=workers)
+    try:
+        start = time.perf_counter()
+        segments = await ChunkedTranscriber(pool, chunk_seconds=chunk_seconds).transcribe(path)
+        chunked_seconds = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+    chunked = "".join(segment.text for segment in segments)
+
+    reference = reference if reference is not None else single
+    return {
+        "file": path.name,
+        "model": model,
+        "workers": pool.workers,
+        "single_pass_seconds": round(single_seconds, 2),
+        "chunked_seconds": round(chunked_seconds, 2),
+        "speedup": round(single_seconds / chunked_seconds, 2),
+        "single_pass_wer": round(word_error_rate(reference, single), 4),
+        "chunked_wer": round(word_error_rate(reference, chunked), 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-seconds", type=float, default=300.0)
+    parser.add_argument("--reference", type=Path, default=None)
+    args = parser.parse_args()
+
+    reference = args.reference.read_text(encoding="utf-8") if args.reference else None
+    result = asyncio.run(run(args.path, args.model, args.workers, args.chunk_seconds, reference))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
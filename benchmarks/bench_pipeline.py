@@ -0,0 +1,232 @@
+"""
+Offline benchmark of the whole download -> decode -> transcribe -> write pipeline.
+The channel is listed from a local YouTube Data API stub, yt-dlp downloads generated speech-like WAV clips
+of varying length from a local HTTP server, so the numbers do not depend on the network.
+Every model runs in a fresh process: per-stage latency, end-to-end throughput, real-time factor and peak RSS
+are emitted as JSON and compared against a stored baseline, a regression makes the exit code 1.
+The "null" model reads the audio and runs the VAD only, it measures the pipeline overhead without inference.
+Usage: PYTHONPATH=src python -m benchmarks.bench_pipeline [--models null,tiny] [--videos 12]
+    [--clip-seconds 5,30,120] [--baseline benchmarks/baselines/pipeline.json] [--save-baseline] [--tolerance 0.25]
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import resource
+import shutil
+import sys
+import threading
+import time
+import wave
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+
+import numpy as np
+from aiohttp.test_utils import TestServer
+
+from objects import TranscriptionSegment, YouTubeVideo
+from pipeline import TranscriptionPipeline
+from support.http_server import QuietHandler, QuietServer
+from support.youtube_stub import CHANNEL_ID, YouTubeApiStub
+from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import SAMPLE_RATE, AudioSource
+from transcribers.host_profile import host_id
+from transcribers.process_pool import ProcessPoolTranscriber
+from transcribers.registry import get_transcriber
+from transcribers.tuning import reference_clip
+from transcribers.vad import find_speech
+from youtube_workers.youtube_api import YouTubeClient
+from youtube_workers.yt_dlp_loader import YouTubeLoader
+
+BASELINE = Path(__file__).parent / "baselines" / "pipeline.json"
+SHORT_CLIP_SECONDS = 60  # as in main.py: shorter clips are batched when the transcriber supports it
+HIGHER_IS_BETTER = {"videos_per_min", "audio_seconds_per_second"}
+DESCRIPTIVE = {"videos", "audio_seconds", "failed"}  # reported, not compared
+
+
+class NullTranscriber(AbstractTranscriber):
+    """
+    Reads the audio and finds speech in it, as a transcriber does before inference, and yields one segment.
+    """
+
+    def __init__(self, model: str = "null"):
+        self.model = model
+
+    def transcribe_stream(
+        self, path: AudioSource, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        with wave.open(path.__fspath__(), "rb") as file:
+            audio = np.frombuffer(file.readframes(file.getnframes()), dtype="<i2")
+        speech = find_speech(audio, file.getframerate())
+        yield TranscriptionSegment(text=f"{len(speech)} speech regions", start=0.0, end=len(audio) / SAMPLE_RATE)
+
+
+class LocalMediaLoader(YouTubeLoader):
+    def __init__(self, directory: Path, media_urls: dict[str, str]):
+        super().__init__(directory)
+        self.media_urls = media_urls
+
+    def media_url(self, video: YouTubeVideo) -> str:
+        return self.media_urls[video.id]
+
+
+def _peak_rss_mb() -> float:
+    # the largest of this process and its already finished children (process pool workers)
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 2**10, 1)
+
+
+async def _run_model(model: str, videos: int, clip_seconds: list[float], decode: bool) -> dict[str, Any]:
+    stub = YouTubeApiStub(videos=videos)
+    api = TestServer(stub.app)
+    await api.start_server()
+    with TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        (root / "media").mkdir()
+        (root / "out").mkdir()
+        for seconds in set(clip_seconds):
+            reference_clip(root / "media" / f"clip_{seconds:g}.wav", seconds)
+        media = QuietServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=root / "media"))
+        threading.Thread(target=media.serve_forever, daemon=True).start()
+
+        start = time.perf_counter()
+        async with YouTubeClient("stub_key", base_url=str(api.make_url("/youtube/v3"))) as client:
+            listed = [video async for page in client.iter_channel_videos(CHANNEL_ID) for video in page]
+        collect_seconds = time.perf_counter() - start
+
+        durations = {video.id: clip_seconds[i % len(clip_seconds)] for i, video in enumerate(listed)}
+        loader = LocalMediaLoader(
+            root / "out",
+            {
+                video_id: f"http://127.0.0.1:{media.server_port}/clip_{seconds:g}.wav?video={video_id}"
+                for video_id, seconds in durations.items()
+            },
+        )
+        process_pool = None
+        if model == "null":
+            factory, config = NullTranscriber, TranscriptionPipeline.Config(decode=decode, model=model)
+        else:
+            transcriber_cls = get_transcriber("faster-whisper")
+            process_pool = ProcessPoolTranscriber(transcriber_cls, model)
+            factory = functools.partial(transcriber_cls, model=model)
+            config = TranscriptionPipeline.Config(decode=decode, model=model, batch_clip_seconds=SHORT_CLIP_SECONDS)
+        pipeline = TranscriptionPipeline(loader, factory, config, process_pool=process_pool)
+
+        start = time.perf_counter()
+        try:
+            results = await pipeline.run(listed)
+        finally:
+            if process_pool is not None:
+                await process_pool.aclose()
+            media.shutdown()
+            await api.close()
+        wall_seconds = time.perf_counter() - start
+
+    report = pipeline.report()
+    audio_seconds = sum(durations.values())
+    return {
+        "videos": len(listed),
+        "audio_seconds": audio_seconds,
+        "failed": len(listed) - len(results),
+        "collect_seconds": round(collect_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "videos_per_min": round(len(results) / wall_seconds * 60, 2),
+        "audio_seconds_per_second": round(audio_seconds / wall_seconds, 2),
+        # processing seconds of the transcribe stage per audio second
+        "real_time_factor": round(report["transcribe"]["busy_seconds"] / audio_seconds, 4),
+        "stage_latency_ms": {
+            name: round(stage["busy_seconds"] / stage["processed"] * 1000, 1) if stage["processed"] else None
+            for name, stage in report.items()
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_model(model: str, videos: int, clip_seconds: list[float], decode: bool) -> dict[str, Any]:
+    return asyncio.run(_run_model(model, videos, clip_seconds, decode))
+
+
+def run(models: list[str], videos: int, clip_seconds: list[float], decode: bool) -> dict[str, Any]:
+    result: dict[str, Any] = {"host": host_id(), "decode": decode, "clip_seconds": clip_seconds, "models": {}}
+    for model in models:
+        # a fresh process per model: peak RSS and the model pool of one model do not leak into another
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result["models"][model] = executor.submit(run_model, model, videos, clip_seconds, decode).result()
+    return result
+
+
+def _flatten(metrics: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, int | float) and key not in DESCRIPTIVE:
+            flat[f"{prefix}{key}"] = float(value)
+    return flat
+
+
+def compare(result: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """
+    Finds metrics worse than the baseline by more than the tolerance.
+    :param result: output of run()
+    :param baseline: a previous output of run()
+    :param tolerance: allowed relative change, 0.25 - 25%
+    :return: descriptions of the regressions
+    """
+    current, previous = _flatten(result["models"]), _flatten(baseline.get("models", {}))
+    regressions = []
+    for key, old in previous.items():
+        new = current.get(key)
+        if new is None or not old:
+            continue
+        change = (new - old) / old
+        if key.rsplit(".", 1)[-1] in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{key}: {old:g} -> {new:g} ({change:+.0%} worse)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--models", default="null")
+    parser.add_argument("--videos", type=int, default=12)
+    parser.add_argument("--clip-seconds", default="5,30,120")
+    parser.add_argument("--no-decode", action="store_true", help="skip the ffmpeg resampling stage")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    decode = not args.no_decode and shutil.which("ffmpeg") is not None
+    clip_seconds = [float(seconds) for seconds in args.clip_seconds.split(",")]
+    result = run(args.models.split(","), args.videos, clip_seconds, decode)
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+    elif args.baseline.is_file():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("host") != result["host"]:
+            print(f"Baseline was recorded on {baseline.get('host')}, the comparison is indicative only")
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+    else:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to record one")
+
+
+if __name__ == "__main__":
+    main()
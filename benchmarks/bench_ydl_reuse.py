@@ -0,0 +1,85 @@
+"""
+Per-video overhead of yt-dlp downloads: a fresh YoutubeDL per call versus pooled instances and cached metadata.
+A generated WAV file is served by a local HTTP server, so the numbers show client-side overhead only.
+Usage: PYTHONPATH=src python -m benchmarks.bench_ydl_reuse [--videos 50] [--seconds 5]
+"""
+
+import argparse
+import copy
+import functools
+import json
+import threading
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import yt_dlp
+
+from support.http_server import QuietHandler, QuietServer
+from transcribers.audio import SAMPLE_RATE, write_wav
+from youtube_workers.ydl_pool import YdlPool
+
+CONFIG = {"quiet": True, "noprogress": True}
+PROFILE = {"format": "best"}
+
+
+def fresh(urls: list[str], target: Path) -> None:
+    for i, url in enumerate(urls):
+        config = copy.deepcopy(CONFIG)
+        config.update(PROFILE)
+        config["outtmpl"] = f"{target}/fresh_{i}.%(ext)s"
+        with yt_dlp.YoutubeDL(config) as ydl:
+            ydl.download([url])
+
+
+def pooled(pool: YdlPool, urls: list[str], target: Path, name: str) -> None:
+    for i, url in enumerate(urls):
+        pool.download("audio", PROFILE, url, f"{target}/{name}_{i}.%(ext)s")
+
+
+def measure(func: functools.partial, videos: int) -> float:
+    start = time.perf_counter()
+    func()
+    return round((time.perf_counter() - start) / videos * 1000, 2)
+
+
+def run(videos: int, seconds: float) -> dict:
+    with TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        (root / "out").mkdir()
+        audio = np.sin(np.arange(int(seconds * SAMPLE_RATE)) / 10).astype(np.float32) * 0.1
+        write_wav(audio, root / "clip.wav")
+
+        server = QuietServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=tmp_dir))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls = [f"http://127.0.0.1:{server.server_port}/clip.wav?video={i}" for i in range(videos)]
+        pool = YdlPool(CONFIG)
+        try:
+            result = {
+                "videos": videos,
+                "file_seconds": seconds,
+                "fresh_ms_per_video": measure(functools.partial(fresh, urls, root / "out"), videos),
+                "pooled_ms_per_video": measure(functools.partial(pooled, pool, urls, root / "out", "cold"), videos),
+                "pooled_cached_ms_per_video": measure(
+                    functools.partial(pooled, pool, urls, root / "out", "warm"), videos
+                ),
+            }
+        finally:
+            pool.close()
+            server.shutdown()
+    result["speedup"] = round(result["fresh_ms_per_video"] / result["pooled_cached_ms_per_video"], 2)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.videos, args.seconds), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Local load test of the HTTP service (see service.py) with stubbed YouTube endpoints.
+Videos are listed from a local YouTube Data API stub, have no captions and are downloaded by yt-dlp as generated
+speech-like WAV clips from a local HTTP server, the "null" transcriber of bench_pipeline runs in the process pool.
+Concurrent clients submit video jobs, back off on 429 as told by Retry-After and follow their jobs
+over the NDJSON event stream; a share of the jobs asks for videos already submitted by other clients.
+Submission and end-to-end latency percentiles, throughput and rejections are emitted as JSON.
+Usage: PYTHONPATH=src python -m benchmarks.load_service [--jobs 100] [--clients 20] [--duplicates 0.2]
+    [--queue-size 16] [--io-workers 4] [--inference-workers 2] [--pool-workers 2] [--clip-seconds 2]
+"""
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+
+from benchmarks.bench_pipeline import LocalMediaLoader, NullTranscriber
+from objects import YouTubeVideo
+from service import TranscriptionService
+from storage.transcript_cache import TranscriptCache
+from support.http_server import QuietHandler, QuietServer
+from support.youtube_stub import YouTubeApiStub
+from transcribers.process_pool import ProcessPoolTranscriber
+from transcribers.tuning import reference_clip
+from youtube_workers.youtube_api import YouTubeClient
+
+
+class CaptionlessLoader(LocalMediaLoader):
+    """
+    No video has captions: every job goes through the download and inference pools.
+    """
+
+    async def get_captions(self, video: YouTubeVideo, preferred_language: str | None = None) -> tuple[bool, Path]:
+        return False, Path()
+
+
+@dataclass(slots=True)
+class LoadStats:
+    submit_seconds: list[float] = field(default_factory=list)
+    job_seconds: list[float] = field(default_factory=list)
+    statuses: dict[str, int] = field(default_factory=dict)
+    rejected: int = 0
+
+
+def _percentiles(values: list[float]) -> dict[str, float | None]:
+    ordered = sorted(values)
+
+    def at(share: float) -> float | None:
+        return round(ordered[min(len(ordered) - 1, int(share * len(ordered)))] * 1000, 1) if ordered else None
+
+    return {"p50_ms": at(0.5), "p95_ms": at(0.95), "max_ms": at(1.0)}
+
+
+async def _client(session: ClientSession, links: list[str], counter: Any, stats: LoadStats) -> None:  # noqa ANN401
+    for i in counter:
+        if i >= len(links):
+            return
+        start = time.perf_counter()
+        while True:
+            async with session.post("/jobs", json={"video": links[i]}) as response:
+                if response.status != HTTPStatus.TOO_MANY_REQUESTS:
+                    job = await response.json()
+                    break
+                stats.rejected += 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+        stats.submit_seconds.append(time.perf_counter() - start)
+        async with session.get(f"/jobs/{job['id']}/events") as response:
+            async for line in response.content:
+                job = json.loads(line)
+        stats.job_seconds.append(time.perf_counter() - start)
+        stats.statuses[job["status"]] = stats.statuses.get(job["status"], 0) + 1
+
+
+async def _run(  # noqa PLR0913
+    jobs: int,
+    clients: int,
+    duplicates: float,
+    config: TranscriptionService.Config,
+    pool_workers: int,
+    clip_seconds: float,
+) -> dict[str, Any]:
+    stub = YouTubeApiStub(videos=jobs)
+    api = TestServer(stub.app)
+    await api.start_server()
+    process_pool = ProcessPoolTranscriber(NullTranscriber, "null", workers=pool_workers)
+    with TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        (root / "media").mkdir()
+        reference_clip(root / "media" / "clip.wav", clip_seconds)
+        media = QuietServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=root / "media"))
+        threading.Thread(target=media.serve_forever, daemon=True).start()
+
+        # every job is a video link, a share of them repeats a video already asked for
+        rng = random.Random(0)  # noqa S311 a reproducible mix of jobs, not a secret
+        ids = [video["id"] for video in reversed(stub.uploads)]
+        picked = [rng.choice(ids[:i]) if i and rng.random() < duplicates else ids[i] for i in range(jobs)]
+        links = [f"https://www.youtube.com/watch?v={video_id}" for video_id in picked]
+        loader = CaptionlessLoader(
+            root,
+            {video_id: f"http://127.0.0.1:{media.server_port}/clip.wav?video={video_id}" for video_id in ids},
+        )
+        stats = LoadStats()
+        try:
+            async with YouTubeClient("stub_key", base_url=str(api.make_url("/youtube/v3"))) as client:
+                service = TranscriptionService(
+                    root,
+                    client,
+                    loader,
+                    lambda _: process_pool,
+                    cache=TranscriptCache(root / ".cache"),
+                    config=config,
+                )
+                server = TestServer(service.app)
+                await server.start_server()
+                counter = itertools.count()
+                start = time.perf_counter()
+                async with ClientSession(base_url=str(server.make_url("/"))) as session:
+                    await asyncio.gather(*(_client(session, links, counter, stats) for _ in range(clients)))
+                wall_seconds = time.perf_counter() - start
+                await server.close()
+        finally:
+            await process_pool.aclose()
+            media.shutdown()
+            await api.close()
+
+    return {
+        "jobs": jobs,
+        "clients": clients,
+        "unique_videos": len(set(picked)),
+        "statuses": stats.statuses,
+        "rejected": stats.rejected,
+        "wall_seconds": round(wall_seconds, 3),
+        "jobs_per_min": round(jobs / wall_seconds * 60, 2),
+        "submit_latency": _percentiles(stats.submit_seconds),
+        "job_latency": _percentiles(stats.job_seconds),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of jobs repeating a submitted video")
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--io-workers", type=int, default=4)
+    parser.add_argument("--inference-workers", type=int, default=2)
+    parser.add_argument("--pool-workers", type=int, default=2, help="worker processes of the null transcriber")
+    parser.add_argument("--clip-seconds", type=float, default=2.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    config = TranscriptionService.Config(
+        queue_size=args.queue_size,
+        io_workers=args.io_workers,
+        inference_workers=args.inference_workers,
+        models=("null",),
+        retry_after=args.retry_after,
+    )
+    result = asyncio.run(_run(args.jobs, args.clients, args.duplicates, config, args.pool_workers, args.clip_seconds))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
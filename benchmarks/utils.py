@@ -0,0 +1,30 @@
+import re
+
+import numpy as np
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    Word-level Levenshtein distance normalized by the reference length.
+    Rows of the DP table are computed with numpy: insertions are resolved by a running minimum,
+    so transcripts of several hours are compared in seconds.
+    :param reference: expected text
+    :param hypothesis: recognized text
+    :return: WER, 0.0 for identical texts
+    """
+    ref = re.sub(r"[^\w\s]", "", reference.lower()).split()
+    hyp = re.sub(r"[^\w\s]", "", hypothesis.lower()).split()
+    if not ref:
+        return float(bool(hyp))
+
+    vocabulary = {word: i for i, word in enumerate(set(ref) | set(hyp))}
+    hyp_ids = np.array([vocabulary[word] for word in hyp], dtype=np.int64)
+    positions = np.arange(len(hyp) + 1)
+    previous = positions.copy()
+    for i, word in enumerate(ref, start=1):
+        base = np.empty_like(previous)
+        base[0] = i
+        base[1:] = np.minimum(previous[1:] + 1, previous[:-1] + (hyp_ids != vocabulary[word]))
+        previous = np.minimum.accumulate(base - positions) + positions
+
+    return float(previous[-1]) / len(ref)
@@ -1,9 +1,19 @@
+import asyncio
 import os
+from collections import Counter
+from collections.abc import AsyncIterator, Iterator
 from pathlib import Path
 
+import numpy as np
 import pytest
+import pytest_asyncio
+from aiohttp.test_utils import TestServer
 from dotenv import load_dotenv
 
+from objects import TranscriptionSegment, YouTubeVideo
+from support.youtube_stub import YouTubeApiStub
+from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import SAMPLE_RATE
 from youtube_workers.youtube_api import YouTubeClient
 from youtube_workers.yt_dlp_loader import YouTubeLoader
 
@@ -30,6 +40,22 @@ def youtube_api_client(get_env):
     return YouTubeClient(get_env.get("YOUTUBE_API"))
 
 
+@pytest_asyncio.fixture
+async def youtube_stub():
+    stub = YouTubeApiStub()
+    server = TestServer(stub.app)
+    await server.start_server()
+    stub.base_url = str(server.make_url("/youtube/v3"))
+    yield stub
+    await server.close()
+
+
+@pytest_asyncio.fixture
+async def youtube_stub_client(youtube_stub):
+    async with YouTubeClient("stub_key", base_url=youtube_stub.base_url) as client:
+        yield client
+
+
 @pytest.fixture
 def youtube_loader(saving_path):
     return YouTubeLoader(saving_path)
@@ -103,3 +129,121 @@ def youtube_music() -> list[str]:
         "https://www.youtube.com/watch?v=PHf83VFDw6g&t=3235s",
         "https://www.youtube.com/watch?v=KeaRIJd8Z5E&t=4s",
     ]
+
+
+@pytest.fixture
+def fake_videos() -> list[YouTubeVideo]:
+    return [
+        YouTubeVideo(
+            id=f"video{i}",
+            link=None,
+            title=f"Video #{i}",
+            owner_username="owner",
+            published_at=f"2024-01-0{i + 1}T00:00:00Z",
+            channel_id="channel",
+            kind="youtube#video",
+        )
+        for i in range(5)
+    ]
+
+
+class FakeLoader:
+    """
+    YouTubeLoader double of the fake_videos: captions exist for video0 only, audio downloads of video4 fail.
+    Downloads are counted per video and wait for the gate, in-memory audio of video<i> lasts i + 1 seconds.
+    """
+
+    prepare_title = staticmethod(YouTubeLoader.prepare_title)
+
+    def __init__(self, directory: Path):
+        self.dir = directory
+        self.captioned = {"video0"}
+        self.fail_ids = {"video4"}
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.downloads: Counter[str] = Counter()
+
+    async def get_captions(self, video: YouTubeVideo, preferred_language: str | None = None) -> tuple[bool, Path]:
+        path_ = self.dir / f"{video.id}.txt"
+        if video.id not in self.captioned:
+            return False, path_
+        path_.write_text("captions", encoding="utf-8")
+        return True, path_
+
+    async def iter_captions(
+        self, videos: list[YouTubeVideo], concurrency: int = 10
+    ) -> AsyncIterator[tuple[YouTubeVideo, bool, Path]]:
+        for video in videos:
+            yield video, *await self.get_captions(video)
+
+    async def download_audio(self, video: YouTubeVideo, for_transcription: bool = False) -> tuple[bool, Path]:
+        self.downloads[video.id] += 1
+        await self.gate.wait()
+        if video.id in self.fail_ids:
+            return False, Path()
+        path_ = self.dir / f"{video.id}.opus"
+        path_.write_bytes(b"audio")
+        return True, path_
+
+    async def load_audio(self, video: YouTubeVideo) -> tuple[bool, np.ndarray | None]:
+        self.downloads[video.id] += 1
+        if video.id in self.fail_ids:
+            return False, None
+        return True, np.zeros(SAMPLE_RATE * (int(video.id[-1]) + 1), dtype=np.float32)
+
+
+class FakeProcessPool:
+    """
+    ProcessPoolTranscriber double, the transcript of <name>.<ext> is "text of <name>".
+    """
+
+    workers = 1
+    batching = True
+
+    def __init__(self):
+        self.transcribed: list[str] = []
+        self.batch_sizes: list[int] = []
+        self.batch_durations: list[float] = []
+
+    async def detect_language(self, path: Path) -> tuple[str | None, float]:
+        return "en", 1.0
+
+    async def transcribe_to_file(
+        self, path: Path, target: Path, duration: float | None = None, language: str | None = None
+    ) -> tuple[int, float]:
+        self.transcribed.append(path.name)
+        target.write_text(f"text of {path.stem}", encoding="utf-8")
+        return 1, 0.0
+
+    async def transcribe_batch(
+        self, clips: list[tuple[YouTubeVideo, Path]], duration: float | None = None
+    ) -> list[tuple[YouTubeVideo, list[TranscriptionSegment]]]:
+        self.batch_sizes.append(len(clips))
+        self.batch_durations.append(duration or 0.0)
+        return [(video, [TranscriptionSegment(text=video.id, start=0.0, end=1.0)]) for video, _ in clips]
+
+
+class FakeTranscriber(AbstractTranscriber):
+    """
+    The transcript of a file is its name without the extension.
+    """
+
+    def transcribe_stream(
+        self, path: Path, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        yield TranscriptionSegment(text=path.stem, start=0.0, end=1.0)
+
+
+@pytest.fixture
+def fake_loader(tmp_path) -> FakeLoader:
+    return FakeLoader(tmp_path)
+
+
+@pytest.fixture
+def fake_process_pool() -> FakeProcessPool:
+    return FakeProcessPool()
+
+
+@pytest.fixture
+def fake_transcriber() -> type[FakeTranscriber]:
+    return FakeTranscriber
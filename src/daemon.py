@@ -0,0 +1,151 @@
+import asyncio
+import os
+import signal
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+
+from aiohttp import ClientConnectionError, ClientSession, ClientTimeout, UnixConnector
+from loguru import logger
+
+from objects import Job, JobResult
+
+DAEMON_SOCKET = Path(
+    os.getenv("TRANSCRIBER_SOCKET", Path(tempfile.gettempdir()) / f"youtube-transcriber-{os.getuid()}.sock")
+)
+HEALTH_TIMEOUT = 1.0  # a daemon slower than this to answer is treated as not running
+
+
+class DaemonServer:
+    """
+    Long-running process serving CLI jobs, so models, worker processes and caches stay warm between runs.
+    Jobs are posted as JSON to /jobs over a Unix domain socket accessible by its owner only,
+    the response comes when the job is done and carries its processing time.
+    A failed job is reported to its client, the daemon keeps serving.
+    internal settings: socket path
+    """
+
+    def __init__(self, handler: Callable[[Job], Awaitable[None]], socket_path: Path = DAEMON_SOCKET):
+        self.handler = handler
+        self.socket_path = socket_path
+        self.started_at = time.monotonic()
+        self.jobs = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self._runner: Any = None
+
+    async def run_job(self, job: Job) -> JobResult:
+        start = time.perf_counter()
+        try:
+            await self.handler(job)
+            result = JobResult(ok=True, seconds=time.perf_counter() - start)
+        except Exception as error:  # noqa BLE001 a failed job must not stop the daemon
+            logger.exception(f"Job {job} failed")
+            result = JobResult(ok=False, seconds=time.perf_counter() - start, error=repr(error))
+            self.failed += 1
+        self.jobs += 1
+        self.busy_seconds += result.seconds
+        logger.info(f"Job {job.mode} done in {result.seconds:.2f}s, ok: {result.ok}")
+        return result
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            "jobs": self.jobs,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+    async def start(self) -> None:
+        from aiohttp import web  # noqa PLC0415 the server side of aiohttp is only needed by the daemon
+
+        if self.socket_path.exists():
+            if await DaemonClient(self.socket_path).alive():
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+            self.socket_path.unlink()  # left by a killed daemon
+
+        async def health(_: web.Request) -> web.Response:
+            return web.json_response(self.health())
+
+        async def submit(request: web.Request) -> web.Response:
+            try:
+                job = Job(**await request.json())
+            except (TypeError, ValueError) as error:
+                return web.json_response({"error": f"Invalid job: {error}"}, status=HTTPStatus.BAD_REQUEST)
+            return web.json_response(asdict(await self.run_job(job)))
+
+        app = web.Application()
+        app.router.add_get("/health", health)
+        app.router.add_post("/jobs", submit)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        # the socket is created owner-only, a chmod after bind() would leave it open to others for a moment
+        umask = os.umask(0o177)
+        try:
+            await web.UnixSite(self._runner, str(self.socket_path)).start()
+        finally:
+            os.umask(umask)
+        logger.info(f"Daemon listening on {self.socket_path}")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        self.socket_path.unlink(missing_ok=True)
+        logger.info(f"Daemon stopped: {self.health()}")
+
+    async def serve_forever(self) -> None:
+        """
+        Serves jobs until SIGINT or SIGTERM.
+        :return: None
+        """
+        await self.start()
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_ in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_, stopped.set)
+        try:
+            await stopped.wait()
+        finally:
+            for signal_ in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signal_)
+            await self.stop()
+
+
+class DaemonClient:
+    """
+    Client side of DaemonServer, the CLI uses it when a daemon is running.
+    internal settings: socket path
+    """
+
+    def __init__(self, socket_path: Path = DAEMON_SOCKET):
+        self.socket_path = socket_path
+
+    def _session(self, timeout: float | None) -> ClientSession:
+        return ClientSession(connector=UnixConnector(path=str(self.socket_path)), timeout=ClientTimeout(total=timeout))
+
+    async def alive(self) -> bool:
+        if not self.socket_path.exists():
+            return False
+        try:
+            async with self._session(HEALTH_TIMEOUT) as session, session.get("http://daemon/health") as response:
+                return response.status == HTTPStatus.OK
+        except (ClientConnectionError, TimeoutError, OSError):
+            return False
+
+    async def submit(self, job: Job) -> JobResult:
+        """
+        Runs the job in the daemon and waits for it, however long it takes.
+        :param job: Job to run
+        :return: JobResult reported by the daemon
+        """
+        async with self._session(None) as session, session.post("http://daemon/jobs", json=asdict(job)) as response:
+            data = await response.json()
+            if response.status == HTTPStatus.BAD_REQUEST:
+                raise ValueError(data["error"])
+        return JobResult(**data)
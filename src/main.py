@@ -1,20 +1,57 @@
+import argparse
 import asyncio
+import functools
+import hashlib
+import json
 import os
+import signal
+import sys
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import replace
 from pathlib import Path
 
 from dotenv import load_dotenv
 from loguru import logger
 
-from objects import DownloadOptions, YouTubeVideo
+from daemon import DAEMON_SOCKET, DaemonClient, DaemonServer
+from metrics import metrics
+from objects import BatchSpec, DownloadOptions, Job, JobResult, YouTubeVideo
+from pipeline import TranscriptionPipeline
+from storage.audio_store import AudioStore
+from storage.job_journal import DONE_STATES, JobJournal, VideoState
+from storage.language_cache import LanguageCache
+from storage.transcript_cache import TranscriptCache
+from storage.work_store import ROLES, SqliteWorkStore, UnitKind, WorkStore
 from transcribers.abscract import AbstractTranscriber
-from transcribers.faster_whisper_transcriber import FasterWhisperTranscriber
+from transcribers.audio import AudioSource
+from transcribers.long_file import ChunkedTranscriber
+from transcribers.process_pool import ProcessPoolTranscriber
+from transcribers.registry import get_transcriber
+from transcribers.transcript_writer import TranscriptWriter
+from worker import NodeWorker, download_unit
+from youtube_workers.channel_manifest import ManifestStore
+from youtube_workers.rate_governor import RequestGovernor
 from youtube_workers.youtube_api import YouTubeClient
 from youtube_workers.yt_dlp_loader import YouTubeLoader
 
 # TODO добавление через config
 WHISPER_MODEL = "small"
 SAVING_FOLDER = "saved_files"
-TRANSCRIBER: type[AbstractTranscriber] = FasterWhisperTranscriber
+CACHE_FOLDER = ".cache"
+MANIFEST_FOLDER = ".manifests"
+LANGUAGE_FOLDER = ".languages"
+JOURNAL_FILE = ".jobs.sqlite"  # job journal of the batch runs
+WORK_STORE_FILE = ".work.sqlite"  # work units shared by the nodes, media is saved next to it
+CHANNEL_LANGUAGE_VOTES = 5  # detected videos of a channel after which its majority language is used for the rest
+CACHE_MAX_BYTES = 1 << 30
+TRANSCRIBER = "faster-whisper"  # backend name, imported only when a transcription is scheduled
+TRANSCRIPTION_PROCESSES: int | None = None  # None - split all CPU cores between worker processes automatically
+LONG_FILE_SECONDS = 30 * 60  # longer files are split at silences and transcribed in parallel chunks
+CAPTIONS_CONCURRENCY = 10  # simultaneous caption requests in TEXT mode
+SHORT_CLIP_SECONDS = 60  # shorter files (e.g. shorts) are transcribed in batches
+METRICS_DUMP_SECONDS = 30.0
 
 
 def get_env() -> dict[str, str]:
@@ -32,28 +69,48 @@ def make_save_dir() -> Path:
     return dir_
 
 
-async def collect_videos() -> list[YouTubeVideo | None]:
-    client = YouTubeClient(get_env().get("YOUTUBE_API"))  # TODO change to config
+def make_cache(save_dir: Path, force: bool = False) -> TranscriptCache:
+    return TranscriptCache(save_dir / CACHE_FOLDER, max_bytes=CACHE_MAX_BYTES, force=force)
 
-    videos = []
+
+def make_languages(save_dir: Path) -> LanguageCache:
+    return LanguageCache(save_dir / LANGUAGE_FOLDER, channel_votes=CHANNEL_LANGUAGE_VOTES)
+
+
+def prompt_links() -> tuple[str | None, list[str]]:
     channel_link = input(
         """You can enter a channel link to collect all videos from a channel, """
         """or press enter to proceed with simple links:\n"""
     )
     if "youtube.com" in channel_link:
-        channel_id = await client.get_channel_id_by_link(channel_link)
-        if channel_id:
-            amount, videos = await client.get_channel_videos(channel_id)
-            logger.info(f"Collected {amount} videos from channel {channel_id}")
-    else:
-        print("Please provide YouTube video links each on new line and press enter:")
+        return channel_link.strip(), []
+    print("Please provide YouTube video links each on new line and press enter:")
+    links = []
+    link = input()
+    while link != "":
+        if "youtube.com" in link:
+            links.append(link.strip())
         link = input()
-        while link != "":
-            if "youtube.com" in link:
-                video = await client.get_video_by_link(link.strip())
-                if video:
-                    videos.append(video)
-            link = input()
+    return None, links
+
+
+async def collect_videos(
+    channel_link: str | None,
+    links: list[str],
+    manifests: ManifestStore | None = None,
+    governor: RequestGovernor | None = None,
+) -> list[YouTubeVideo | None]:
+    videos = []
+    async with YouTubeClient(get_env().get("YOUTUBE_API"), governor=governor) as client:  # TODO change to config
+        if channel_link:
+            channel_id = await client.get_channel_id_by_link(channel_link)
+            if channel_id:
+                manifest = manifests.load(channel_id) if manifests else None
+                async for page in client.iter_channel_videos(channel_id, manifest):
+                    videos.extend(page)
+                logger.info(f"Collected {len(videos)} videos from channel {channel_id}")
+        elif links:
+            videos, _ = await client.get_videos_by_links(links)
     return videos
 
 
@@ -76,87 +133,604 @@ def menu() -> DownloadOptions:
         print("Sorry, you entered a wrong option")
 
 
-def transcriber_saver(transcriber: AbstractTranscriber, file_path: Path) -> None:
+def transcriber_saver(
+    transcriber: AbstractTranscriber,
+    file_path: Path,
+    stream: bool = True,
+    audio: AudioSource | None = None,
+    language: str | None = None,
+) -> None:
     """
     Checks the save_dir, launches transcription process, saves the result in .txt
     :param transcriber: current class
     :param file_path: source file path
+    :param stream: write segments to the file as they come, resume an interrupted run if any
+    :param audio: decoded audio of the file, the file itself is transcribed by default
+    :param language: spoken language of the file, detected by the model when not given
     :return: None
     """
     if not file_path.is_file():
         logger.error(f"File does not exist: {file_path}")
         raise FileNotFoundError(f"{file_path} not found")
 
-    result = transcriber.transcribe(path=file_path)
     target_file = file_path.with_suffix(".txt")
+    source = file_path if audio is None else audio
 
     try:
-        with target_file.open(mode="w") as file:
-            file.write(result)
+        if stream:
+            writer = TranscriptWriter(target_file)
+            start, offset = writer.resume_point()
+            if start:
+                logger.info(f"Resuming transcription of {file_path} from {start:.2f}s")
+            writer.write(transcriber.transcribe_stream(path=source, start=start, language=language), offset=offset)
+        else:
+            result = transcriber.transcribe(path=source, language=language)
+            with target_file.open(mode="w") as file:
+                file.write(result)
         logger.info(f"Transcription saved\ntitle: {target_file}\n")
     except OSError as err:
         logger.error(f"Unable to save transcription to {target_file}")
         raise OSError("Failed to save transcription") from err
 
 
-async def process_links(save_dir: Path, videos: list[YouTubeVideo]) -> None:
+def make_process_pool(model: str = WHISPER_MODEL) -> ProcessPoolTranscriber:
+    return ProcessPoolTranscriber(get_transcriber(TRANSCRIBER), model, workers=TRANSCRIPTION_PROCESSES)
+
+
+async def transcribe_long_file(
+    file_path: Path,
+    store: AudioStore,
+    languages: LanguageCache,
+    process_pool: ProcessPoolTranscriber | None = None,
+    model: str = WHISPER_MODEL,
+) -> None:
+    """
+    Transcribes a long file in parallel chunks split at silence boundaries, saves the result in .txt
+    :param file_path: source file path
+    :param store: decoded audio store
+    :param languages: language cache, the language is detected once per file
+    :param process_pool: warm worker processes of the model, a pool is started for this file when not given
+    :param model: Whisper model
+    :return: None
+    """
+    own_pool = process_pool is None
+    process_pool = process_pool or make_process_pool(model)
+    try:
+        segments = await ChunkedTranscriber(process_pool, store=store, languages=languages).transcribe(file_path)
+    finally:
+        if own_pool:
+            await process_pool.aclose()
+    target_file = file_path.with_suffix(".txt")
+    TranscriptWriter(target_file).write(segments)
+    logger.info(f"Transcription saved\ntitle: {target_file}\n")
+
+
+async def process_file(  # noqa PLR0913
+    file_path: Path,
+    cache: TranscriptCache,
+    languages: LanguageCache,
+    process_pool: ProcessPoolTranscriber | None = None,
+    model: str = WHISPER_MODEL,
+    store: AudioStore | None = None,
+) -> None:
+    """
+    Transcribes a local file, long files go to the parallel chunked mode
+    :param file_path: source file path
+    :param cache: transcript cache, looked up by the file content hash
+    :param languages: language cache, the language is detected once per file
+    :param process_pool: warm worker processes of the model for long files, started for the file when not given
+    :param model: Whisper model
+    :param store: decoded audio store, float32 PCM by default
+    :return: None
+    """
+    if not file_path.is_file():
+        logger.error(f"File does not exist: {file_path}")
+        raise FileNotFoundError(f"{file_path} not found")
+
+    cache_key = await asyncio.to_thread(TranscriptCache.key_for_file, file_path, model)
+    if cache.copy_to(cache_key, file_path.with_suffix(".txt")):
+        return
+    # decoded once, kept next to the file for re-runs, e.g. with another model
+    store = store or AudioStore()
+    audio = await asyncio.to_thread(store.open, file_path)
+    if audio.duration > LONG_FILE_SECONDS:
+        await transcribe_long_file(file_path, store, languages, process_pool, model)
+    else:
+        # the model stays in the model pool, a daemon reuses it for the next file
+        transcriber = get_transcriber(TRANSCRIBER)(model)
+        # float32 in [-1, 1] whatever the store dtype: zero-copy for float32 stores, converted once for int16 ones
+        samples = await asyncio.to_thread(audio.slice, 0)
+        language_key = LanguageCache.key_for_file(file_path)
+        language = languages.get(language_key)
+        if language is None:
+            language = languages.put(language_key, *await asyncio.to_thread(transcriber.detect_language, samples))
+        await asyncio.to_thread(transcriber_saver, transcriber, file_path, audio=samples, language=language)
+    cache.put(cache_key, file_path.with_suffix(".txt"))
+
+
+async def videos_without_captions(
+    loader: YouTubeLoader,
+    videos: list[YouTubeVideo],
+    journal: JobJournal | None = None,
+    captioned: set[str] | None = None,
+) -> AsyncIterator[YouTubeVideo]:
     """
-    Tries to get captions by YT video link, in case of fail tries to transcribe loaded audio file to text
+    Fetches captions concurrently, yields videos without captions as soon as this is known
+    :param loader: YouTubeLoader instance
+    :param videos: list of videos
+    :param journal: batch journal, videos with captions are journaled as captioned
+    :param captioned: ids of the videos with captions are added to this set
+    :return: async generator of YouTubeVideo to transcribe
+    """
+    async for video, success, _ in loader.iter_captions(videos, concurrency=CAPTIONS_CONCURRENCY):
+        if not success:
+            yield video
+            continue
+        if journal is not None:
+            journal.mark(video.id, VideoState.CAPTIONED)
+        if captioned is not None:
+            captioned.add(video.id)
+
+
+async def process_links(  # noqa PLR0913
+    save_dir: Path,
+    videos: Iterable[YouTubeVideo] | AsyncIterable[YouTubeVideo],
+    cache: TranscriptCache | None = None,
+    governor: RequestGovernor | None = None,
+    languages: LanguageCache | None = None,
+    process_pool: ProcessPoolTranscriber | None = None,
+    model: str = WHISPER_MODEL,
+    journal: JobJournal | None = None,
+    in_memory: bool = False,
+) -> set[str]:
+    """
+    Downloads audio of the videos and transcribes it to text, transcription starts as soon as the first file lands
     :param save_dir: directory to save the transcribed videos
-    :param videos: list of links
+    :param videos: videos to transcribe, possibly produced on the fly
+    :param cache: transcript cache, looked up by the video id
+    :param governor: request governor shared with other YouTube calls
+    :param languages: language cache, languages are detected once per video or channel
+    :param process_pool: warm worker processes of the model, a pool is started for the run when not given
+    :param model: Whisper model
+    :param journal: batch journal of the video states
+    :param in_memory: decode audio in memory and transcribe it in this process, the process pool is not used
+    :return: ids of the videos with a saved transcript
+    """
+    own_pool = process_pool is None
+    process_pool = process_pool or make_process_pool(model)
+    pipeline = TranscriptionPipeline(
+        YouTubeLoader(save_dir, governor=governor),
+        lambda: get_transcriber(TRANSCRIBER)(model=model),
+        TranscriptionPipeline.Config(batch_clip_seconds=SHORT_CLIP_SECONDS, model=model, in_memory=in_memory),
+        process_pool=process_pool,
+        cache=cache,
+        languages=languages,
+        journal=journal,
+    )
+    try:
+        await pipeline.run(videos)
+    finally:
+        if own_pool:
+            await process_pool.aclose()
+    return pipeline.transcribed
+
+
+@asynccontextmanager
+async def metrics_export(port: int | None = None, dump_path: Path | None = None) -> AsyncIterator[None]:
+    """
+    Enables metrics for the run when they are exported: served on the port and/or dumped to a JSON file.
+    :param port: port of the /metrics endpoint
+    :param dump_path: JSON file rewritten every METRICS_DUMP_SECONDS and at the end of the run
+    """
+    if port is None and dump_path is None:
+        yield
+        return
+    metrics.enable()
+    runner = await metrics.serve(port=port) if port is not None else None
+    dumper = asyncio.create_task(metrics.dump_periodically(dump_path, METRICS_DUMP_SECONDS)) if dump_path else None
+    try:
+        yield
+    finally:
+        if dumper is not None:
+            dumper.cancel()
+            await asyncio.gather(dumper, return_exceptions=True)
+            logger.info(f"Metrics dumped to {dump_path}")
+        if runner is not None:
+            await runner.cleanup()
+
+
+class Workspace:
+    """
+    State shared by the jobs of a run, or of all jobs of a daemon: caches, the request governor with its quota
+    and the transcription worker processes, started on the first transcription and kept with their models.
+    internal settings: saving directory
+    """
+
+    def __init__(self, directory: Path, force: bool = False):
+        self.directory = directory
+        self.cache = make_cache(directory, force=force)
+        self.languages = make_languages(directory)
+        self.governor = RequestGovernor()
+        self._process_pools: dict[str, ProcessPoolTranscriber] = {}
+
+    def process_pool(self, model: str = WHISPER_MODEL) -> ProcessPoolTranscriber:
+        if model not in self._process_pools:
+            self._process_pools[model] = make_process_pool(model)
+        return self._process_pools[model]
+
+    async def close(self) -> None:
+        for process_pool in self._process_pools.values():
+            await process_pool.aclose()
+        self._process_pools.clear()
+
+
+async def run_job(job: Job, workspace: Workspace) -> None:
+    """
+    Runs a job in this process, with the warm state of the workspace.
+    :param job: Job to run
+    :param workspace: Workspace of the run or of the daemon
     :return: None
     """
-    loader = YouTubeLoader(save_dir)
-    tasks_to_download = []
-    for video in videos:
-        tasks_to_download.append(asyncio.create_task(loader.download_audio(video)))
+    model = job.model or WHISPER_MODEL
+    cache = workspace.cache.bypassed() if job.force else workspace.cache
+    if job.mode == "batch":
+        # flags of the CLI run switch the options on for the whole batch
+        spec = BatchSpec.load(Path(job.path))
+        spec = replace(spec, force=spec.force or job.force, in_memory=spec.in_memory or job.in_memory)
+        await run_batch(spec, workspace)
+        return
+    if job.mode == "file":
+        await process_file(Path(job.path), cache, workspace.languages, workspace.process_pool(model), model)
+        return
+    option = DownloadOptions[job.mode.upper()]
+    governor = workspace.governor
+    manifests = ManifestStore(workspace.directory / MANIFEST_FOLDER) if job.incremental else None
+    videos = await collect_videos(job.channel, job.links, manifests, governor)
+    if not videos:
+        logger.warning("No videos found for the job")
+        return
+    loader = YouTubeLoader(workspace.directory, cache=cache, governor=governor, languages=workspace.languages)
+    done: set[str] = set()  # ids of the videos saved by the job
+    if option == DownloadOptions.TEXT:
+        done |= await process_links(
+            workspace.directory,
+            videos_without_captions(loader, videos, captioned=done),
+            cache,
+            governor,
+            workspace.languages,
+            workspace.process_pool(model),
+            model,
+            in_memory=job.in_memory,
+        )
+    elif option == DownloadOptions.VIDEO:
+        for video in videos:
+            success, _ = await loader.download_video(video, required_height=job.quality)
+            if success:
+                done.add(video.id)
+    elif option == DownloadOptions.AUDIO:
+        for video in videos:
+            success, _ = await loader.download_audio(video)
+            if success:
+                done.add(video.id)
+    if manifests:
+        # failed videos stay in the manifest, the next incremental run retries them
+        manifests.commit(failed=[video for video in videos if video.id not in done])
+    logger.info(f"YouTube requests: {governor.report()}")
 
-    download_results = await asyncio.gather(*tasks_to_download, return_exceptions=True)
 
-    transcriber = None
-    for success, path_ in download_results:
+async def run_batch(spec: BatchSpec, workspace: Workspace) -> dict[str, int]:
+    """
+    Runs a headless batch, resumable after a crash or a stop: collected sources and the state of every video
+    are kept in the job journal, finished videos are skipped and failed ones are retried
+    until they fail spec.max_attempts times, counted across restarts.
+    :param spec: BatchSpec to run
+    :param workspace: Workspace of the run or of the daemon
+    :return: amount of videos per state
+    """
+    cache = workspace.cache.bypassed() if spec.force else workspace.cache
+    journal = JobJournal(workspace.directory / JOURNAL_FILE, spec.name)
+    try:
+        sources = [(channel, channel, []) for channel in spec.channels]
+        if spec.links:
+            digest = hashlib.sha256("\n".join(sorted(spec.links)).encode()).hexdigest()[:16]
+            sources.append((f"links:{digest}", None, spec.links))
+        for source, channel_link, links in sources:
+            if journal.collected(source):
+                continue
+            videos = await collect_videos(channel_link, links, governor=workspace.governor)
+            if videos:
+                journal.add_source(source, videos)
+            else:
+                logger.warning(f"No videos collected from {source}, it is collected again on the next run")
+
+        loader = YouTubeLoader(
+            workspace.directory, cache=cache, governor=workspace.governor, languages=workspace.languages
+        )
+        # every round finishes or fails each pending video once, failures run out of attempts
+        for _ in range(spec.max_attempts):
+            pending = journal.pending(DONE_STATES[spec.mode], spec.max_attempts)
+            if not pending:
+                break
+            logger.info(f"Batch {spec.name}: {len(pending)} videos to process, {journal.counts()}")
+            if spec.mode == "text":
+                await _transcribe_batch(pending, loader, cache, workspace, spec, journal)
+            else:
+                await _download_batch(spec, [video for video, _ in pending], loader, journal)
+        counts = journal.counts()
+    finally:
+        journal.close()
+    logger.info(f"Batch {spec.name} finished: {counts}, YouTube requests: {workspace.governor.report()}")
+    return counts
+
+
+async def _transcribe_batch(  # noqa PLR0913
+    pending: list[tuple[YouTubeVideo, VideoState]],
+    loader: YouTubeLoader,
+    cache: TranscriptCache,
+    workspace: Workspace,
+    spec: BatchSpec,
+    journal: JobJournal,
+) -> None:
+    model = spec.model or WHISPER_MODEL
+    # videos past the captions step (downloaded, failed) go straight to transcription
+    queued = [video for video, state in pending if state == VideoState.QUEUED]
+    retried = [video for video, state in pending if state != VideoState.QUEUED]
+
+    async def videos() -> AsyncIterator[YouTubeVideo]:
+        for video in retried:
+            yield video
+        async for video in videos_without_captions(loader, queued, journal):
+            yield video
+
+    await process_links(
+        workspace.directory,
+        videos(),
+        cache,
+        workspace.governor,
+        workspace.languages,
+        workspace.process_pool(model),
+        model,
+        journal,
+        in_memory=spec.in_memory,
+    )
+
+
+async def _download_batch(
+    spec: BatchSpec, videos: list[YouTubeVideo], loader: YouTubeLoader, journal: JobJournal
+) -> None:
+    for video in videos:
+        if spec.mode == "video":
+            success, _ = await loader.download_video(video, required_height=spec.quality)
+        else:
+            success, _ = await loader.download_audio(video)
         if success:
-            if not transcriber:
-                transcriber = TRANSCRIBER(model=WHISPER_MODEL)
-            logger.info("Create new thread for transcription")
-            await asyncio.get_running_loop().run_in_executor(None, transcriber_saver, transcriber, path_)
-            path_.unlink(missing_ok=True)
+            journal.mark(video.id, VideoState.DOWNLOADED)
+        else:
+            journal.mark(video.id, VideoState.FAILED, f"{spec.mode} download failed")
+
 
+async def enqueue_batch(spec: BatchSpec, store: WorkStore) -> int:
+    """
+    Collects the videos of a batch and queues a download unit per video for the worker nodes.
+    Videos already queued in the batch keep their state, so a spec can be enqueued again with new sources.
+    :param spec: BatchSpec of the "text" mode
+    :param store: shared WorkStore
+    :return: amount of newly queued videos
+    """
+    if spec.mode != "text":
+        raise ValueError(f"Only text batches are distributed, got {spec.mode}")
+    governor = RequestGovernor()
+    videos = []
+    for channel in spec.channels:
+        videos.extend(await collect_videos(channel, [], governor=governor))
+    if spec.links:
+        videos.extend(await collect_videos(None, spec.links, governor=governor))
+    return store.add_units(spec.name, UnitKind.DOWNLOAD, [download_unit(video) for video in videos if video])
 
-async def main() -> None:
-    directory: Path = make_save_dir()
 
+async def run_node(role: str, store_path: Path, exit_when_idle: bool = False) -> dict[str, int]:
+    """
+    Runs a worker node of a multi-host run until SIGINT or SIGTERM, or until no work is left with exit_when_idle.
+    Audio and transcripts are saved next to the store, on the filesystem shared by the nodes,
+    the caches of the node stay in its local saving directory.
+    :param role: a ROLES key: "download", "inference" or "all"
+    :param store_path: SQLite work store on the shared filesystem
+    :param exit_when_idle: stop once no unit this node may still get is left
+    :return: amount of processed, failed and lost units
+    """
+    workspace = Workspace(make_save_dir())
+    store = SqliteWorkStore(store_path)
+    loader = YouTubeLoader(
+        store_path.parent, cache=workspace.cache, governor=workspace.governor, languages=workspace.languages
+    )
+    process_pool = workspace.process_pool(WHISPER_MODEL) if UnitKind.TRANSCRIBE in ROLES[role] else None
+    node = NodeWorker(
+        store,
+        loader,
+        process_pool,
+        workspace.cache,
+        workspace.languages,
+        NodeWorker.Config(role=role, model=WHISPER_MODEL, exit_when_idle=exit_when_idle),
+    )
+    loop = asyncio.get_running_loop()
+    for signal_ in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_, node.stop)
+    try:
+        return await node.run()
+    finally:
+        for signal_ in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signal_)
+        store.close()
+        await workspace.close()
+
+
+def prompt_job(force: bool = False, incremental: bool = False, in_memory: bool = False) -> Job | None:
     chooser = input("Please choose the mode: 1 - file, 2 - youtube\n")
 
     if chooser == "1":
         logger.info("File mode chosen")
+        directory = make_save_dir()
         source_filename = input(f"please place file in {directory} and write a filename:\n")
         logger.info(f"Source file name is: {source_filename}")
-        transcriber = TRANSCRIBER(WHISPER_MODEL)
-        transcriber_saver(transcriber, directory / source_filename)
-    elif chooser == "2":
-        videos = await collect_videos()
-        if not videos:
+        return Job(mode="file", path=str(directory / source_filename), force=force)
+    if chooser == "2":
+        channel_link, links = prompt_links()
+        if not channel_link and not links:
             print(">> You did not enter any link! <<")
-            return
+            return None
         menu_opt = menu()
-        loader = YouTubeLoader(directory)
-        if menu_opt == DownloadOptions.TEXT:
-            remained_videos = []
-            for video in videos:
-                result, path_ = await loader.get_captions(video)
-                if not result:
-                    remained_videos.append(video)
-            if remained_videos:
-                await process_links(directory, remained_videos)
-        elif menu_opt == DownloadOptions.VIDEO:
-            quality = int(input("Enter a quality e.g. 720: "))
-            for video in videos:
-                await loader.download_video(video, required_height=quality)
-        elif menu_opt == DownloadOptions.AUDIO:
-            for video in videos:
-                await loader.download_audio(video)
+        if menu_opt == DownloadOptions.EXIT:
+            return None
+        quality = int(input("Enter a quality e.g. 720: ")) if menu_opt == DownloadOptions.VIDEO else None
+        return Job(
+            mode=menu_opt.name.lower(),
+            channel=channel_link,
+            links=links,
+            quality=quality,
+            force=force,
+            incremental=incremental,
+            in_memory=in_memory,
+        )
+    return None
+
+
+async def submit_job(job: Job, client: DaemonClient | None = None) -> JobResult:
+    """
+    Runs the job in the daemon when one is running, in this process otherwise.
+    :param job: Job to run
+    :param client: DaemonClient of the daemon socket, None - always run in this process
+    :return: JobResult
+    """
+    start = time.perf_counter()
+    if client is not None and await client.alive():
+        result = await client.submit(job)
+        logger.info(
+            f"Job {job.mode} done by the daemon in {result.seconds:.2f}s, "
+            f"{time.perf_counter() - start:.2f}s with the round trip, ok: {result.ok}"
+        )
+        return result
+    workspace = Workspace(make_save_dir(), force=job.force)
+    try:
+        await run_job(job, workspace)
+    finally:
+        await workspace.close()
+    result = JobResult(ok=True, seconds=time.perf_counter() - start)
+    logger.info(f"Job {job.mode} done in this process in {result.seconds:.2f}s")
+    return result
+
+
+async def serve(socket_path: Path) -> None:
+    """
+    Runs the daemon: jobs of the CLI are served with a warm transcriber until SIGINT or SIGTERM.
+    :param socket_path: Unix socket to listen on
+    :return: None
+    """
+    workspace = Workspace(make_save_dir())
+    get_transcriber(TRANSCRIBER)  # the backend import is paid once, before the first job
+    daemon = DaemonServer(functools.partial(run_job, workspace=workspace), socket_path)
+    try:
+        await daemon.serve_forever()
+    finally:
+        await workspace.close()
+
+
+async def serve_http(port: int) -> None:
+    """
+    Runs the HTTP service: jobs are submitted over HTTP and served with a warm transcriber until SIGINT or SIGTERM.
+    :param port: TCP port to listen on
+    :return: None
+    """
+    from service import TranscriptionService  # noqa PLC0415 the aiohttp server is only needed by the service
+
+    workspace = Workspace(make_save_dir())
+    get_transcriber(TRANSCRIBER)
+    config = TranscriptionService.Config(port=port, models=(WHISPER_MODEL,), long_file_seconds=LONG_FILE_SECONDS)
+    # the loader threads are the network pool of the service: io_workers caption requests and as many downloads
+    loader = YouTubeLoader(
+        workspace.directory,
+        cache=workspace.cache,
+        governor=workspace.governor,
+        languages=workspace.languages,
+        workers=config.io_workers * 2,
+    )
+    try:
+        async with YouTubeClient(get_env().get("YOUTUBE_API"), governor=workspace.governor) as client:
+            service = TranscriptionService(
+                workspace.directory,
+                client,
+                loader,
+                workspace.process_pool,
+                workspace.cache,
+                workspace.languages,
+                config,
+            )
+            await service.serve_forever()
+    finally:
+        await workspace.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Youtube load & transcribe service")
+    parser.add_argument("--force", action="store_true", help="ignore cached transcripts and captions")
+    parser.add_argument(
+        "--incremental", action="store_true", help="collect only channel uploads not seen on previous runs"
+    )
+    parser.add_argument(
+        "--in-memory",
+        action="store_true",
+        help="decode downloads in memory instead of audio files: each video holds ~230 MB per hour of audio in RAM "
+        "and is transcribed in this process, without the worker process pool",
+    )
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port")
+    parser.add_argument("--metrics-dump", type=Path, default=None, help="dump metrics to this JSON file")
+    parser.add_argument("--serve", action="store_true", help="run as a daemon keeping models warm between jobs")
+    parser.add_argument("--no-daemon", action="store_true", help="run in this process even if a daemon is running")
+    parser.add_argument("--socket", type=Path, default=DAEMON_SOCKET, help="Unix socket of the daemon")
+    parser.add_argument("--http", type=int, default=None, metavar="PORT", help="run as an HTTP service on this port")
+    parser.add_argument("--batch", type=Path, default=None, help="run the JSON batch spec without prompts")
+    parser.add_argument("--store", type=Path, default=None, help="work store shared by the nodes of a multi-host run")
+    parser.add_argument("--enqueue", type=Path, default=None, help="queue the JSON batch spec for the worker nodes")
+    parser.add_argument("--worker", choices=ROLES, default=None, help="run a worker node of a multi-host run")
+    parser.add_argument("--until-idle", action="store_true", help="stop the worker node when no work is left")
+    parser.add_argument("--cluster-report", action="store_true", help="print units, nodes and throughput of the run")
+    return parser.parse_args()
+
+
+async def run_distributed(args: argparse.Namespace) -> None:
+    store_path = args.store or make_save_dir() / WORK_STORE_FILE
+    if args.worker:
+        await run_node(args.worker, store_path, args.until_idle)
+        return
+    store = SqliteWorkStore(store_path)
+    try:
+        if args.enqueue:
+            await enqueue_batch(BatchSpec.load(args.enqueue), store)
+        if args.cluster_report:
+            print(json.dumps(store.report(), indent=2))
+    finally:
+        store.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with metrics_export(args.metrics_port, args.metrics_dump):
+        if args.serve:
+            await serve(args.socket)
+            return
+        if args.http is not None:
+            await serve_http(args.http)
+            return
+        if args.enqueue or args.worker or args.cluster_report:
+            await run_distributed(args)
+            return
+        if args.batch is not None:
+            job = Job(mode="batch", path=str(args.batch.resolve()), force=args.force, in_memory=args.in_memory)
+        else:
+            job = prompt_job(force=args.force, incremental=args.incremental, in_memory=args.in_memory)
+        if job is not None:
+            result = await submit_job(job, None if args.no_daemon else DaemonClient(args.socket))
+            if not result.ok:
+                sys.exit(1)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,194 @@
+import asyncio
+import bisect
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+# seconds, from a cached lookup to a long transcription
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass(slots=True)
+class Histogram:
+    buckets: tuple[float, ...]
+    counts: list[int] = field(default_factory=list)  # per bucket, not cumulative, the last one is +Inf
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"count": self.count, "sum": round(self.total, 6), "mean": self.total / self.count if self.count else 0}
+
+
+class Metrics:
+    """
+    Process-wide counters and histograms with Prometheus-style names and labels.
+    Disabled by default: every call returns right away and timers are a shared null context,
+    so instrumented code pays one attribute check.
+    Exported as Prometheus text (serve) or as a JSON file rewritten periodically (dump_periodically).
+    internal settings: enabled flag, histogram buckets
+    """
+
+    def __init__(self, enabled: bool = False, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    @staticmethod
+    def _labels(labels: dict[str, Any]) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:  # noqa ANN401
+        if not self.enabled:
+            return
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:  # noqa ANN401
+        if not self.enabled:
+            return
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(self.buckets)
+            series[key].observe(value)
+
+    def timer(self, name: str, **labels: Any) -> Any:  # noqa ANN401
+        """
+        Context manager observing the duration of its block in seconds.
+        :param name: histogram name
+        :param labels: label values
+        :return: context manager, a shared no-op one when disabled
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(name, labels)
+
+    @contextmanager
+    def _timer(self, name: str, labels: dict[str, Any]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        :return: {"counters": {name: {labels: value}}, "histograms": {name: {labels: {count, sum, mean}}}}
+        """
+
+        def render(labels: Labels) -> str:
+            return ",".join(f"{key}={value}" for key, value in labels)
+
+        with self._lock:
+            return {
+                "counters": {
+                    name: {render(labels): value for labels, value in series.items()}
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: {render(labels): histogram.as_dict() for labels, histogram in series.items()}
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Renders all series in the Prometheus text exposition format.
+        """
+
+        def render(labels: Labels, extra: tuple[tuple[str, str], ...] = ()) -> str:
+            pairs = [*labels, *extra]
+            return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}" if pairs else ""
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{render(labels)} {value:g}" for labels, value in series.items())
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts, strict=True):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{render(labels, (('le', f'{bound}'),))} {cumulative}")
+                    lines.append(f"{name}_sum{render(labels)} {histogram.total:g}")
+                    lines.append(f"{name}_count{render(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9100) -> "web.AppRunner":
+        """
+        Starts a /metrics endpoint in the running event loop.
+        :param host: interface to listen on
+        :param port: port to listen on
+        :return: AppRunner, call its cleanup() to stop the endpoint
+        """
+        from aiohttp import web  # noqa PLC0415 the server side of aiohttp is only needed with an endpoint
+
+        async def handler(_: web.Request) -> web.Response:
+            return web.Response(text=self.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Metrics served at http://{host}:{port}/metrics")
+        return runner
+
+    def dump(self, path_: Path) -> None:
+        tmp_path = path_.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"time": time.time(), **self.snapshot()}, indent=2), encoding="utf-8")
+        tmp_path.replace(path_)
+
+    async def dump_periodically(self, path_: Path, interval: float = 30.0) -> None:
+        """
+        Rewrites the JSON snapshot every interval seconds until cancelled, a last dump is made on cancellation.
+        :param path_: JSON file path
+        :param interval: seconds between dumps
+        :return: None
+        """
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await asyncio.to_thread(self.dump, path_)
+        finally:
+            self.dump(path_)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+_NULL_TIMER = nullcontext()
+
+metrics = Metrics()
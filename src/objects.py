@@ -1,5 +1,7 @@
-from dataclasses import dataclass
+import json
+from dataclasses import dataclass, field
 from enum import Enum
+from pathlib import Path
 
 
 class DownloadOptions(Enum):
@@ -22,3 +24,73 @@ class YouTubeVideo:
     def generate_link(self) -> str:
         self.link = f"https://www.youtube.com/watch?v={self.id}"
         return self.link
+
+
+@dataclass(slots=True)
+class TranscriptionSegment:
+    text: str
+    start: float
+    end: float
+    avg_logprob: float | None = None
+
+
+DOWNLOAD_MODES = ("text", "audio", "video")
+JOB_MODES = ("file", "batch", *DOWNLOAD_MODES)
+
+
+@dataclass(slots=True)
+class Job:
+    """
+    One CLI run: a local file or YouTube links/channel with a download mode.
+    Plain JSON-compatible fields, so a job can be sent to the daemon as is.
+    """
+
+    mode: str  # "file", "batch" or a DownloadOptions name in lower case: "text", "audio", "video"
+    path: str | None = None  # absolute path of the local file or of the batch spec
+    channel: str | None = None  # channel link, all its uploads are processed
+    links: list[str] = field(default_factory=list)  # video links, when no channel is given
+    quality: int | None = None  # video height of the "video" mode
+    model: str | None = None  # Whisper model, the default one when not given
+    force: bool = False  # ignore cached transcripts and captions
+    incremental: bool = False  # only channel uploads not seen on previous runs
+    in_memory: bool = False  # decode downloads in memory and transcribe them in-process, see TranscriptionPipeline
+
+    def __post_init__(self) -> None:
+        if self.mode not in JOB_MODES:
+            raise ValueError(f"Unknown job mode {self.mode!r}, expected one of {', '.join(JOB_MODES)}")
+
+
+@dataclass(slots=True)
+class JobResult:
+    ok: bool
+    seconds: float  # processing time of the job, without the client round trip
+    error: str | None = None
+
+
+@dataclass(slots=True)
+class BatchSpec:
+    """
+    Headless run described by a JSON file, e.g.
+    {"mode": "text", "channels": ["https://www.youtube.com/@name"], "links": [], "model": "small"}.
+    The batch name identifies the run in the job journal, the spec file name by default.
+    force and in_memory may also be switched on by the CLI flags of the run.
+    """
+
+    name: str
+    mode: str = "text"  # a DownloadOptions name in lower case: "text", "audio", "video"
+    channels: list[str] = field(default_factory=list)
+    links: list[str] = field(default_factory=list)
+    model: str | None = None
+    quality: int = 720
+    max_attempts: int = 3  # failures after which a video is given up, across restarts
+    force: bool = False
+    in_memory: bool = False  # see Job.in_memory
+
+    def __post_init__(self) -> None:
+        if self.mode not in DOWNLOAD_MODES:
+            raise ValueError(f"Unknown batch mode {self.mode!r}, expected one of {', '.join(DOWNLOAD_MODES)}")
+
+    @classmethod
+    def load(cls, path_: Path) -> "BatchSpec":
+        spec = json.loads(path_.read_text(encoding="utf-8"))
+        return cls(**{"name": path_.stem, **spec})
@@ -0,0 +1,488 @@
+import asyncio
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from loguru import logger
+
+from metrics import metrics
+from objects import TranscriptionSegment, YouTubeVideo
+from storage.job_journal import JobJournal, VideoState
+from storage.language_cache import LanguageCache
+from storage.transcript_cache import TranscriptCache
+from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import SAMPLE_RATE, AudioSource, probe_duration, resample_to_wav
+from transcribers.process_pool import ProcessPoolTranscriber
+from transcribers.transcript_writer import TranscriptWriter
+
+_STOP = object()
+
+
+@dataclass(slots=True)
+class PipelineJob:
+    video: YouTubeVideo
+    audio_path: Path | None = None
+    decoded_path: Path | None = None
+    transcript_path: Path | None = None
+    audio: np.ndarray | None = None  # decoded audio of the in-memory mode
+    duration: float | None = None  # probed once, for batching, scheduling and metrics
+
+
+@dataclass(slots=True)
+class StageStats:
+    name: str
+    concurrency: int
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def as_dict(self, queue_depth: int) -> dict[str, Any]:
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": queue_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput_per_min": round(self.processed / elapsed * 60, 2) if elapsed else 0.0,
+        }
+
+
+class _Stage:
+    """
+    A group of workers taking items from the inbox, applying the handler and passing results to the outbox.
+    Handler returning None drops the item (failure is already logged by the handler).
+    on_result is called with the stage name, the job and the failure description (None on success),
+    on_drop with every job the stage drops, a dropped job never reaches the later stages.
+    """
+
+    def __init__(  # noqa PLR0913
+        self,
+        name: str,
+        handler: Callable[[PipelineJob], Awaitable[PipelineJob | None]],
+        concurrency: int,
+        inbox: asyncio.Queue,
+        outbox: asyncio.Queue | None,
+        on_result: Callable[[str, PipelineJob, str | None], None] | None = None,
+        on_drop: Callable[[PipelineJob], None] | None = None,
+    ):
+        self.handler = handler
+        self.inbox = inbox
+        self.outbox = outbox
+        self.on_result = on_result
+        self.on_drop = on_drop
+        self.stats = StageStats(name=name, concurrency=concurrency)
+
+    async def run(self, downstream_workers: int) -> None:
+        await asyncio.gather(*(self._worker() for _ in range(self.stats.concurrency)))
+        if self.outbox is not None:
+            for _ in range(downstream_workers):
+                await self.outbox.put(_STOP)
+
+    async def _worker(self) -> None:
+        while (job := await self.inbox.get()) is not _STOP:
+            start = time.perf_counter()
+            failure = f"{self.stats.name} failed"
+            try:
+                result = await self.handler(job)
+            except Exception as error:  # noqa BLE001 a failing video is dropped, the others go on
+                logger.error(f"Stage {self.stats.name} failed for video {job.video.id}: {error!r}")
+                result, failure = None, f"{self.stats.name} failed: {error!r}"
+            elapsed = time.perf_counter() - start
+            self.stats.busy_seconds += elapsed
+            metrics.observe("pipeline_stage_seconds", elapsed, stage=self.stats.name)
+            if self.on_result is not None:
+                self.on_result(self.stats.name, job, None if result is not None else failure)
+            if result is None:
+                self.stats.failed += 1
+                metrics.inc("pipeline_jobs_total", stage=self.stats.name, result="failed")
+                if self.on_drop is not None:
+                    self.on_drop(job)
+                continue
+            self.stats.processed += 1
+            metrics.inc("pipeline_jobs_total", stage=self.stats.name, result="processed")
+            if self.outbox is not None:
+                await self.outbox.put(result)
+
+
+class _MicroBatcher:
+    """
+    Collects short clips submitted by concurrent transcribe workers and runs them as one batched inference call
+    when max_items clips are pending or max_wait seconds passed since the first one.
+    run_batch is called with the clips and their total duration in seconds.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[
+            [list[tuple[YouTubeVideo, AudioSource]], float],
+            Awaitable[list[tuple[YouTubeVideo, list[TranscriptionSegment]]]],
+        ],
+        max_items: int,
+        max_wait: float,
+    ):
+        self.run_batch = run_batch
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self._pending: list[tuple[YouTubeVideo, AudioSource, float, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._running: set[asyncio.Task] = set()  # the event loop keeps weak references to tasks only
+
+    async def submit(self, video: YouTubeVideo, path: AudioSource, duration: float) -> list[TranscriptionSegment]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((video, path, duration, future))
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def cancel(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for running in self._running:
+            running.cancel()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        clips = [(video, path) for video, path, _, _ in batch]
+        self._running.add(running := asyncio.create_task(self.run_batch(clips, sum(d for _, _, d, _ in batch))))
+        running.add_done_callback(self._running.discard)
+        running.add_done_callback(lambda done: self._resolve(batch, done))
+
+    @staticmethod
+    def _resolve(batch: list[tuple[YouTubeVideo, AudioSource, float, asyncio.Future]], done: asyncio.Future) -> None:
+        for i, (_, _, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            if done.cancelled():
+                future.cancel()
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result()[i][1])
+
+
+class TranscriptionPipeline:
+    """
+    Staged producer/consumer pipeline: download -> decode -> transcribe -> write.
+    Stages are connected by bounded queues, so transcription starts as soon as the first audio file lands
+    and downloads are throttled when inference falls behind.
+    The transcribe stage streams segments to disk (see TranscriptWriter), the write stage finalizes the result
+    and removes intermediate audio files.
+    Clips not longer than batch_clip_seconds are micro-batched into one inference call
+    when the transcriber supports transcribe_batch, in a worker process of the pool when one is given.
+    With a LanguageCache the language of a video is detected once (or taken from its channel majority)
+    and passed to the model, batched clips keep per-window detection.
+    With a JobJournal every video is journaled as downloaded, transcribed or failed.
+    Audio is downloaded as the native m4a/opus stream, no MP3 is encoded for the transcriber.
+    In the in_memory mode the stream is decoded straight into a float32 buffer (loader.load_audio),
+    audio never touches the disk and transcription runs in-process.
+    It trades memory and parallelism for disk I/O: the whole track is held as float32 (~230 MB per hour of audio)
+    by every video between download and transcription, and the process pool is bypassed,
+    so transcription is limited to transcribe_workers threads of this process.
+    internal settings: concurrency per stage, queue size between stages, micro-batching limits
+    """
+
+    @dataclass
+    class Config:
+        download_workers: int = 4
+        decode_workers: int = 2
+        transcribe_workers: int = 1
+        write_workers: int = 1
+        queue_size: int = 4
+        decode: bool = True
+        keep_audio: bool = False
+        batch_clip_seconds: float = 0.0  # 0 - batching disabled
+        batch_max_items: int = 16
+        batch_max_wait: float = 2.0
+        model: str = ""  # part of the transcript cache key
+        in_memory: bool = False  # no audio files, at the cost of RAM and the process pool, see the class docstring
+
+    def __init__(  # noqa PLR0913
+        self,
+        loader: Any,  # noqa ANN401 YouTubeLoader-like object providing async download_audio
+        transcriber_factory: Callable[[], AbstractTranscriber],
+        config: Config | None = None,
+        process_pool: ProcessPoolTranscriber | None = None,
+        cache: TranscriptCache | None = None,
+        languages: LanguageCache | None = None,
+        journal: JobJournal | None = None,
+    ):
+        self.loader = loader
+        self.transcriber_factory = transcriber_factory
+        self.config = config or self.Config()
+        self.process_pool = process_pool
+        self.cache = cache
+        self.languages = languages
+        self.journal = journal
+        if process_pool is not None:
+            # keep more jobs in flight than workers, so the pool can pick the shortest one
+            self.config.transcribe_workers = max(self.config.transcribe_workers, process_pool.workers * 2)
+        self._batcher: _MicroBatcher | None = None
+        if self.config.batch_clip_seconds:
+            # every pending clip holds a transcribe worker, so a full batch needs as many workers
+            self.config.transcribe_workers = max(self.config.transcribe_workers, self.config.batch_max_items)
+        self._executor: ThreadPoolExecutor | None = None
+        self._transcriber: AbstractTranscriber | None = None
+        self.results: list[Path] = []
+        self.transcribed: set[str] = set()  # ids of the videos with a saved transcript
+
+        stage_names = ("download", "decode", "transcribe", "write")
+        self.queues = {name: asyncio.Queue(maxsize=self.config.queue_size) for name in stage_names}
+        on_result = self._journal if journal is not None else None
+        self.stages = [
+            _Stage(
+                "download",
+                self._download,
+                self.config.download_workers,
+                self.queues["download"],
+                self.queues["decode"],
+                on_result,
+                self._discard,
+            ),
+            _Stage(
+                "decode",
+                self._decode,
+                self.config.decode_workers,
+                self.queues["decode"],
+                self.queues["transcribe"],
+                on_result,
+                self._discard,
+            ),
+            _Stage(
+                "transcribe",
+                self._transcribe,
+                self.config.transcribe_workers,
+                self.queues["transcribe"],
+                self.queues["write"],
+                on_result,
+                self._discard,
+            ),
+            _Stage(
+                "write",
+                self._write,
+                self.config.write_workers,
+                self.queues["write"],
+                None,
+                on_result,
+                self._discard,
+            ),
+        ]
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        return {stage.stats.name: stage.stats.as_dict(stage.inbox.qsize()) for stage in self.stages}
+
+    async def run(
+        self, videos: Iterable[YouTubeVideo] | AsyncIterable[YouTubeVideo], report_interval: float = 10.0
+    ) -> list[Path]:
+        """
+        Runs all the stages until every video is either transcribed or dropped.
+        Videos may come from an async iterable, processing starts with the first one.
+        :param videos: YouTubeVideo instances to process
+        :param report_interval: period in seconds of the queue depth/throughput log line
+        :return: list of transcript paths
+        """
+        runners = [
+            asyncio.create_task(stage.run(self.stages[i + 1].stats.concurrency if i + 1 < len(self.stages) else 0))
+            for i, stage in enumerate(self.stages)
+        ]
+        reporter = asyncio.create_task(self._report_periodically(report_interval))
+        try:
+            async for video in self._iterate(videos):
+                if not self._from_cache(video):
+                    await self.queues["download"].put(PipelineJob(video=video))
+            for _ in range(self.stages[0].stats.concurrency):
+                await self.queues["download"].put(_STOP)
+            await asyncio.gather(*runners)
+        finally:
+            # a cancelled or failed run takes its stages down with it, nothing keeps working in the background
+            for runner in runners:
+                runner.cancel()
+            if self._batcher is not None:
+                self._batcher.cancel()
+            await asyncio.gather(*runners, return_exceptions=True)
+            reporter.cancel()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+        logger.info(f"Pipeline finished: {self.report()}")
+
+        return self.results
+
+    @staticmethod
+    async def _iterate(videos: Iterable[YouTubeVideo] | AsyncIterable[YouTubeVideo]) -> AsyncIterator[YouTubeVideo]:
+        if isinstance(videos, AsyncIterable):
+            async for video in videos:
+                yield video
+        else:
+            for video in videos:
+                yield video
+
+    def _cache_key(self, video: YouTubeVideo) -> str:
+        return TranscriptCache.key_for_video(video.id, self.config.model)
+
+    def _target(self, video: YouTubeVideo) -> Path:
+        return (self.loader.dir / self.loader.prepare_title(video.title)).with_suffix(".txt")
+
+    def _from_cache(self, video: YouTubeVideo) -> bool:
+        if self.cache is None:
+            return False
+        target = self._target(video)
+        if not self.cache.copy_to(self._cache_key(video), target):
+            return False
+        self.results.append(target)
+        self.transcribed.add(video.id)
+        if self.journal is not None:
+            self.journal.mark(video.id, VideoState.TRANSCRIBED)
+        return True
+
+    def _journal(self, stage: str, job: PipelineJob, failure: str | None) -> None:
+        if failure is not None:
+            self.journal.mark(job.video.id, VideoState.FAILED, failure)
+        elif stage == "download":
+            self.journal.mark(job.video.id, VideoState.DOWNLOADED)
+        elif stage == "write":
+            self.journal.mark(job.video.id, VideoState.TRANSCRIBED)
+
+    async def _report_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            logger.info(f"Pipeline state: {self.report()}")
+
+    async def _download(self, job: PipelineJob) -> PipelineJob | None:
+        if self.config.in_memory:
+            success, job.audio = await self.loader.load_audio(job.video)
+            return job if success else None
+        success, path_ = await self.loader.download_audio(job.video, for_transcription=True)
+        if not success:
+            return None
+        job.audio_path = path_
+        return job
+
+    async def _decode(self, job: PipelineJob) -> PipelineJob | None:
+        if job.audio is not None:
+            return job
+        if not self.config.decode:
+            job.decoded_path = job.audio_path
+            return job
+        job.decoded_path = await resample_to_wav(job.audio_path)
+        return job
+
+    @property
+    def transcriber(self) -> AbstractTranscriber:
+        """
+        Transcriber of this process, created on first use: jobs of the process pool never load a model here.
+        """
+        if self._transcriber is None:
+            self._transcriber = self.transcriber_factory()
+        return self._transcriber
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.config.transcribe_workers)
+        return self._executor
+
+    async def _transcribe(self, job: PipelineJob) -> PipelineJob | None:
+        target = job.audio_path.with_suffix(".txt") if job.audio_path else self._target(job.video)
+        source = job.audio if job.audio is not None else job.decoded_path
+        if await self._batchable(job):
+            segments = await self._batcher.submit(job.video, source, await self._duration(job))
+            await asyncio.to_thread(TranscriptWriter(target).write, segments)
+            job.transcript_path = target
+            return job
+        language = await self._language(job, source)
+        # the pool probes the duration for scheduling anyway, metrics only probe when enabled
+        duration = await self._duration(job) if metrics.enabled or self.process_pool is not None else None
+        if self.process_pool is not None and job.audio is None:
+            await self.process_pool.transcribe_to_file(job.decoded_path, target, duration=duration, language=language)
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.executor, self._transcribe_to_file, self.transcriber, source, target, language
+            )
+        if duration is not None:
+            metrics.inc("audio_seconds_processed_total", duration)
+        job.transcript_path = target
+        return job
+
+    @staticmethod
+    async def _duration(job: PipelineJob) -> float:
+        if job.duration is None:
+            job.duration = (
+                len(job.audio) / SAMPLE_RATE if job.audio is not None else await probe_duration(job.decoded_path)
+            )
+        return job.duration
+
+    async def _batchable(self, job: PipelineJob) -> bool:
+        if not self.config.batch_clip_seconds:
+            return False
+        if self._batcher is None:
+            # batches go to a worker process like single files, the in-memory mode keeps them in this process
+            in_pool = self.process_pool is not None and job.audio is None
+            batching = self.process_pool.batching if in_pool else hasattr(self.transcriber, "transcribe_batch")
+            if not batching:
+                return False
+            run_batch = self.process_pool.transcribe_batch if in_pool else self._transcribe_batch
+            self._batcher = _MicroBatcher(run_batch, self.config.batch_max_items, self.config.batch_max_wait)
+        return await self._duration(job) <= self.config.batch_clip_seconds
+
+    async def _transcribe_batch(
+        self, clips: list[tuple[YouTubeVideo, AudioSource]], _: float
+    ) -> list[tuple[YouTubeVideo, list[TranscriptionSegment]]]:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.transcriber.transcribe_batch, clips)
+
+    async def _language(self, job: PipelineJob, source: AudioSource) -> str | None:
+        """
+        Language of the video: cached per video or per channel, detected as a separate step otherwise.
+        """
+        if self.languages is None:
+            return None
+        key = LanguageCache.key_for_video(job.video.id)
+        language = self.languages.get(key, job.video.channel_id)
+        if language is not None:
+            return language
+        if self.process_pool is not None and job.audio is None:
+            detected = await self.process_pool.detect_language(job.decoded_path)
+        else:
+            loop = asyncio.get_running_loop()
+            detected = await loop.run_in_executor(self.executor, self.transcriber.detect_language, source)
+        return self.languages.put(key, *detected, channel_id=job.video.channel_id)
+
+    @staticmethod
+    def _transcribe_to_file(
+        transcriber: AbstractTranscriber, path: AudioSource, target: Path, language: str | None = None
+    ) -> None:
+        writer = TranscriptWriter(target)
+        start, offset = writer.resume_point()
+        writer.write(transcriber.transcribe_stream(path, start=start, language=language), offset=offset)
+
+    def _discard(self, job: PipelineJob) -> None:
+        """
+        Removes the intermediate audio of a job, written or dropped by any stage, unless keep_audio is set.
+        """
+        if not self.config.keep_audio:
+            for path_ in {job.audio_path, job.decoded_path} - {None}:
+                path_.unlink(missing_ok=True)
+        job.audio = None
+
+    async def _write(self, job: PipelineJob) -> PipelineJob | None:
+        self._discard(job)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, self._cache_key(job.video), job.transcript_path)
+        self.results.append(job.transcript_path)
+        self.transcribed.add(job.video.id)
+        logger.info(f"Transcription saved\ntitle: {job.transcript_path}\n")
+        return job
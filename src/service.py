@@ -0,0 +1,461 @@
+import asyncio
+import json
+import signal
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+from urllib.parse import unquote
+
+from aiohttp import web
+from loguru import logger
+
+from metrics import metrics
+from objects import YouTubeVideo
+from storage.audio_store import AudioStore
+from storage.language_cache import LanguageCache
+from storage.transcript_cache import TranscriptCache
+from transcribers.audio import probe_duration
+from transcribers.long_file import ChunkedTranscriber
+from transcribers.process_pool import ProcessPoolTranscriber
+from transcribers.transcript_writer import TranscriptWriter
+from youtube_workers.youtube_api import YouTubeClient
+
+UPLOAD_FOLDER = "uploads"
+UPLOAD_CHUNK_BYTES = 1 << 16
+FINISHED = ("done", "failed")
+
+
+@dataclass(slots=True)
+class ServiceJob:
+    id: str
+    kind: str  # "video", "channel" or "file"
+    source: str  # video or channel link, name of the uploaded file
+    model: str
+    status: str = "queued"  # queued -> running -> done or failed
+    videos: int = 0  # known once the source is collected
+    done: int = 0
+    failed: int = 0
+    error: str | None = None
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    upload: Path | None = None
+    transcripts: list[Path] = field(default_factory=list)
+    changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "source": self.source,
+            "model": self.model,
+            "status": self.status,
+            "videos": self.videos,
+            "done": self.done,
+            "failed": self.failed,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+
+
+@dataclass(slots=True)
+class _Work:
+    key: str  # transcript cache key, jobs asking for the same transcript share one unit of work
+    path: Path
+    model: str
+    video: YouTubeVideo | None = None  # None - uploaded file
+
+
+class TranscriptionService:
+    """
+    HTTP front of the transcription stack: videos, channels and uploaded files are submitted as jobs
+    and transcribed to text (captions first, like the TEXT mode of the CLI), job ids are returned at once.
+    The status is polled at /jobs/{id} or streamed as NDJSON from /jobs/{id}/events, texts come from /jobs/{id}/result.
+    Submitted jobs wait in a bounded queue, a full queue answers 429 with Retry-After.
+    Network I/O and inference run in separate bounded pools: io_workers collect sources and download audio
+    (no more than io_workers downloads at once), a bounded queue hands the audio over to inference_workers
+    feeding the process pool, so downloads stop when inference falls behind.
+    A video asked for by several running jobs is downloaded and transcribed once.
+    internal settings: host and port, queue sizes, pool sizes, allowed models, finished jobs kept in memory
+    """
+
+    @dataclass
+    class Config:
+        host: str = "127.0.0.1"
+        port: int = 8080
+        queue_size: int = 64  # submitted jobs waiting for an io worker
+        io_workers: int = 4
+        inference_queue_size: int = 8  # downloaded files waiting for an inference worker
+        inference_workers: int = 2
+        models: tuple[str, ...] = ("small",)  # the first one is used when a job does not name one
+        long_file_seconds: float = 30 * 60  # longer uploads are transcribed in parallel chunks
+        max_upload_bytes: int = 2 << 30
+        retry_after: int = 5  # seconds suggested to a client rejected with 429
+        history: int = 1000  # finished jobs kept for status and result requests
+
+    def __init__(  # noqa PLR0913
+        self,
+        directory: Path,
+        client: YouTubeClient,
+        loader: Any,  # noqa ANN401 YouTubeLoader-like object providing iter_captions and download_audio
+        process_pools: Callable[[str], ProcessPoolTranscriber],
+        cache: TranscriptCache | None = None,
+        languages: LanguageCache | None = None,
+        config: Config | None = None,
+    ):
+        self.directory = directory
+        self.client = client
+        self.loader = loader
+        self.process_pools = process_pools
+        self.cache = cache
+        self.languages = languages
+        self.config = config or self.Config()
+        self.uploads = directory / UPLOAD_FOLDER
+        self.uploads.mkdir(parents=True, exist_ok=True)
+        self.store = AudioStore()  # decoded long uploads, removed with the upload
+        self.jobs: dict[str, ServiceJob] = {}
+        self._queue: asyncio.Queue[ServiceJob] = asyncio.Queue(maxsize=self.config.queue_size)
+        self._inference: asyncio.Queue[_Work] = asyncio.Queue(maxsize=self.config.inference_queue_size)
+        self._downloads = asyncio.Semaphore(self.config.io_workers)
+        self._in_flight: dict[str, list[ServiceJob]] = {}  # work key -> jobs waiting for it
+        self._workers: list[asyncio.Task] = []
+
+        self.app = web.Application()
+        self.app.router.add_get("/health", self.health)
+        self.app.router.add_post("/jobs", self.submit)
+        self.app.router.add_post("/jobs/upload", self.upload)
+        self.app.router.add_get("/jobs/{id}", self.status)
+        self.app.router.add_get("/jobs/{id}/events", self.events)
+        self.app.router.add_get("/jobs/{id}/result", self.result)
+        self.app.on_startup.append(self._start_workers)
+        self.app.on_cleanup.append(self._stop_workers)
+
+    async def _start_workers(self, _: web.Application) -> None:
+        self._workers = [asyncio.create_task(self._io_worker()) for _ in range(self.config.io_workers)]
+        self._workers += [asyncio.create_task(self._inference_worker()) for _ in range(self.config.inference_workers)]
+        logger.info(
+            f"TranscriptionService started: {self.config.io_workers} io workers, "
+            f"{self.config.inference_workers} inference workers, queue of {self.config.queue_size} jobs"
+        )
+
+    async def _stop_workers(self, _: web.Application) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info(f"TranscriptionService stopped: {len(self.jobs)} jobs served")
+
+    async def serve_forever(self) -> None:
+        """
+        Serves HTTP requests until SIGINT or SIGTERM.
+        :return: None
+        """
+        runner = web.AppRunner(self.app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, self.config.host, self.config.port).start()
+        logger.info(f"TranscriptionService listening on http://{self.config.host}:{self.config.port}")
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_ in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_, stopped.set)
+        try:
+            await stopped.wait()
+        finally:
+            for signal_ in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signal_)
+            await runner.cleanup()
+
+    def _rejected(self) -> web.Response:
+        metrics.inc("service_rejected_total")
+        return web.json_response(
+            {"error": "The job queue is full"},
+            status=HTTPStatus.TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(self.config.retry_after)},
+        )
+
+    def _model(self, model: str | None) -> str:
+        model = model or self.config.models[0]
+        if model not in self.config.models:
+            raise ValueError(f"Model {model} is not served, available: {', '.join(self.config.models)}")
+        return model
+
+    def _enqueue(self, job: ServiceJob) -> web.Response:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            if job.upload is not None:
+                job.upload.unlink(missing_ok=True)
+            return self._rejected()
+        self.jobs[job.id] = job
+        self._forget_finished()
+        metrics.inc("service_jobs_total", kind=job.kind)
+        logger.info(f"Job {job.id} queued: {job.kind} {job.source}")
+        return web.json_response(job.as_dict(), status=HTTPStatus.ACCEPTED, headers={"Location": f"/jobs/{job.id}"})
+
+    def _forget_finished(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[: max(0, len(finished) - self.config.history)]:
+            del self.jobs[job_id]
+
+    def _job(self, request: web.Request) -> ServiceJob:
+        job = self.jobs.get(request.match_info["id"])
+        if job is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "Unknown job"}), content_type="application/json")
+        return job
+
+    async def health(self, _: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "queued": self._queue.qsize(),
+                "queue_size": self.config.queue_size,
+                "inference_queued": self._inference.qsize(),
+                "in_flight": len(self._in_flight),
+                "running": sum(job.status == "running" for job in self.jobs.values()),
+                "jobs": len(self.jobs),
+            }
+        )
+
+    async def submit(self, request: web.Request) -> web.Response:
+        """
+        Queues a video or a channel: {"video": link} or {"channel": link}, with an optional "model".
+        """
+        try:
+            body = await request.json()
+            sources = {kind: body[kind] for kind in ("video", "channel") if body.get(kind)}
+            if len(sources) != 1 or set(body) - {"video", "channel", "model"}:
+                raise ValueError("Exactly one of video or channel links is expected")
+            model = self._model(body.get("model"))
+        except (TypeError, ValueError, AttributeError) as error:
+            return web.json_response({"error": f"Invalid job: {error}"}, status=HTTPStatus.BAD_REQUEST)
+        [(kind, source)] = sources.items()
+        return self._enqueue(ServiceJob(id=uuid.uuid4().hex, kind=kind, source=source, model=model))
+
+    async def upload(self, request: web.Request) -> web.Response:
+        """
+        Queues an uploaded file: multipart form with a "file" field, the model is an optional query parameter.
+        The queue is checked before the file is received, so a rejected client does not send it in vain.
+        """
+        if self._queue.full():
+            return self._rejected()
+        try:
+            model = self._model(request.query.get("model"))
+        except ValueError as error:
+            return web.json_response({"error": f"Invalid job: {error}"}, status=HTTPStatus.BAD_REQUEST)
+        reader = await request.multipart()
+        part = await reader.next()
+        if part is None or part.name != "file" or not part.filename:
+            return web.json_response({"error": "A file field is expected"}, status=HTTPStatus.BAD_REQUEST)
+
+        job_id = uuid.uuid4().hex
+        name = Path(unquote(part.filename)).name  # aiohttp clients percent-encode file names
+        target = self.uploads / f"{job_id}_{self.loader.prepare_title(Path(name).stem)}{Path(name).suffix}"
+        size = 0
+        with target.open("wb") as file:
+            while chunk := await part.read_chunk(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > self.config.max_upload_bytes:
+                    break
+                file.write(chunk)
+        if size > self.config.max_upload_bytes:
+            target.unlink(missing_ok=True)
+            return web.json_response(
+                {"error": f"The file is larger than {self.config.max_upload_bytes} bytes"},
+                status=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            )
+        return self._enqueue(ServiceJob(id=job_id, kind="file", source=name, model=model, upload=target))
+
+    async def status(self, request: web.Request) -> web.Response:
+        return web.json_response(self._job(request).as_dict())
+
+    async def events(self, request: web.Request) -> web.StreamResponse:
+        """
+        Streams the job status as NDJSON: the current one at once, then every change until the job is finished.
+        """
+        job = self._job(request)
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        while True:
+            changed = job.changed
+            await response.write(json.dumps(job.as_dict()).encode() + b"\n")
+            if job.status in FINISHED:
+                break
+            await changed.wait()
+        await response.write_eof()
+        return response
+
+    async def result(self, request: web.Request) -> web.Response:
+        job = self._job(request)
+        if job.status not in FINISHED:
+            return web.json_response({"error": f"The job is {job.status}", **job.as_dict()}, status=HTTPStatus.CONFLICT)
+        transcripts = [
+            {"name": path_.name, "text": await asyncio.to_thread(path_.read_text, encoding="utf-8")}
+            for path_ in job.transcripts
+            if path_.is_file()
+        ]
+        return web.json_response({**job.as_dict(), "transcripts": transcripts})
+
+    @staticmethod
+    def _changed(job: ServiceJob) -> None:
+        # streams wait for the current event, a new one is armed for the next change
+        job.changed.set()
+        job.changed = asyncio.Event()
+
+    def _finish(self, job: ServiceJob, error: str | None = None) -> None:
+        job.error = error or job.error
+        job.status = "done" if job.done and error is None else "failed"
+        job.finished_at = time.time()
+        metrics.inc("service_jobs_finished_total", kind=job.kind, status=job.status)
+        metrics.observe("service_job_seconds", job.finished_at - job.submitted_at, kind=job.kind)
+        logger.info(f"Job {job.id} {job.status}: {job.done} of {job.videos} transcribed")
+        self._changed(job)
+
+    def _record(self, job: ServiceJob, transcript: Path | None, error: str | None = None) -> None:
+        if transcript is not None:
+            job.done += 1
+            job.transcripts.append(transcript)
+        else:
+            job.failed += 1
+            job.error = error
+        if job.done + job.failed >= job.videos:
+            self._finish(job)
+        else:
+            self._changed(job)
+
+    def _settle(self, key: str, transcript: Path | None, error: str | None = None) -> None:
+        for job in self._in_flight.pop(key, []):
+            self._record(job, transcript, error)
+
+    async def _io_worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            self._changed(job)
+            try:
+                await self._collect(job)
+            except Exception as error:  # noqa BLE001 a failed job must not stop the worker
+                logger.exception(f"Job {job.id} failed")
+                self._abandon(job)
+                self._finish(job, repr(error))
+
+    def _abandon(self, job: ServiceJob) -> None:
+        # work started for the failed job still settles other jobs waiting for it, but not this one
+        for key, jobs in list(self._in_flight.items()):
+            if job in jobs:
+                jobs.remove(job)
+            if not jobs:
+                del self._in_flight[key]
+        if job.upload is not None:
+            job.upload.unlink(missing_ok=True)
+
+    async def _videos(self, job: ServiceJob) -> list[YouTubeVideo]:
+        if job.kind == "video":
+            videos, _ = await self.client.get_videos_by_links([job.source])
+            return videos
+        channel_id = await self.client.get_channel_id_by_link(job.source)
+        if channel_id is None:
+            return []
+        return [video async for page in self.client.iter_channel_videos(channel_id) for video in page]
+
+    async def _collect(self, job: ServiceJob) -> None:
+        if job.kind == "file":
+            job.videos = 1
+            self._in_flight[f"upload:{job.id}"] = [job]
+            await self._inference.put(_Work(f"upload:{job.id}", job.upload, job.model))
+            return
+        videos = await self._videos(job)
+        job.videos = len(videos)
+        if not videos:
+            self._finish(job, f"No videos found for {job.source}")
+            return
+        self._changed(job)
+        downloads = []
+        async for video, success, path_ in self.loader.iter_captions(videos, concurrency=self.config.io_workers):
+            if success:
+                self._record(job, path_)
+            elif (transcript := self._from_cache(video, job.model)) is not None:
+                self._record(job, transcript)
+            else:
+                downloads.append(asyncio.create_task(self._download(job, video)))
+        await asyncio.gather(*downloads)
+
+    def _target(self, video: YouTubeVideo) -> Path:
+        return (self.loader.dir / self.loader.prepare_title(video.title)).with_suffix(".txt")
+
+    def _from_cache(self, video: YouTubeVideo, model: str) -> Path | None:
+        if self.cache is None:
+            return None
+        target = self._target(video)
+        return target if self.cache.copy_to(TranscriptCache.key_for_video(video.id, model), target) else None
+
+    async def _download(self, job: ServiceJob, video: YouTubeVideo) -> None:
+        key = TranscriptCache.key_for_video(video.id, job.model)
+        if key in self._in_flight:
+            self._in_flight[key].append(job)
+            return
+        self._in_flight[key] = [job]
+        try:
+            async with self._downloads:
+                success, path_ = await self.loader.download_audio(video, for_transcription=True)
+        except Exception as error:  # noqa BLE001 the failure is recorded in every job waiting for the video
+            success, error_ = False, f"Download of {video.id} failed: {error!r}"
+        else:
+            error_ = f"Download of {video.id} failed"
+        if not success:
+            self._settle(key, None, error_)
+            return
+        # waits while the inference queue is full, downloads do not run ahead of inference
+        await self._inference.put(_Work(key, path_, job.model, video))
+
+    async def _inference_worker(self) -> None:
+        while True:
+            work = await self._inference.get()
+            start = time.perf_counter()
+            try:
+                transcript = await self._transcribe(work)
+            except Exception as error:  # noqa BLE001 a failed file must not stop the worker
+                logger.exception(f"Transcription of {work.path} failed")
+                self._settle(work.key, None, f"Transcription of {work.path.name} failed: {error!r}")
+            else:
+                self._settle(work.key, transcript)
+            finally:
+                work.path.unlink(missing_ok=True)
+                self.store.remove(work.path)
+            metrics.observe("service_inference_seconds", time.perf_counter() - start)
+
+    async def _transcribe(self, work: _Work) -> Path:
+        target = work.path.with_suffix(".txt")
+        process_pool = self.process_pools(work.model)
+        if work.video is None:
+            cache_key = await asyncio.to_thread(TranscriptCache.key_for_file, work.path, work.model)
+            if self.cache is not None and self.cache.copy_to(cache_key, target):
+                return target
+        else:
+            cache_key = work.key
+        duration = await probe_duration(work.path)
+        if work.video is None and duration > self.config.long_file_seconds:
+            chunked = ChunkedTranscriber(process_pool, store=self.store, languages=self.languages)
+            segments = await chunked.transcribe(work.path)
+            await asyncio.to_thread(TranscriptWriter(target).write, segments)
+        else:
+            language = await self._language(process_pool, work)
+            await process_pool.transcribe_to_file(work.path, target, duration=duration, language=language)
+        metrics.inc("audio_seconds_processed_total", duration)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, cache_key, target)
+        return target
+
+    async def _language(self, process_pool: ProcessPoolTranscriber, work: _Work) -> str | None:
+        if self.languages is None:
+            return None
+        if work.video is None:
+            key, channel_id = LanguageCache.key_for_file(work.path), None
+        else:
+            key, channel_id = LanguageCache.key_for_video(work.video.id), work.video.channel_id
+        language = self.languages.get(key, channel_id)
+        if language is None:
+            language = self.languages.put(key, *await process_pool.detect_language(work.path), channel_id=channel_id)
+        return language
@@ -0,0 +1,121 @@
+import subprocess
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from metrics import metrics
+from transcribers.audio import SAMPLE_RATE, AudioSource, load_audio
+
+PCM_FORMATS = {"float32": "f32le", "int16": "s16le"}  # numpy dtype -> ffmpeg raw format
+
+
+@dataclass(slots=True)
+class PcmAudio:
+    """
+    Decoded mono audio backed by a memory-mapped file, slicing does not read the whole file into memory.
+    """
+
+    path: Path
+    samples: np.ndarray  # np.memmap, empty array for an empty file
+    sampling_rate: int = SAMPLE_RATE
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sampling_rate
+
+    def slice(self, start: float, end: float | None = None) -> np.ndarray:
+        """
+        Returns samples between start and end seconds as float32 in [-1, 1].
+        :param start: start in seconds
+        :param end: end in seconds, the end of the audio by default
+        :return: zero-copy view for float32 stores, converted copy of the slice for int16 ones
+        """
+        first = max(0, int(start * self.sampling_rate))
+        last = len(self.samples) if end is None else min(len(self.samples), int(end * self.sampling_rate))
+        window = self.samples[first:last]
+        if window.dtype == np.int16:
+            return window.astype(np.float32) / 32768
+        return window
+
+
+class AudioStore:
+    """
+    Decodes a local file once into raw 16 kHz mono PCM next to the source (<name>.<rate>.<dtype>.pcm)
+    and memory-maps it: repeated passes (language detection, VAD, chunking, re-runs with another model)
+    read zero-copy slices instead of decoding the file again, RSS stays flat whatever the file length.
+    ffmpeg writes the PCM file directly, decoded audio never goes through Python memory.
+    A PCM file older than its source is decoded again.
+    internal settings: sample dtype (float32 - zero-copy slices, int16 - half the disk space)
+    """
+
+    SUFFIX = ".pcm"
+
+    def __init__(self, dtype: str = "float32", sampling_rate: int = SAMPLE_RATE):
+        if dtype not in PCM_FORMATS:
+            raise ValueError(f"Unsupported PCM dtype {dtype}, expected one of {list(PCM_FORMATS)}")
+        self.dtype = dtype
+        self.sampling_rate = sampling_rate
+
+    def path_for(self, source: Path) -> Path:
+        return source.with_name(f"{source.name}.{self.sampling_rate}.{self.dtype}{self.SUFFIX}")
+
+    def is_fresh(self, source: Path) -> bool:
+        pcm_path = self.path_for(source)
+        return pcm_path.is_file() and pcm_path.stat().st_mtime >= source.stat().st_mtime
+
+    def open(self, source: Path) -> PcmAudio:
+        """
+        Returns memory-mapped decoded audio of the source, decoding it on the first call.
+        :param source: ffmpeg-readable audio/video file
+        :return: PcmAudio
+        """
+        pcm_path = self.path_for(source)
+        fresh = self.is_fresh(source)
+        metrics.inc("cache_lookups_total", cache="pcm", result="hit" if fresh else "miss")
+        if not fresh:
+            self._decode(source, pcm_path)
+        if pcm_path.stat().st_size:
+            samples = np.memmap(pcm_path, dtype=self.dtype, mode="r")
+        else:
+            samples = np.empty(0, dtype=self.dtype)  # an empty file can not be memory-mapped
+        return PcmAudio(path=pcm_path, samples=samples, sampling_rate=self.sampling_rate)
+
+    def _decode(self, source: Path, pcm_path: Path) -> None:
+        tmp_path = pcm_path.with_suffix(".tmp")
+        command = [
+            "ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", source.__fspath__(),
+            "-f", PCM_FORMATS[self.dtype], "-ac", "1", "-ar", str(self.sampling_rate), tmp_path.__fspath__(),
+        ]  # fmt: skip
+        with metrics.timer("ffmpeg_decode_seconds", target="pcm_store"):
+            result = subprocess.run(command, capture_output=True, check=False)  # noqa S603
+        if result.returncode != 0:
+            tmp_path.unlink(missing_ok=True)
+            logger.error(f"ffmpeg failed to decode {source}: {result.stderr.decode(errors='ignore').strip()}")
+            raise RuntimeError(f"Unable to decode {source}")
+        tmp_path.replace(pcm_path)
+        logger.info(f"Decoded audio of {source.name} stored at {pcm_path}: {pcm_path.stat().st_size / 2**20:.1f} MB")
+
+    def remove(self, source: Path) -> None:
+        self.path_for(source).unlink(missing_ok=True)
+
+    @contextmanager
+    def samples(self, source: AudioSource) -> Iterator[np.ndarray]:
+        """
+        Float32 samples of any AudioSource: a file is decoded to memory-mapped PCM instead of memory,
+        the PCM file is removed afterwards unless it was stored before. Arrays and file-like objects are loaded as is.
+        :param source: file, decoded array or file-like object
+        :return: context manager of np.ndarray of shape (samples,)
+        """
+        if not isinstance(source, Path):
+            yield load_audio(source)
+            return
+        stored = self.is_fresh(source)
+        try:
+            yield self.open(source).slice(0)
+        finally:
+            if not stored:
+                self.remove(source)
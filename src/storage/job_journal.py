@@ -0,0 +1,157 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import asdict
+from enum import StrEnum
+from pathlib import Path
+
+from loguru import logger
+
+from objects import YouTubeVideo
+
+
+class VideoState(StrEnum):
+    QUEUED = "queued"
+    DOWNLOADED = "downloaded"
+    CAPTIONED = "captioned"
+    TRANSCRIBED = "transcribed"
+    FAILED = "failed"
+
+
+# states finishing a video in a download mode, the text mode is done with captions or a transcript
+DONE_STATES: dict[str, tuple[VideoState, ...]] = {
+    "text": (VideoState.CAPTIONED, VideoState.TRANSCRIBED),
+    "audio": (VideoState.DOWNLOADED,),
+    "video": (VideoState.DOWNLOADED,),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    batch TEXT NOT NULL,
+    source TEXT NOT NULL,
+    videos INTEGER NOT NULL,
+    collected_at REAL NOT NULL,
+    PRIMARY KEY (batch, source)
+);
+CREATE TABLE IF NOT EXISTS videos (
+    batch TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    video TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (batch, video_id)
+);
+"""
+
+
+class JobJournal:
+    """
+    Durable state of a batch run in an embedded SQLite database, so a restarted run continues where it stopped.
+    Collected sources (channels, link lists) are stored with their video metadata and are not fetched again,
+    every video moves queued -> downloaded -> captioned/transcribed or failed, failures count attempts.
+    The database is in WAL mode: every state change is a short transaction that survives a crash of the process,
+    and the journal can be read (e.g. with the sqlite3 CLI) while a run is writing to it.
+    internal settings: database path, batch name
+    """
+
+    def __init__(self, path_: Path, batch: str):
+        self.path = path_
+        self.batch = batch
+        self._lock = threading.Lock()
+        path_.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path_, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")  # durable against process crashes, cheap commits
+        self._db.executescript(_SCHEMA)
+        logger.info(f"JobJournal of batch {batch} opened: {self.counts()}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def collected(self, source: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM sources WHERE batch = ? AND source = ?", (self.batch, source)
+            ).fetchone()
+        return row is not None
+
+    def add_source(self, source: str, videos: Iterable[YouTubeVideo]) -> int:
+        """
+        Queues the videos of a collected source, videos already in the batch keep their state.
+        :param source: channel link or another source name
+        :param videos: collected videos of the source
+        :return: amount of newly queued videos
+        """
+        now = time.time()
+        rows = [(self.batch, video.id, json.dumps(asdict(video)), VideoState.QUEUED, now) for video in videos if video]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                before = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO videos (batch, video_id, video, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                added = self._db.total_changes - before
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sources (batch, source, videos, collected_at) VALUES (?, ?, ?, ?)",
+                    (self.batch, source, len(rows), now),
+                )
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        logger.info(f"Source {source} collected: {len(rows)} videos, {added} new")
+        return added
+
+    def mark(self, video_id: str, state: VideoState, error: str | None = None) -> None:
+        """
+        Stores the state of a video, a failure also counts an attempt.
+        :param video_id: YouTube video id
+        :param state: new VideoState
+        :param error: failure description
+        :return: None
+        """
+        attempt = int(state == VideoState.FAILED)
+        with self._lock:
+            self._db.execute(
+                "UPDATE videos SET state = ?, error = ?, attempts = attempts + ?, updated_at = ? "
+                "WHERE batch = ? AND video_id = ?",
+                (state, error, attempt, time.time(), self.batch, video_id),
+            )
+
+    def state(self, video_id: str) -> VideoState | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM videos WHERE batch = ? AND video_id = ?", (self.batch, video_id)
+            ).fetchone()
+        return VideoState(row[0]) if row else None
+
+    def pending(self, done: Iterable[VideoState], max_attempts: int) -> list[tuple[YouTubeVideo, VideoState]]:
+        """
+        Videos left to process: not done yet and not failed max_attempts times.
+        :param done: states finishing a video, see DONE_STATES
+        :param max_attempts: failures after which a video is given up
+        :return: list of (YouTubeVideo, its current VideoState) in collection order
+        """
+        done = tuple(done)
+        placeholders = ", ".join("?" * len(done))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT video, state FROM videos WHERE batch = ? AND state NOT IN ({placeholders}) "  # noqa S608
+                "AND attempts < ? ORDER BY rowid",
+                (self.batch, *done, max_attempts),
+            ).fetchall()
+        return [(YouTubeVideo(**json.loads(video)), VideoState(state)) for video, state in rows]
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT state, COUNT(*) FROM videos WHERE batch = ? GROUP BY state", (self.batch,)
+            ).fetchall()
+        return dict(rows)
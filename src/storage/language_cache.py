@@ -0,0 +1,109 @@
+import json
+import threading
+from collections import Counter
+from pathlib import Path
+
+from loguru import logger
+
+from metrics import metrics
+
+
+class LanguageCache:
+    """
+    Persistent cache of detected spoken languages, so detection runs once per file and, optionally, per channel.
+    Per-source results are keyed by a YouTube video id or a local file identity (path, size, mtime).
+    Every detection of a channel video is a vote, once channel_votes videos are detected
+    the majority language is used for the rest of the channel and its videos skip detection.
+    Records are appended to a log file replayed at startup, like the TranscriptCache index.
+    internal settings: votes to fix a channel language (0 - per-file detection only), min detection probability
+    """
+
+    LOG_FILE = "languages.log"
+
+    def __init__(self, directory: Path, channel_votes: int = 5, min_probability: float = 0.5):
+        self.dir = directory
+        self.channel_votes = channel_votes
+        self.min_probability = min_probability
+        self._languages: dict[str, str] = {}
+        self._votes: dict[str, Counter[str]] = {}
+        self._lock = threading.Lock()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+        logger.info(f"LanguageCache initialized: {len(self._languages)} sources, {len(self._votes)} channels")
+
+    @staticmethod
+    def key_for_video(video_id: str) -> str:
+        return f"youtube:{video_id}"
+
+    @staticmethod
+    def key_for_file(path: Path) -> str:
+        stat = path.stat()
+        return f"file:{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def _load(self) -> None:
+        log = self.dir / self.LOG_FILE
+        if not log.is_file():
+            return
+        with log.open(encoding="utf-8") as file:
+            for line in file:
+                try:
+                    key, language, channel_id = json.loads(line)
+                except (ValueError, TypeError):
+                    logger.warning(f"Skipping corrupted language record: {line.strip()}")
+                    continue
+                self._record(key, language, channel_id)
+
+    def _record(self, key: str, language: str, channel_id: str | None) -> None:
+        if key in self._languages:
+            return
+        self._languages[key] = language
+        if channel_id:
+            self._votes.setdefault(channel_id, Counter())[language] += 1
+
+    def channel_language(self, channel_id: str | None) -> str | None:
+        """
+        Majority language of the channel, known once channel_votes of its videos are detected.
+        :param channel_id: YouTube channel id
+        :return: language code or None
+        """
+        if not channel_id or not self.channel_votes:
+            return None
+        with self._lock:
+            votes = self._votes.get(channel_id)
+            if not votes or votes.total() < self.channel_votes:
+                return None
+            language, count = votes.most_common(1)[0]
+        return language if count * 2 > votes.total() else None
+
+    def get(self, key: str, channel_id: str | None = None) -> str | None:
+        """
+        Looks up the language of a source: its own detection result first, then the channel majority.
+        :param key: source key, see key_for_video and key_for_file
+        :param channel_id: YouTube channel id of the source
+        :return: language code or None, when the language has to be detected
+        """
+        with self._lock:
+            language = self._languages.get(key)
+        language = language or self.channel_language(channel_id)
+        metrics.inc("cache_lookups_total", cache="language", result="hit" if language else "miss")
+        return language
+
+    def put(self, key: str, language: str | None, probability: float, channel_id: str | None = None) -> str | None:
+        """
+        Stores a detection result, an uncertain one is dropped: the model then detects the language itself.
+        :param key: source key
+        :param language: detected language code
+        :param probability: detection probability
+        :param channel_id: YouTube channel id of the source, the result counts as its vote
+        :return: language to transcribe with, None if the detection is not reliable
+        """
+        if language is None or probability < self.min_probability:
+            logger.info(f"Language of {key} is uncertain ({language}, {probability:.2f}), not cached")
+            return None
+        with self._lock:
+            if key not in self._languages:
+                self._record(key, language, channel_id)
+                with (self.dir / self.LOG_FILE).open("a", encoding="utf-8") as file:
+                    file.write(json.dumps([key, language, channel_id]) + "\n")
+        logger.info(f"Language of {key} detected: {language} with probability {probability:.2f}")
+        return language
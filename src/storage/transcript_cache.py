@@ -0,0 +1,189 @@
+import copy
+import hashlib
+import json
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from metrics import metrics
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    size: int
+    last_access: float
+
+
+class TranscriptCache:
+    """
+    Persistent content-addressed cache of transcripts.
+    Keys are derived from a YouTube video id or an audio content hash plus model name ("captions" for captions),
+    see key_for_video for the language part,
+    values are stored as text files under objects/<2 first key chars>/<key>.txt.
+    The index is an append-only log (put/hit/del records) replayed at startup and compacted when it grows,
+    so startup reads one small file and every update is a single appended line.
+    Entries are evicted in least-recently-used order once the total size exceeds max_bytes.
+    internal settings: max size in bytes, force (bypass reads, results are still stored)
+    """
+
+    INDEX_FILE = "index.log"
+
+    def __init__(self, directory: Path, max_bytes: int = 1 << 30, force: bool = False):
+        self.dir = directory
+        self.max_bytes = max_bytes
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        (self.dir / "objects").mkdir(parents=True, exist_ok=True)
+        self._load_index()
+        logger.info(f"TranscriptCache initialized: {len(self._entries)} entries, {self.size} bytes")
+
+    @property
+    def size(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    @staticmethod
+    def key_for_video(video_id: str, model: str, language: str | None = None) -> str:
+        """
+        Cache key of a video transcript.
+        The language is only passed for captions, where each language is a separate track.
+        Model transcripts are stored under "auto" even after the language was detected or taken from the channel:
+        the model writes the spoken language anyway, and the key must be known before any detection runs.
+        :param video_id: YouTube video id
+        :param model: Whisper model, "captions" for captions
+        :param language: requested captions language
+        :return: hex key
+        """
+        return hashlib.sha256(f"youtube:{video_id}|{model}|{language or 'auto'}".encode()).hexdigest()
+
+    @staticmethod
+    def key_for_file(path: Path, model: str) -> str:
+        """
+        Cache key of a local file transcript, by content hash; the language is not a part of it, see key_for_video.
+        """
+        digest = hashlib.sha256()
+        with path.open("rb") as file:
+            while chunk := file.read(1 << 20):
+                digest.update(chunk)
+        # "auto" keeps the keys of the entries stored when the key had a language part
+        return hashlib.sha256(f"file:{digest.hexdigest()}|{model}|auto".encode()).hexdigest()
+
+    def bypassed(self) -> "TranscriptCache":
+        """
+        View of this cache for one forced run: reads miss, puts land in the shared index, entries and lock,
+        so a daemon serving forced and regular jobs keeps a single writer of the index log.
+        :return: TranscriptCache sharing the state of this one with force set
+        """
+        view = copy.copy(self)
+        view.force = True
+        return view
+
+    def _object_path(self, key: str) -> Path:
+        return self.dir / "objects" / key[:2] / f"{key}.txt"
+
+    def _load_index(self) -> None:
+        index = self.dir / self.INDEX_FILE
+        if not index.is_file():
+            return
+        records = 0
+        with index.open(encoding="utf-8") as file:
+            for line in file:
+                records += 1
+                try:
+                    action, key, *values = json.loads(line)
+                except (ValueError, TypeError):
+                    logger.warning(f"Skipping corrupted cache index record: {line.strip()}")
+                    continue
+                if action == "put":
+                    self._entries[key] = CacheEntry(size=values[0], last_access=values[1])
+                elif action == "hit" and key in self._entries:
+                    self._entries[key].last_access = values[0]
+                elif action == "del":
+                    self._entries.pop(key, None)
+        for key in sorted(self._entries, key=lambda key_: self._entries[key_].last_access):
+            self._entries.move_to_end(key)
+        if records > 2 * len(self._entries) + 100:
+            self._compact()
+
+    def _compact(self) -> None:
+        index = self.dir / self.INDEX_FILE
+        tmp_index = index.with_suffix(".tmp")
+        with tmp_index.open("w", encoding="utf-8") as file:
+            for key, entry in self._entries.items():
+                file.write(json.dumps(["put", key, entry.size, entry.last_access]) + "\n")
+        tmp_index.replace(index)
+
+    def _append(self, *record: str | float) -> None:
+        with (self.dir / self.INDEX_FILE).open("a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+
+    def get_path(self, key: str) -> Path | None:
+        """
+        Looks the key up, a hit refreshes its LRU position.
+        :param key: cache key
+        :return: Path of the cached transcript or None
+        """
+        if self.force:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            path_ = self._object_path(key)
+            if entry is None or not path_.is_file():
+                self.misses += 1
+                metrics.inc("cache_lookups_total", cache="transcript", result="miss")
+                return None
+            self.hits += 1
+            metrics.inc("cache_lookups_total", cache="transcript", result="hit")
+            entry.last_access = time.time()
+            self._entries.move_to_end(key)
+            self._append("hit", key, entry.last_access)
+            return path_
+
+    def copy_to(self, key: str, target: Path) -> bool:
+        """
+        Materializes a cached transcript at target.
+        :param key: cache key
+        :param target: where to put the transcript
+        :return: True on cache hit
+        """
+        path_ = self.get_path(key)
+        if path_ is None:
+            return False
+        shutil.copyfile(path_, target)
+        logger.info(f"Transcript taken from cache: {target}")
+        return True
+
+    def put(self, key: str, source: Path) -> None:
+        """
+        Stores a transcript file in the cache and evicts old entries if the size limit is exceeded.
+        :param key: cache key
+        :param source: transcript file to store
+        :return: None
+        """
+        path_ = self._object_path(key)
+        path_.parent.mkdir(exist_ok=True)
+        tmp_path = path_.with_suffix(".tmp")
+        shutil.copyfile(source, tmp_path)
+        tmp_path.replace(path_)
+        with self._lock:
+            entry = CacheEntry(size=path_.stat().st_size, last_access=time.time())
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._append("put", key, entry.size, entry.last_access)
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self.size
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            self._object_path(key).unlink(missing_ok=True)
+            self._append("del", key)
+            total -= entry.size
+            logger.info(f"Transcript {key} evicted from cache")
@@ -0,0 +1,330 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+
+class UnitKind(StrEnum):
+    DOWNLOAD = "download"  # captions, or the audio downloaded to the shared directory
+    TRANSCRIBE = "transcribe"  # inference on a downloaded audio file
+
+
+class UnitState(StrEnum):
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+
+# unit kinds a node claims, download-only nodes need no models, inference nodes no YouTube access
+ROLES: dict[str, tuple[UnitKind, ...]] = {
+    "download": (UnitKind.DOWNLOAD,),
+    "inference": (UnitKind.TRANSCRIBE,),
+    "all": (UnitKind.DOWNLOAD, UnitKind.TRANSCRIBE),
+}
+
+
+@dataclass(slots=True)
+class WorkUnit:
+    id: int
+    batch: str
+    kind: UnitKind
+    key: str  # video id, unique per batch and kind
+    payload: dict[str, Any]
+    attempts: int = 0
+
+
+class WorkStore(ABC):
+    """
+    Shared store of work units claimed by worker nodes.
+    A claimed unit is leased to one worker until lease_until, the worker extends the lease with heartbeats.
+    A unit whose lease expired (the worker died or lost the store) is claimable again, every claim counts an attempt.
+    Only the current lease holder can finish a unit, a worker finishing a reclaimed unit is told it lost it.
+    Lease deadlines are wall-clock times written by different hosts: leases must be much longer than the clock skew.
+    """
+
+    @abstractmethod
+    def add_units(self, batch: str, kind: UnitKind, units: Iterable[tuple[str, dict[str, Any]]]) -> int:
+        """
+        Queues units, units already in the batch keep their state.
+        :param batch: batch name
+        :param kind: UnitKind of the units
+        :param units: (key, JSON-compatible payload) pairs
+        :return: amount of newly queued units
+        """
+
+    @abstractmethod
+    def claim(
+        self, worker: str, kinds: Iterable[UnitKind], limit: int, lease_seconds: float, max_attempts: int
+    ) -> list[WorkUnit]:
+        """
+        Leases pending units and units with expired leases to the worker, oldest first.
+        Expired units out of attempts are failed instead.
+        :param worker: worker id
+        :param kinds: UnitKind the worker processes, see ROLES
+        :param limit: max amount of units to lease
+        :param lease_seconds: lease duration
+        :param max_attempts: claims after which a unit is given up
+        :return: list of leased WorkUnit
+        """
+
+    @abstractmethod
+    def heartbeat(self, worker: str, role: str, unit_ids: Iterable[int], lease_seconds: float) -> set[int]:
+        """
+        Marks the worker alive and extends the leases it holds.
+        :param worker: worker id
+        :param role: worker role, see ROLES
+        :param unit_ids: ids of the units the worker is processing
+        :param lease_seconds: new lease duration from now
+        :return: ids of the units still leased to the worker, the others were reclaimed
+        """
+
+    @abstractmethod
+    def complete(self, unit: WorkUnit, worker: str, follow_up: tuple[UnitKind, dict[str, Any]] | None = None) -> bool:
+        """
+        Finishes a unit, atomically with queueing its follow-up unit (e.g. the transcription of a download).
+        :param unit: leased WorkUnit
+        :param worker: worker id
+        :param follow_up: (kind, payload) of the next unit of the same key
+        :return: False when the lease was lost and the result is discarded
+        """
+
+    @abstractmethod
+    def fail(self, unit: WorkUnit, worker: str, error: str, max_attempts: int) -> bool:
+        """
+        Returns a unit to the queue, or fails it for good when it is out of attempts.
+        :return: False when the lease was lost
+        """
+
+    @abstractmethod
+    def unfinished(self, kinds: Iterable[UnitKind] = tuple(UnitKind)) -> int:
+        """
+        :param kinds: UnitKind to count
+        :return: amount of pending and leased units of the kinds
+        """
+
+    @abstractmethod
+    def report(self, window: float = 300.0) -> dict[str, Any]:
+        """
+        State of the cluster: units per kind and state, nodes with their liveness,
+        throughput of the last window seconds per kind and per node.
+        """
+
+    def close(self) -> None:
+        return None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    error TEXT,
+    finished_at REAL,
+    UNIQUE (batch, kind, key)
+);
+CREATE INDEX IF NOT EXISTS units_claim ON units (state, kind, lease_until);
+CREATE INDEX IF NOT EXISTS units_finished ON units (finished_at);
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+class SqliteWorkStore(WorkStore):
+    """
+    WorkStore in an SQLite database on a filesystem shared by the nodes (NFS, SMB, a local disk for one host).
+    Claims run in BEGIN IMMEDIATE transactions, so concurrent workers never lease the same unit.
+    The rollback journal is used by default: WAL needs shared memory and does not work over network filesystems,
+    it can be enabled when all the workers run on one host.
+    internal settings: database path, WAL mode, lock wait timeout
+    """
+
+    def __init__(self, path_: Path, wal: bool = False, timeout: float = 30.0):
+        self.path = path_
+        self._lock = threading.Lock()
+        path_.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path_, isolation_level=None, check_same_thread=False, timeout=timeout)
+        self._db.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self._db.execute("PRAGMA synchronous=NORMAL" if wal else "PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+        logger.info(f"SqliteWorkStore opened: {path_}, {self.unfinished()} units unfinished")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _transaction(self, statements: Callable[[sqlite3.Connection], Any]) -> Any:  # noqa ANN401
+        # the write lock is taken at BEGIN, so the reads of the transaction see no concurrent writes
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._db)
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        return result
+
+    def add_units(self, batch: str, kind: UnitKind, units: Iterable[tuple[str, dict[str, Any]]]) -> int:
+        rows = [(batch, kind, key, json.dumps(payload), UnitState.PENDING) for key, payload in units]
+
+        def insert(db: sqlite3.Connection) -> int:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO units (batch, kind, key, payload, state) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            return db.total_changes - before
+
+        added = self._transaction(insert)
+        logger.info(f"Batch {batch}: {added} of {len(rows)} {kind} units queued")
+        return added
+
+    def claim(
+        self, worker: str, kinds: Iterable[UnitKind], limit: int, lease_seconds: float, max_attempts: int
+    ) -> list[WorkUnit]:
+        kinds = tuple(kinds)
+        placeholders = ", ".join("?" * len(kinds))
+
+        def lease(db: sqlite3.Connection) -> list[tuple]:
+            now = time.time()
+            db.execute(
+                "UPDATE units SET state = ?, error = 'lease expired', finished_at = ? "
+                "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (UnitState.FAILED, now, UnitState.LEASED, now, max_attempts),
+            )
+            rows = db.execute(
+                f"SELECT id, batch, kind, key, payload, attempts FROM units WHERE kind IN ({placeholders}) "  # noqa S608
+                "AND (state = ? OR (state = ? AND lease_until < ?)) ORDER BY id LIMIT ?",
+                (*kinds, UnitState.PENDING, UnitState.LEASED, now, limit),
+            ).fetchall()
+            db.executemany(
+                "UPDATE units SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(UnitState.LEASED, worker, now + lease_seconds, row[0]) for row in rows],
+            )
+            return rows
+
+        rows = self._transaction(lease)
+        return [
+            WorkUnit(id_, batch, UnitKind(kind), key, json.loads(payload), attempts + 1)
+            for id_, batch, kind, key, payload, attempts in rows
+        ]
+
+    def heartbeat(self, worker: str, role: str, unit_ids: Iterable[int], lease_seconds: float) -> set[int]:
+        unit_ids = list(unit_ids)
+
+        def extend(db: sqlite3.Connection) -> set[int]:
+            now = time.time()
+            db.execute(
+                "INSERT INTO workers (worker, role, started_at, heartbeat_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (worker) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (worker, role, now, now),
+            )
+            db.executemany(
+                "UPDATE units SET lease_until = ? WHERE id = ? AND worker = ? AND state = ?",
+                [(now + lease_seconds, id_, worker, UnitState.LEASED) for id_ in unit_ids],
+            )
+            placeholders = ", ".join("?" * len(unit_ids))
+            held = db.execute(
+                f"SELECT id FROM units WHERE id IN ({placeholders}) AND worker = ? AND state = ?",  # noqa S608
+                (*unit_ids, worker, UnitState.LEASED),
+            ).fetchall()
+            return {row[0] for row in held}
+
+        return self._transaction(extend)
+
+    def _finish(self, db: sqlite3.Connection, unit: WorkUnit, worker: str, state: UnitState, error: str | None) -> bool:
+        # a pending unit is not finished, it only keeps the error of its last attempt
+        finished_at = None if state == UnitState.PENDING else time.time()
+        cursor = db.execute(
+            "UPDATE units SET state = ?, error = ?, lease_until = NULL, finished_at = ? "
+            "WHERE id = ? AND worker = ? AND state = ?",
+            (state, error, finished_at, unit.id, worker, UnitState.LEASED),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, unit: WorkUnit, worker: str, follow_up: tuple[UnitKind, dict[str, Any]] | None = None) -> bool:
+        def finish(db: sqlite3.Connection) -> bool:
+            if not self._finish(db, unit, worker, UnitState.DONE, None):
+                return False
+            if follow_up is not None:
+                kind, payload = follow_up
+                db.execute(
+                    "INSERT OR IGNORE INTO units (batch, kind, key, payload, state) VALUES (?, ?, ?, ?, ?)",
+                    (unit.batch, kind, unit.key, json.dumps(payload), UnitState.PENDING),
+                )
+            return True
+
+        completed = self._transaction(finish)
+        if not completed:
+            logger.warning(f"Unit {unit.kind} {unit.key} was reclaimed from {worker}, its result is discarded")
+        return completed
+
+    def fail(self, unit: WorkUnit, worker: str, error: str, max_attempts: int) -> bool:
+        state = UnitState.FAILED if unit.attempts >= max_attempts else UnitState.PENDING
+        return self._transaction(lambda db: self._finish(db, unit, worker, state, error))
+
+    def unfinished(self, kinds: Iterable[UnitKind] = tuple(UnitKind)) -> int:
+        kinds = tuple(kinds)
+        placeholders = ", ".join("?" * len(kinds))
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT COUNT(*) FROM units WHERE state IN (?, ?) AND kind IN ({placeholders})",  # noqa S608
+                (UnitState.PENDING, UnitState.LEASED, *kinds),
+            ).fetchone()
+        return row[0]
+
+    def report(self, window: float = 300.0) -> dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            states = self._db.execute("SELECT kind, state, COUNT(*) FROM units GROUP BY kind, state").fetchall()
+            finished = self._db.execute(
+                "SELECT worker, kind, COUNT(*) FROM units WHERE state = ? AND finished_at >= ? GROUP BY worker, kind",
+                (UnitState.DONE, now - window),
+            ).fetchall()
+            workers = self._db.execute("SELECT worker, role, started_at, heartbeat_at FROM workers").fetchall()
+            leased = dict(
+                self._db.execute(
+                    "SELECT worker, COUNT(*) FROM units WHERE state = ? GROUP BY worker", (UnitState.LEASED,)
+                ).fetchall()
+            )
+        units: dict[str, dict[str, int]] = {}
+        for kind, state, count in states:
+            units.setdefault(kind, {})[state] = count
+        per_kind: dict[str, float] = {}
+        per_node: dict[str, float] = {}
+        for worker, kind, count in finished:
+            per_kind[kind] = per_kind.get(kind, 0) + count / window * 60
+            per_node[worker] = per_node.get(worker, 0) + count / window * 60
+        return {
+            "units": units,
+            "nodes": {
+                worker: {
+                    "role": role,
+                    "uptime_seconds": round(now - started_at, 1),
+                    "heartbeat_age_seconds": round(now - heartbeat_at, 1),
+                    "leased": leased.get(worker, 0),
+                    "units_per_min": round(per_node.get(worker, 0.0), 2),
+                }
+                for worker, role, started_at, heartbeat_at in workers
+            },
+            "units_per_min": {kind: round(rate, 2) for kind, rate in per_kind.items()},
+            "window_seconds": window,
+        }
@@ -1,5 +1,11 @@
+import asyncio
+import threading
 from abc import ABC, abstractmethod
-from pathlib import Path
+from collections.abc import AsyncIterator, Iterator
+from contextlib import closing
+
+from objects import TranscriptionSegment
+from transcribers.audio import AudioSource
 
 
 class AbstractTranscriber(ABC):
@@ -25,5 +31,69 @@ class AbstractTranscriber(ABC):
         ]
 
     @abstractmethod
-    def transcribe(self, path: Path) -> str:
-        pass
+    def transcribe_stream(
+        self, path: AudioSource, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        """
+        Lazily yields transcription segments as the model produces them.
+        Backends decoding lazily hold their model replica (see ModelPool) until the generator is exhausted or closed,
+        a consumer stopping early should close it rather than keep it around.
+        :param path: source file path, decoded 16 kHz mono float32 array or file-like object with encoded audio
+        :param start: offset in seconds to start transcription from (used to resume)
+        :param language: spoken language code, the model detects it when not given
+        :return: generator of TranscriptionSegment
+        """
+
+    def detect_language(self, path: AudioSource) -> tuple[str | None, float]:
+        """
+        Detects the spoken language, so it can be cached and passed to transcribe_stream.
+        Backends without a separate detection step return (None, 0.0) and detect the language while transcribing.
+        :param path: source file path, decoded array or file-like object
+        :return: tuple(language code or None, probability)
+        """
+        return None, 0.0
+
+    def transcribe(self, path: AudioSource, language: str | None = None) -> str:
+        return "".join(segment.text for segment in self.transcribe_stream(path, language=language))
+
+    async def atranscribe_stream(
+        self, path: AudioSource, start: float = 0.0, buffer: int = 32, language: str | None = None
+    ) -> AsyncIterator[TranscriptionSegment]:
+        """
+        Async adapter over transcribe_stream: inference runs in a separate thread,
+        segments are passed to the event loop through a bounded queue.
+        :param path: source file path, decoded array or file-like object
+        :param start: offset in seconds to start transcription from
+        :param buffer: max amount of segments waiting to be consumed
+        :param language: spoken language code, detected by the model when not given
+        :return: async generator of TranscriptionSegment
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+        done = object()
+        stop = threading.Event()
+
+        def produce() -> None:
+            try:
+                # closed right away when the consumer stops early, so the model replica is released
+                with closing(self.transcribe_stream(path, start=start, language=language)) as segments:
+                    for segment in segments:
+                        if stop.is_set():
+                            break
+                        asyncio.run_coroutine_threadsafe(queue.put(segment), loop).result()
+                asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+            except Exception as error:  # noqa BLE001 raised again by the consumer, in the event loop
+                asyncio.run_coroutine_threadsafe(queue.put(error), loop).result()
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while (item := await queue.get()) is not done:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait({producer}, timeout=0.05)
@@ -0,0 +1,175 @@
+import asyncio
+import subprocess
+import wave
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+from loguru import logger
+
+SAMPLE_RATE = 16000
+
+# what transcribers accept: a file, a decoded 16 kHz mono float32 array or a file-like object with encoded audio
+AudioSource = Path | np.ndarray | BinaryIO
+
+
+async def resample_to_wav(path: Path, target: Path | None = None) -> Path:
+    """
+    Decodes any ffmpeg-readable file to 16 kHz mono PCM WAV, the format Whisper models work with,
+    so the transcriber does not spend inference time on decoding and resampling.
+    :param path: source audio/video file
+    :param target: output path, source path with .wav suffix by default
+    :return: Path of the decoded file
+    """
+    target = target or path.with_suffix(".wav")
+    if target == path:
+        target = path.with_name(f"{path.stem}_16k.wav")
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-nostdin",
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        path.__fspath__(),
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-c:a",
+        "pcm_s16le",
+        target.__fspath__(),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        target.unlink(missing_ok=True)
+        logger.error(f"ffmpeg failed to decode {path}: {stderr.decode(errors='ignore').strip()}")
+        raise RuntimeError(f"Unable to decode {path}")
+
+    return target
+
+
+async def probe_duration(path: Path) -> float:
+    """
+    Reads the media duration with ffprobe.
+    Falls back to a bitrate-based estimate from the file size (128 kbps) when ffprobe is not available.
+    :param path: source audio/video file
+    :return: duration in seconds
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffprobe",
+            "-v",
+            "error",
+            "-show_entries",
+            "format=duration",
+            "-of",
+            "csv=p=0",
+            path.__fspath__(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await process.communicate()
+        if process.returncode == 0:
+            return float(stdout.decode().strip())
+    except (OSError, ValueError) as error:
+        logger.warning(f"Unable to probe duration of {path}: {error!r}")
+
+    return path.stat().st_size / (128_000 / 8)
+
+
+def decode_audio(
+    path: Path | str | BinaryIO,
+    sampling_rate: int = SAMPLE_RATE,
+    headers: dict[str, str] | None = None,
+    duration: float | None = None,
+) -> np.ndarray:
+    """
+    Decodes any ffmpeg-readable source to a mono float32 array in [-1, 1].
+    :param path: source audio/video file, media URL or file-like object with encoded audio
+    :param sampling_rate: target sampling rate
+    :param headers: HTTP headers for a URL source
+    :param duration: decode only the first seconds of the source, the whole source by default
+    :return: np.ndarray of shape (samples,)
+    """
+    data = None
+    if isinstance(path, Path):
+        source = path.__fspath__()
+    elif isinstance(path, str):
+        source = path
+    else:
+        source, data = "pipe:0", path.read()
+    duration_args = ["-t", str(duration)] if duration is not None else []
+    header_args = ["-headers", "".join(f"{key}: {value}\r\n" for key, value in headers.items())] if headers else []
+    command = [
+        "ffmpeg", "-loglevel", "error", *header_args, "-i", source,
+        *duration_args, "-f", "f32le", "-ac", "1", "-ar", str(sampling_rate), "-",
+    ]  # fmt: skip
+    if data is None:
+        command.insert(1, "-nostdin")
+    result = subprocess.run(command, input=data, capture_output=True, check=False)  # noqa S603
+    if result.returncode != 0:
+        logger.error(f"ffmpeg failed to decode {source}: {result.stderr.decode(errors='ignore').strip()}")
+        raise RuntimeError(f"Unable to decode {source}")
+
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def load_audio(audio: AudioSource, sampling_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Returns decoded audio of any AudioSource, arrays are passed as is.
+    :param audio: file, decoded array or file-like object
+    :param sampling_rate: target sampling rate for encoded sources
+    :return: np.ndarray of shape (samples,)
+    """
+    if isinstance(audio, np.ndarray):
+        return audio.astype(np.float32, copy=False)
+    return decode_audio(audio, sampling_rate)
+
+
+def load_head(audio: AudioSource, seconds: float, sampling_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Returns decoded first seconds of any AudioSource, files are not decoded past that point.
+    A file-like object is rewound afterwards, so it can still be transcribed.
+    :param audio: file, decoded array or file-like object
+    :param seconds: duration to decode
+    :param sampling_rate: target sampling rate for encoded sources
+    :return: np.ndarray of shape (samples,)
+    """
+    if isinstance(audio, np.ndarray):
+        return load_audio(audio)[: int(seconds * sampling_rate)]
+    if isinstance(audio, Path):
+        return decode_audio(audio, sampling_rate, duration=seconds)
+    position = audio.tell()
+    try:
+        return decode_audio(audio, sampling_rate, duration=seconds)
+    finally:
+        audio.seek(position)
+
+
+def audio_name(audio: AudioSource) -> str:
+    if isinstance(audio, Path):
+        return audio.name
+    if isinstance(audio, np.ndarray):
+        return f"<{len(audio) / SAMPLE_RATE:.1f}s buffer>"
+    return getattr(audio, "name", "<stream>")
+
+
+def write_wav(audio: np.ndarray, target: Path, sampling_rate: int = SAMPLE_RATE) -> Path:
+    """
+    Saves a mono float32 array as 16-bit PCM WAV.
+    :param audio: np.ndarray of shape (samples,)
+    :param target: output path
+    :param sampling_rate: sampling rate of the audio
+    :return: Path of the saved file
+    """
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(target.__fspath__(), "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(sampling_rate)
+        file.writeframes(pcm.tobytes())
+
+    return target
@@ -0,0 +1,108 @@
+import bisect
+import math
+from dataclasses import dataclass, field
+
+from objects import TranscriptionSegment
+
+WINDOW_SECONDS = 30.0  # Whisper encoder input length, one batch element
+
+# approximate working memory (MB) of one batch element: mel features, encoder output and decoder cache
+BATCH_ITEM_MB: dict[str, int] = {
+    "tiny": 20,
+    "base": 30,
+    "small": 60,
+    "medium": 120,
+    "large": 200,
+}
+
+
+def batch_item_mb(model: str) -> int:
+    for prefix, size in BATCH_ITEM_MB.items():
+        if model.removeprefix("distil-").startswith(prefix):
+            return size
+    return BATCH_ITEM_MB["large"]
+
+
+@dataclass(slots=True)
+class ClipGroup:
+    """
+    Clips concatenated into one audio buffer and transcribed by a single batched call.
+    """
+
+    indexes: list[int] = field(default_factory=list)
+    offsets: list[float] = field(default_factory=list)  # start of every clip in the concatenated buffer
+    durations: list[float] = field(default_factory=list)
+    windows: list[tuple[float, float]] = field(default_factory=list)  # batch elements, seconds in the buffer
+
+    @property
+    def duration(self) -> float:
+        return self.offsets[-1] + self.durations[-1] if self.offsets else 0.0
+
+
+def clip_windows(duration: float) -> int:
+    return max(1, math.ceil(duration / WINDOW_SECONDS))
+
+
+def choose_batch_size(durations: list[float], model: str, memory_cap_mb: float, max_batch: int = 32) -> int:
+    """
+    Picks the batch size: as many 30-second windows as fit into the memory cap, but not more than there are.
+    :param durations: clip durations in seconds
+    :param model: model name, defines memory per batch element
+    :param memory_cap_mb: memory available for batch inference
+    :param max_batch: upper bound of the batch size
+    :return: batch size >= 1
+    """
+    windows = sum(clip_windows(duration) for duration in durations)
+    by_memory = int(memory_cap_mb // batch_item_mb(model))
+    return max(1, min(windows, by_memory, max_batch))
+
+
+def pack_clips(durations: list[float], batch_size: int, batches_per_group: int = 4) -> list[ClipGroup]:
+    """
+    Packs clips into groups of at most batch_size * batches_per_group windows, keeping the input order.
+    Every clip is split into windows of up to 30 seconds, a window never spans two clips.
+    :param durations: clip durations in seconds
+    :param batch_size: batch size of the inference call
+    :param batches_per_group: bounds the concatenated audio buffer size
+    :return: list of ClipGroup
+    """
+    limit = batch_size * batches_per_group
+    groups = [ClipGroup()]
+    for index, duration in enumerate(durations):
+        group = groups[-1]
+        if group.indexes and len(group.windows) + clip_windows(duration) > limit:
+            group = ClipGroup()
+            groups.append(group)
+        offset = group.duration
+        group.indexes.append(index)
+        group.offsets.append(offset)
+        group.durations.append(duration)
+        for window in range(clip_windows(duration)):
+            start = offset + window * WINDOW_SECONDS
+            group.windows.append((start, min(start + WINDOW_SECONDS, offset + duration)))
+
+    return groups if groups[0].indexes else []
+
+
+def assign_segments(group: ClipGroup, segments: list[TranscriptionSegment]) -> dict[int, list[TranscriptionSegment]]:
+    """
+    Maps segments of a concatenated buffer back to their clips, timestamps become relative to the clip start.
+    :param group: transcribed ClipGroup
+    :param segments: segments with timestamps in the concatenated buffer
+    :return: dict clip index -> segments
+    """
+    result: dict[int, list[TranscriptionSegment]] = {index: [] for index in group.indexes}
+    for segment in segments:
+        middle = (segment.start + segment.end) / 2
+        position = max(0, bisect.bisect_right(group.offsets, middle) - 1)
+        offset = group.offsets[position]
+        result[group.indexes[position]].append(
+            TranscriptionSegment(
+                text=segment.text,
+                start=max(0.0, segment.start - offset),
+                end=min(group.durations[position], segment.end - offset),
+                avg_logprob=segment.avg_logprob,
+            )
+        )
+
+    return result
@@ -1,10 +1,22 @@
+import os
+import time
+from collections.abc import Iterator
 from dataclasses import asdict, dataclass
 from pathlib import Path
 
-from faster_whisper import WhisperModel
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, WhisperModel
 from loguru import logger
 
+from objects import TranscriptionSegment, YouTubeVideo
+from storage.audio_store import AudioStore
 from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import SAMPLE_RATE, AudioSource, audio_name, load_audio
+from transcribers.batching import assign_segments, choose_batch_size, pack_clips
+from transcribers.host_profile import load_profile
+from transcribers.language import language_sample
+from transcribers.model_pool import ModelKey, model_pool
+from transcribers.vad import speech_clips, speech_pieces
 
 
 class FasterWhisperTranscriber(AbstractTranscriber):
@@ -16,29 +28,154 @@ class FasterWhisperTranscriber(AbstractTranscriber):
         device: str = "cpu"
         device_index: int | list[int] = 0
         compute_type: str = "default"
-        cpu_threads: int = 8
+        cpu_threads: int = min(8, os.cpu_count() or 1)
         num_workers: int = 1
         download_root: str | None = None
         local_files_only: bool = False
         files: dict = None
 
-    def __init__(self, model: str, device: str | None = "auto"):
+    def __init__(  # noqa PLR0913
+        self,
+        model: str,
+        device: str | None = "auto",
+        cpu_threads: int | None = None,
+        num_workers: int | None = None,
+        speech_only: bool = True,
+        compute_type: str | None = None,
+        tuned: bool = True,
+    ):
         if not self.validate_model(model):
             logger.error(f"Model {model} is not valid")
             raise ValueError(f"Model {model} is not valid")
         self.config = self.Config(model_size_or_path=model, device=device)
+        # compute type tuned for this host, threads are planned by whoever runs the transcribers (see plan_workers)
+        profile = load_profile(model) if tuned else None
+        if profile is not None:
+            self.config.compute_type = profile.compute_type
+            logger.info(f"Host profile applied: compute type {profile.compute_type}")
+        if compute_type:
+            self.config.compute_type = compute_type
+        if cpu_threads:
+            self.config.cpu_threads = cpu_threads
+        if num_workers:
+            self.config.num_workers = num_workers
+        self.speech_only = speech_only  # VAD pre-pass, silence and steady sounds are not sent to the model
+        self.model_key = ModelKey(
+            backend="faster_whisper",
+            model=self.config.model_size_or_path,
+            device=self.config.device,
+            compute_type=self.config.compute_type,
+        )
         logger.info(f"FasterWhisperTranscriber init with a model {self.config.model_size_or_path}")
 
-    def transcribe(self, path: Path) -> str:
-        if path.suffix.lstrip(".") not in self.FASTER_WHISPER_FORMATS:
+    def _load_model(self) -> WhisperModel:
+        return WhisperModel(**asdict(self.config))
+
+    def detect_language(self, path: AudioSource) -> tuple[str | None, float]:
+        sample = language_sample(path, self.speech_only)
+        if not len(sample):
+            return None, 0.0
+        with model_pool.acquire(self.model_key, self._load_model) as model:
+            language, probability, _ = model.detect_language(sample)
+        return language, probability
+
+    def transcribe_stream(
+        self, path: AudioSource, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        if isinstance(path, Path) and path.suffix.lstrip(".") not in self.FASTER_WHISPER_FORMATS:
             logger.error(f"File format is not supported: {path.suffix}")
             raise NotImplementedError("File format is not supported")
-        model = WhisperModel(**asdict(self.config))
-        logger.info("FasterWhisperTranscriber transcription started")
-        segments, info = model.transcribe(path.__fspath__())
-        logger.info(f"Detected language {info.language} with probability {info.language_probability}")
-        result = ""
-        for segment in segments:
-            result += segment.text  # TODO а что если сразу в файл писать а не в оперативу?
-
-        return result
+        if not self.speech_only:
+            # faster-whisper takes arrays and file-like objects as is, files are passed by name
+            yield from self._transcribe(path, path.__fspath__() if isinstance(path, Path) else path, [start], language)
+            return
+        # the VAD pre-pass reads the decoded file through a memory map instead of holding it in memory
+        with AudioStore().samples(path) as audio:
+            clip_timestamps, stats = speech_clips(audio, start)
+            if not clip_timestamps:
+                stats.log(audio_name(path))
+                logger.info(f"No speech in {audio_name(path)}, transcription skipped")
+                return
+            start_time = time.perf_counter()
+            yield from self._transcribe(path, audio, clip_timestamps, language)
+            stats.log(audio_name(path), time.perf_counter() - start_time)
+
+    def _transcribe(
+        self, path: AudioSource, audio: str | AudioSource, clip_timestamps: list[float], language: str | None
+    ) -> Iterator[TranscriptionSegment]:
+        # faster-whisper decodes while segments are consumed, the replica is busy until the generator is closed
+        with model_pool.acquire(self.model_key, self._load_model) as model:
+            logger.info(f"FasterWhisperTranscriber transcription of {audio_name(path)} started")
+            segments, info = model.transcribe(audio, clip_timestamps=clip_timestamps, language=language)
+            if language is None:
+                logger.info(f"Detected language {info.language} with probability {info.language_probability}")
+            for segment in segments:
+                yield TranscriptionSegment(
+                    text=segment.text, start=segment.start, end=segment.end, avg_logprob=segment.avg_logprob
+                )
+
+    def transcribe_batch(
+        self, clips: list[tuple[YouTubeVideo, AudioSource]], memory_cap_mb: float = 1024
+    ) -> list[tuple[YouTubeVideo, list[TranscriptionSegment]]]:
+        """
+        Transcribes many short clips at once: clips are concatenated and their 30-second windows
+        are decoded by the model as one batch, segments are mapped back to the source videos.
+        With speech_only only the speech regions of every clip are batched (see speech_pieces).
+        :param clips: list of (YouTubeVideo, audio file, decoded array or file-like object)
+        :param memory_cap_mb: memory available for batch inference, defines the batch size
+        :return: list of (YouTubeVideo, segments) in the input order
+        """
+        start_time = time.perf_counter()
+        audios = [load_audio(audio) for _, audio in clips]
+        if self.speech_only:
+            # only speech regions are batched, silence and steady sounds inside a clip are not decoded either
+            pieces, stats = speech_pieces(audios)
+        else:
+            pieces, stats = [(index, 0.0, audio) for index, audio in enumerate(audios)], None
+        durations = [len(audio) / SAMPLE_RATE for _, _, audio in pieces]
+        batch_size = choose_batch_size(durations, self.config.model_size_or_path, memory_cap_mb)
+        results: dict[int, list[TranscriptionSegment]] = {index: [] for index in range(len(clips))}
+
+        with model_pool.acquire(self.model_key, self._load_model) as model:
+            pipeline = BatchedInferencePipeline(model=model)
+            for group in pack_clips(durations, batch_size):
+                buffer = np.concatenate([pieces[index][2] for index in group.indexes])
+                segments, _ = pipeline.transcribe(
+                    buffer,
+                    batch_size=batch_size,
+                    vad_filter=False,
+                    clip_timestamps=[{"start": start, "end": end} for start, end in group.windows],
+                )
+                assigned = assign_segments(
+                    group,
+                    [
+                        TranscriptionSegment(
+                            text=segment.text,
+                            start=segment.start,
+                            end=segment.end,
+                            avg_logprob=segment.avg_logprob,
+                        )
+                        for segment in segments
+                    ],
+                )
+                for index, piece_segments in assigned.items():
+                    clip_index, offset, _ = pieces[index]
+                    results[clip_index] += [
+                        TranscriptionSegment(
+                            text=segment.text,
+                            start=segment.start + offset,
+                            end=segment.end + offset,
+                            avg_logprob=segment.avg_logprob,
+                        )
+                        for segment in piece_segments
+                    ]
+
+        elapsed = time.perf_counter() - start_time
+        if stats is not None:
+            stats.log(f"batch of {len(clips)} clips", elapsed)
+        logger.info(
+            f"Batch of {len(clips)} clips transcribed with batch size {batch_size}: "
+            f"{sum(durations):.1f} audio seconds in {elapsed:.1f}s, "
+            f"throughput {sum(durations) / elapsed:.2f} audio-s/s"
+        )
+        return [(video, results[index]) for index, (video, _) in enumerate(clips)]
@@ -0,0 +1,69 @@
+import json
+import os
+import platform
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from loguru import logger
+
+# written by the tuning command (python -m transcribers.tuning), one file per host with a profile per model
+PROFILE_DIR = Path(os.getenv("TRANSCRIBER_PROFILE_DIR", Path.home() / ".cache" / "transcriber_profiles"))
+
+
+@dataclass(slots=True)
+class HostProfile:
+    model: str
+    compute_type: str
+    cpu_threads: int
+    workers: int  # worker processes of a ProcessPoolTranscriber, each with its own model
+    real_time_factor: float  # processing seconds per audio second of all workers together, lower is faster
+    peak_memory_mb: float  # all workers together
+    host: str = ""
+    tuned_at: str = ""
+
+
+def host_id() -> str:
+    """
+    Profiles are only valid on the hardware they were measured on: host name, CPU architecture and core count.
+    """
+    return f"{platform.node()}-{platform.machine()}-{os.cpu_count()}"
+
+
+def profile_path(directory: Path | None = None) -> Path:
+    return (directory or PROFILE_DIR) / f"{host_id()}.json"
+
+
+def load_profile(model: str, directory: Path | None = None) -> HostProfile | None:
+    """
+    Reads the tuned profile of the model on this host.
+    :param model: model name
+    :param directory: profile directory, PROFILE_DIR by default
+    :return: HostProfile or None if the model was not tuned here
+    """
+    path_ = profile_path(directory)
+    if not path_.is_file():
+        return None
+    try:
+        profile = json.loads(path_.read_text(encoding="utf-8")).get(model)
+        return HostProfile(**profile) if profile else None
+    except (ValueError, TypeError):
+        logger.warning(f"Corrupted host profile {path_}, default transcriber settings are used")
+        return None
+
+
+def save_profile(profile: HostProfile, directory: Path | None = None) -> Path:
+    """
+    Stores the profile of its model, profiles of other models on this host are kept.
+    :param profile: HostProfile to store
+    :param directory: profile directory, PROFILE_DIR by default
+    :return: Path of the host profile file
+    """
+    path_ = profile_path(directory)
+    path_.parent.mkdir(parents=True, exist_ok=True)
+    profiles = json.loads(path_.read_text(encoding="utf-8")) if path_.is_file() else {}
+    profiles[profile.model] = asdict(profile)
+    tmp_path = path_.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(profiles, indent=2), encoding="utf-8")
+    tmp_path.replace(path_)
+    logger.info(f"Host profile of {profile.model} saved to {path_}")
+    return path_
@@ -0,0 +1,27 @@
+import numpy as np
+
+from transcribers.audio import SAMPLE_RATE, AudioSource, load_head
+from transcribers.vad import find_speech
+
+SAMPLE_SECONDS = 30.0  # one Whisper window, what the model looks at to detect a language
+PROBE_SECONDS = 180.0  # speech for the sample is looked for within the first minutes only
+
+
+def language_sample(audio: AudioSource, speech_only: bool = True) -> np.ndarray:
+    """
+    Cuts the audio a language is detected on: a Whisper window starting at the first speech,
+    so an intro jingle or silence does not decide the language.
+    Only the first PROBE_SECONDS of a file are decoded.
+    :param audio: file, decoded array or file-like object
+    :param speech_only: start the sample at the first speech found by the VAD, at the audio start otherwise
+    :return: float32 array, at most SAMPLE_SECONDS long, empty when there is no speech
+    """
+    head = load_head(audio, PROBE_SECONDS)
+    start = 0.0
+    if speech_only:
+        speech = find_speech(head)
+        if not speech:
+            return head[:0]
+        start = speech[0][0]
+    first = int(start * SAMPLE_RATE)
+    return head[first : first + int(SAMPLE_SECONDS * SAMPLE_RATE)]
@@ -0,0 +1,165 @@
+import asyncio
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from loguru import logger
+
+from objects import TranscriptionSegment
+from storage.audio_store import AudioStore, PcmAudio
+from storage.language_cache import LanguageCache
+from transcribers.audio import write_wav
+from transcribers.process_pool import ProcessPoolTranscriber
+from transcribers.vad import find_silences
+
+
+@dataclass(slots=True)
+class Chunk:
+    start: float
+    end: float
+    # segments with a midpoint outside [keep_start, keep_end) belong to a neighbouring chunk
+    keep_start: float
+    keep_end: float
+
+
+def plan_chunks(
+    duration: float,
+    silences: list[tuple[float, float]],
+    chunk_seconds: float = 300.0,
+    overlap_seconds: float = 2.0,
+    search_window: float = 30.0,
+) -> list[Chunk]:
+    """
+    Splits audio into chunks of about chunk_seconds, cutting in the middle of the silence closest to the boundary.
+    If there is no silence within search_window before the boundary, chunks overlap by overlap_seconds
+    and the overlap is split in half between them on stitching.
+    :param duration: audio duration in seconds
+    :param silences: silent regions as (start, end) in seconds
+    :param chunk_seconds: target chunk duration
+    :param overlap_seconds: overlap of chunks cut inside speech
+    :param search_window: how far before the boundary to look for a silence
+    :return: list of Chunk
+    """
+    chunks = []
+    start = 0.0
+    keep_start = 0.0
+    while duration - start > chunk_seconds:
+        boundary = start + chunk_seconds
+        # a cut at the chunk start would make an empty chunk and never advance, whatever the search window
+        candidates = [
+            (silence_start + silence_end) / 2
+            for silence_start, silence_end in silences
+            if max(start, boundary - search_window) < (silence_start + silence_end) / 2 <= boundary
+        ]
+        if candidates:
+            cut = max(candidates)
+            chunks.append(Chunk(start=start, end=cut, keep_start=keep_start, keep_end=cut))
+            start = keep_start = cut
+        else:
+            cut = boundary + overlap_seconds / 2
+            chunks.append(Chunk(start=start, end=boundary + overlap_seconds, keep_start=keep_start, keep_end=cut))
+            start, keep_start = boundary, cut
+    chunks.append(Chunk(start=start, end=duration, keep_start=keep_start, keep_end=duration + 1))
+
+    return chunks
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def stitch_segments(chunks: list[Chunk], results: list[list[TranscriptionSegment]]) -> list[TranscriptionSegment]:
+    """
+    Shifts chunk segments to the file timeline and drops duplicates produced in overlap regions.
+    :param chunks: planned chunks
+    :param results: segments of every chunk with timestamps relative to the chunk start
+    :return: list of TranscriptionSegment ordered by time
+    """
+    stitched: list[TranscriptionSegment] = []
+    for chunk, segments in zip(chunks, results, strict=True):
+        for segment in segments:
+            start, end = segment.start + chunk.start, segment.end + chunk.start
+            if not chunk.keep_start <= (start + end) / 2 < chunk.keep_end:
+                continue
+            if stitched and start < stitched[-1].end and _normalize(segment.text) == _normalize(stitched[-1].text):
+                continue
+            stitched.append(
+                TranscriptionSegment(text=segment.text, start=start, end=end, avg_logprob=segment.avg_logprob)
+            )
+
+    return stitched
+
+
+class ChunkedTranscriber:
+    """
+    Long-file mode: audio is split at silence boundaries and chunks are transcribed in parallel
+    by the worker processes of a ProcessPoolTranscriber, segments are stitched back with file timestamps.
+    Decoded audio is read from a memory-mapped AudioStore, only one chunk at a time is held in memory.
+    A chunk is written to a temporary WAV file right before its transcription and removed after it,
+    so the disk holds the chunks in flight only, not a second copy of the whole file.
+    The language is detected once on the first chunk (or taken from a LanguageCache) and passed to every chunk.
+    internal settings: chunk duration, overlap duration
+    """
+
+    def __init__(
+        self,
+        process_pool: ProcessPoolTranscriber,
+        chunk_seconds: float = 300.0,
+        overlap_seconds: float = 2.0,
+        store: AudioStore | None = None,
+        languages: LanguageCache | None = None,
+    ):
+        self.process_pool = process_pool
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self.store = store or AudioStore()
+        self.languages = languages
+
+    async def transcribe(self, path: Path, language: str | None = None) -> list[TranscriptionSegment]:
+        """
+        Transcribes a long file chunk by chunk in parallel.
+        :param path: source file path
+        :param language: spoken language code of the file, detected once on the first chunk when not given
+        :return: list of TranscriptionSegment
+        """
+        audio = await asyncio.to_thread(self.store.open, path)
+        silences = await asyncio.to_thread(find_silences, audio.samples, audio.sampling_rate)
+        chunks = plan_chunks(audio.duration, silences, self.chunk_seconds, self.overlap_seconds)
+        logger.info(f"Long file {path.name} split into {len(chunks)} chunks, {len(silences)} silences found")
+
+        with TemporaryDirectory(dir=path.parent) as tmp_dir:
+            if language is None:
+                language = await self._language(path, audio, chunks[0], Path(tmp_dir) / "language.wav")
+            # twice the workers: the pool keeps picking the shortest job, while at most this many WAV files exist
+            slots = asyncio.Semaphore(self.process_pool.workers * 2)
+
+            async def transcribe_chunk(i: int, chunk: Chunk) -> list[TranscriptionSegment]:
+                async with slots:
+                    file = Path(tmp_dir) / f"chunk_{i:04d}.wav"
+                    await asyncio.to_thread(write_wav, audio.slice(chunk.start, chunk.end), file, audio.sampling_rate)
+                    try:
+                        return await self._collect(file, chunk.end - chunk.start, language)
+                    finally:
+                        file.unlink(missing_ok=True)
+
+            results = await asyncio.gather(*(transcribe_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+
+        return stitch_segments(chunks, results)
+
+    async def _language(self, path: Path, audio: PcmAudio, first_chunk: Chunk, file: Path) -> str | None:
+        # detected once for the whole file, chunks are not detected one by one
+        key = LanguageCache.key_for_file(path)
+        if self.languages is not None and (language := self.languages.get(key)):
+            return language
+        await asyncio.to_thread(write_wav, audio.slice(first_chunk.start, first_chunk.end), file, audio.sampling_rate)
+        try:
+            language, probability = await self.process_pool.detect_language(file)
+        finally:
+            file.unlink(missing_ok=True)
+        return self.languages.put(key, language, probability) if self.languages is not None else language
+
+    async def _collect(self, path: Path, duration: float, language: str | None) -> list[TranscriptionSegment]:
+        return [
+            segment async for segment in self.process_pool.transcribe_stream(path, duration=duration, language=language)
+        ]
@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from loguru import logger
+
+from metrics import metrics
+
+# approximate resident size (MB) of the weights, used for the memory budget when a caller does not pass one
+MODEL_SIZES_MB: dict[str, int] = {
+    "tiny": 75,
+    "tiny.en": 75,
+    "base": 145,
+    "base.en": 145,
+    "small": 485,
+    "small.en": 485,
+    "distil-small.en": 335,
+    "medium": 1530,
+    "medium.en": 1530,
+    "distil-medium.en": 790,
+    "large-v1": 3090,
+    "large-v2": 3090,
+    "large-v3": 3090,
+    "large": 3090,
+    "distil-large-v2": 1510,
+    "distil-large-v3": 1510,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class ModelKey:
+    backend: str
+    model: str
+    device: str = "cpu"
+    compute_type: str = "default"
+
+
+@dataclass(slots=True)
+class PoolStats:
+    hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    evictions: int = 0
+    load_seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, int | float]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class _Replica:
+    model: Any
+    size_mb: float
+    busy: bool = False
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ModelPool:
+    """
+    Process-wide registry of loaded models.
+    Models are loaded lazily on first acquire, kept resident and shared by all transcriber instances.
+    internal settings: replicas per key, memory budget in MB (None - unlimited)
+    """
+
+    def __init__(self, replicas: int = 1, memory_budget_mb: float | None = None):
+        if replicas < 1:
+            raise ValueError("replicas must be >= 1")
+        self.replicas = replicas
+        self.memory_budget_mb = memory_budget_mb
+        self.stats = PoolStats()
+        self._entries: OrderedDict[ModelKey, list[_Replica]] = OrderedDict()
+        self._loading: dict[ModelKey, int] = {}
+        self._cond = threading.Condition()
+
+    @property
+    def resident_mb(self) -> float:
+        return sum(replica.size_mb for replicas in self._entries.values() for replica in replicas)
+
+    def configure(self, replicas: int | None = None, memory_budget_mb: float | None = None) -> None:
+        with self._cond:
+            if replicas is not None:
+                self.replicas = max(1, replicas)
+            if memory_budget_mb is not None:
+                self.memory_budget_mb = memory_budget_mb
+            self._cond.notify_all()
+
+    @contextmanager
+    def acquire(self, key: ModelKey, loader: Callable[[], Any], size_mb: float | None = None) -> Iterator[Any]:
+        """
+        Checks out a resident replica of the model, loading it if needed.
+        Blocks while all replicas of the key are busy and the replicas limit is reached.
+        :param key: ModelKey identifying backend, model, device and compute type
+        :param loader: callable returning a freshly loaded model, called on miss only
+        :param size_mb: estimated model size, taken from MODEL_SIZES_MB by default
+        :return: context manager yielding the model
+        """
+        replica = self._checkout(key, loader, size_mb)
+        try:
+            yield replica.model
+        finally:
+            with self._cond:
+                replica.busy = False
+                replica.last_used = time.monotonic()
+                self._cond.notify_all()
+
+    def _checkout(self, key: ModelKey, loader: Callable[[], Any], size_mb: float | None) -> _Replica:
+        with self._cond:
+            while True:
+                replicas = self._entries.get(key, [])
+                for replica in replicas:
+                    if not replica.busy:
+                        replica.busy = True
+                        self._entries.move_to_end(key)
+                        self.stats.hits += 1
+                        metrics.inc("cache_lookups_total", cache="model", result="hit")
+                        return replica
+                if len(replicas) + self._loading.get(key, 0) < self.replicas:
+                    break
+                self._cond.wait()
+            self.stats.misses += 1
+            metrics.inc("cache_lookups_total", cache="model", result="miss")
+            self._loading[key] = self._loading.get(key, 0) + 1
+
+        size = size_mb if size_mb is not None else MODEL_SIZES_MB.get(key.model, 0)
+        start = time.perf_counter()
+        try:
+            model = loader()
+        except Exception:
+            with self._cond:
+                self._loading[key] -= 1
+                self._cond.notify_all()
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe("model_load_seconds", elapsed, backend=key.backend, model=key.model)
+
+        logger.info(f"Model {key.backend}/{key.model} loaded in {elapsed:.2f}s ({key.device}, {key.compute_type})")
+        with self._cond:
+            self._loading[key] -= 1
+            replica = _Replica(model=model, size_mb=size, busy=True)
+            self._entries.setdefault(key, []).append(replica)
+            self._entries.move_to_end(key)
+            self.stats.loads += 1
+            self.stats.load_seconds += elapsed
+            self._evict()
+            self._cond.notify_all()
+            return replica
+
+    def _evict(self) -> None:
+        """
+        Drops idle replicas in least-recently-used order until the pool fits into the memory budget.
+        Busy replicas are never evicted, so the budget can be exceeded temporarily.
+        """
+        if self.memory_budget_mb is None:
+            return
+        candidates = sorted(
+            (
+                (replica.last_used, key, replica)
+                for key, replicas in self._entries.items()
+                for replica in replicas
+                if not replica.busy
+            ),
+            key=lambda item: item[0],
+        )
+        for _, key, replica in candidates:
+            if self.resident_mb <= self.memory_budget_mb:
+                break
+            self._entries[key].remove(replica)
+            if not self._entries[key]:
+                del self._entries[key]
+            self.stats.evictions += 1
+            logger.info(f"Model {key.backend}/{key.model} evicted from the pool")
+
+    def clear(self) -> None:
+        with self._cond:
+            self._entries.clear()
+
+    def report(self) -> dict[str, int | float]:
+        with self._cond:
+            return {**self.stats.as_dict(), "resident_mb": self.resident_mb, "resident_models": len(self._entries)}
+
+
+model_pool = ModelPool()
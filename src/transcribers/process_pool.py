@@ -0,0 +1,325 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from metrics import metrics
+from objects import TranscriptionSegment, YouTubeVideo
+from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import probe_duration
+from transcribers.host_profile import load_profile
+from transcribers.language import SAMPLE_SECONDS
+from transcribers.transcript_writer import TranscriptWriter
+
+# state of a worker process, set up once by _init_worker
+_worker_transcriber: AbstractTranscriber | None = None
+_worker_results: Any = None
+
+
+def plan_workers(
+    cores: int | None = None, workers: int | None = None, cpu_threads: int | None = None
+) -> tuple[int, int]:
+    """
+    Splits CPU cores between worker processes so that workers * cpu_threads <= cores.
+    By default every worker gets 4 threads: inference scales sublinearly past that, more processes win.
+    :param cores: amount of cores to use, os.cpu_count() by default
+    :param workers: fixed amount of worker processes
+    :param cpu_threads: fixed amount of inference threads per worker
+    :return: tuple(workers, cpu_threads)
+    """
+    cores = max(1, cores or os.cpu_count() or 1)
+    if workers and cpu_threads:
+        return workers, max(1, min(cpu_threads, cores // workers))
+    if workers:
+        return workers, max(1, cores // workers)
+    cpu_threads = min(cpu_threads or 4, cores)
+    return max(1, cores // cpu_threads), cpu_threads
+
+
+def _init_worker(
+    transcriber_cls: type[AbstractTranscriber],
+    transcriber_kwargs: dict[str, Any],
+    results: Any,  # noqa ANN401
+) -> None:
+    global _worker_transcriber, _worker_results  # noqa PLW0603
+    _worker_transcriber = transcriber_cls(**transcriber_kwargs)
+    _worker_results = results
+
+
+def _run_job(job_id: int, path: Path, target: Path | None, stream: bool, language: str | None) -> tuple[int, float]:
+    """
+    Transcribes a file inside a worker process.
+    Segments are written to the target file and/or sent back to the main process through the results queue.
+    :return: tuple(amount of segments, inference seconds)
+    """
+    start = time.perf_counter()
+    amount = 0
+
+    def segments() -> Any:  # noqa ANN401
+        nonlocal amount
+        for segment in _worker_transcriber.transcribe_stream(path, start=offset_seconds, language=language):
+            amount += 1
+            if stream:
+                _worker_results.put((job_id, segment))
+            yield segment
+
+    offset_seconds, offset_bytes = 0.0, 0
+    try:
+        if target is not None:
+            writer = TranscriptWriter(target)
+            offset_seconds, offset_bytes = writer.resume_point()
+            writer.write(segments(), offset=offset_bytes)
+        else:
+            for _ in segments():
+                pass
+    finally:
+        if stream:
+            _worker_results.put((job_id, None))
+
+    return amount, time.perf_counter() - start
+
+
+def _detect_job(path: Path) -> tuple[str | None, float]:
+    return _worker_transcriber.detect_language(path)
+
+
+def _batch_job(clips: list[tuple[YouTubeVideo, Path]]) -> list[tuple[YouTubeVideo, list[TranscriptionSegment]]]:
+    return _worker_transcriber.transcribe_batch(clips)
+
+
+@dataclass(order=True, slots=True)
+class _Job:
+    priority: float
+    job_id: int
+    path: Path = field(compare=False)
+    target: Path | None = field(compare=False)
+    stream: bool = field(compare=False)
+    language: str | None = field(compare=False)
+    detect: bool = field(compare=False)  # language detection instead of transcription
+    submitted_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    clips: list[tuple[YouTubeVideo, Path]] | None = field(compare=False, default=None)  # batched transcription
+
+
+class ProcessPoolTranscriber:
+    """
+    Transcription executor running every job in a separate worker process.
+    Each worker keeps its own resident model, cores are split between workers automatically (see plan_workers).
+    Without explicit workers/cpu_threads a tuned transcriber (see transcribers.tuning) uses the host profile split.
+    Queued jobs are dispatched shortest-first by audio duration, waiting time is credited to a job
+    (aging, seconds of waiting per second of audio) so long files are not starved either.
+    Segments are streamed back to the event loop as soon as a worker produces them.
+    internal settings: workers amount, cpu threads per worker, aging factor
+    """
+
+    def __init__(  # noqa PLR0913
+        self,
+        transcriber_cls: type[AbstractTranscriber],
+        model: str,
+        workers: int | None = None,
+        cpu_threads: int | None = None,
+        aging: float = 1.0,
+        transcriber_kwargs: dict[str, Any] | None = None,
+    ):
+        parameters = inspect.signature(transcriber_cls).parameters
+        if workers is None and cpu_threads is None and "tuned" in parameters:
+            profile = load_profile(model)
+            if profile is not None:
+                workers, cpu_threads = profile.workers, profile.cpu_threads
+                logger.info(f"Host profile applied: {workers} workers x {cpu_threads} threads")
+        self.workers, self.cpu_threads = plan_workers(workers=workers, cpu_threads=cpu_threads)
+        self.batching = hasattr(transcriber_cls, "transcribe_batch")  # short clips can be batched in a worker
+        self.aging = aging
+        context = multiprocessing.get_context("spawn")
+        self._results = context.Queue()
+        kwargs: dict[str, Any] = {"model": model, **(transcriber_kwargs or {})}
+        if "cpu_threads" in parameters:
+            kwargs["cpu_threads"] = self.cpu_threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(transcriber_cls, kwargs, self._results),
+        )
+        self._queue: list[_Job] = []
+        self._ids = itertools.count()
+        self._streams: dict[int, asyncio.Queue] = {}
+        self._slots: asyncio.Semaphore | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._pump: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        logger.info(f"ProcessPoolTranscriber init: {self.workers} workers x {self.cpu_threads} threads, model {model}")
+
+    def _start(self) -> None:
+        if self._dispatcher is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._pump = threading.Thread(target=self._pump_results, daemon=True)
+        self._pump.start()
+
+    def _pump_results(self) -> None:
+        while (item := self._results.get()) is not None:
+            job_id, segment = item
+            stream = self._streams.get(job_id)
+            if stream is not None:
+                self._loop.call_soon_threadsafe(stream.put_nowait, segment)
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await self._slots.acquire()
+            job = heapq.heappop(self._queue)
+            if job.future.cancelled():
+                self._slots.release()
+                continue
+            metrics.observe("process_pool_queue_seconds", time.monotonic() - job.submitted_at)
+            if job.detect:
+                concurrent_future = loop.run_in_executor(self._executor, _detect_job, job.path)
+            elif job.clips is not None:
+                concurrent_future = loop.run_in_executor(self._executor, _batch_job, job.clips)
+            else:
+                concurrent_future = loop.run_in_executor(
+                    self._executor, _run_job, job.job_id, job.path, job.target, job.stream, job.language
+                )
+            concurrent_future.add_done_callback(lambda done, job_=job: self._finish(job_, done))
+
+    def _finish(self, job: _Job, done: asyncio.Future) -> None:
+        self._slots.release()
+        if job.future.cancelled():
+            return
+        if done.cancelled():  # the executor was shut down with the job still queued
+            job.future.cancel()
+        elif done.exception() is not None:
+            job.future.set_exception(done.exception())
+        else:
+            if not job.detect and job.clips is None:
+                metrics.observe("inference_seconds", done.result()[1])
+            job.future.set_result(done.result())
+
+    async def _submit(  # noqa PLR0913
+        self,
+        path: Path,
+        target: Path | None,
+        stream: bool,
+        duration: float | None,
+        language: str | None = None,
+        detect: bool = False,
+        clips: list[tuple[YouTubeVideo, Path]] | None = None,
+    ) -> _Job:
+        self._start()
+        duration = duration if duration is not None else await probe_duration(path)
+        submitted_at = time.monotonic()
+        job = _Job(
+            priority=duration + self.aging * submitted_at,
+            job_id=next(self._ids),
+            path=path,
+            target=target,
+            stream=stream,
+            language=language,
+            detect=detect,
+            submitted_at=submitted_at,
+            future=asyncio.get_running_loop().create_future(),
+            clips=clips,
+        )
+        if stream:
+            self._streams[job.job_id] = asyncio.Queue()
+        heapq.heappush(self._queue, job)
+        self._wakeup.set()
+        return job
+
+    async def detect_language(self, path: Path) -> tuple[str | None, float]:
+        """
+        Detects the spoken language of a file in a worker process.
+        The job is scheduled as a short one: only a Whisper window of the file is looked at.
+        :param path: source file path
+        :return: tuple(language code or None, probability)
+        """
+        job = await self._submit(path, None, stream=False, duration=SAMPLE_SECONDS, detect=True)
+        return await job.future
+
+    async def transcribe_to_file(
+        self, path: Path, target: Path, duration: float | None = None, language: str | None = None
+    ) -> tuple[int, float]:
+        """
+        Transcribes a file in a worker process, segments are written to target as they come.
+        :param path: source file path
+        :param target: transcript path
+        :param duration: audio duration in seconds used for scheduling, probed when not given
+        :param language: spoken language code, detected by the model when not given
+        :return: tuple(amount of segments, inference seconds)
+        """
+        job = await self._submit(path, target, stream=False, duration=duration, language=language)
+        return await job.future
+
+    async def transcribe_batch(
+        self, clips: list[tuple[YouTubeVideo, Path]], duration: float | None = None
+    ) -> list[tuple[YouTubeVideo, list[TranscriptionSegment]]]:
+        """
+        Transcribes short clips as one batched inference call in a worker process, see batching.
+        :param clips: list of (YouTubeVideo, audio file)
+        :param duration: total audio duration in seconds used for scheduling, probed when not given
+        :return: list of (YouTubeVideo, segments) in the input order
+        """
+        if duration is None:
+            duration = sum([await probe_duration(path) for _, path in clips])
+        job = await self._submit(clips[0][1], None, stream=False, duration=duration, clips=clips)
+        return await job.future
+
+    async def transcribe_stream(
+        self, path: Path, duration: float | None = None, language: str | None = None
+    ) -> AsyncIterator[TranscriptionSegment]:
+        """
+        Transcribes a file in a worker process and yields segments as soon as the worker produces them.
+        :param path: source file path
+        :param duration: audio duration in seconds used for scheduling, probed when not given
+        :param language: spoken language code, detected by the model when not given
+        :return: async generator of TranscriptionSegment
+        """
+        job = await self._submit(path, None, stream=True, duration=duration, language=language)
+        stream = self._streams[job.job_id]
+        try:
+            while (segment := await stream.get()) is not None:
+                yield segment
+            await job.future
+        finally:
+            self._streams.pop(job.job_id, None)
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker processes and waits for them, blocking: use aclose in a running event loop.
+        :return: None
+        """
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._results.put(None)
+        logger.info("ProcessPoolTranscriber shut down")
+
+    async def aclose(self) -> None:
+        """
+        Stops the worker processes, they are waited for in a thread so the event loop keeps serving.
+        :return: None
+        """
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        await asyncio.to_thread(self.shutdown)
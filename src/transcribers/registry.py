@@ -0,0 +1,39 @@
+import functools
+import importlib
+
+from transcribers.abscract import AbstractTranscriber
+
+# backend name -> "module:class", modules are imported on first use only:
+# faster-whisper pulls in ctranslate2, whisper pulls in torch
+_BACKENDS: dict[str, str] = {
+    "faster-whisper": "transcribers.faster_whisper_transcriber:FasterWhisperTranscriber",
+    "whisper": "transcribers.whisper_transcriber:WhisperTranscriber",
+}
+
+
+def register(name: str, target: str) -> None:
+    """
+    Adds a transcriber backend without importing it.
+    :param name: backend name, e.g. "faster-whisper"
+    :param target: "module:class" of an AbstractTranscriber subclass
+    :return: None
+    """
+    _BACKENDS[name] = target
+    get_transcriber.cache_clear()
+
+
+def backends() -> list[str]:
+    return sorted(_BACKENDS)
+
+
+@functools.cache
+def get_transcriber(name: str) -> type[AbstractTranscriber]:
+    """
+    Imports the transcriber backend, the first call of a backend pays its import time.
+    :param name: backend name, see backends()
+    :return: AbstractTranscriber subclass
+    """
+    if name not in _BACKENDS:
+        raise ValueError(f"Transcriber backend {name} is not valid, choose from: {', '.join(backends())}")
+    module, _, class_name = _BACKENDS[name].partition(":")
+    return getattr(importlib.import_module(module), class_name)
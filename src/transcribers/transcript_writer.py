@@ -0,0 +1,67 @@
+import os
+from collections.abc import Iterable
+from pathlib import Path
+
+from loguru import logger
+
+from objects import TranscriptionSegment
+
+
+class TranscriptWriter:
+    """
+    Writes transcription segments to a text file as soon as they are produced.
+    Next to the target a small progress file is kept: "<end of last persisted segment> <byte offset>".
+    After a crash the transcript is usable as is, and the writer resumes from the recorded position.
+    internal settings: fsync period in segments
+    """
+
+    PROGRESS_SUFFIX = ".progress"
+
+    def __init__(self, target_file: Path, fsync_every: int = 50):
+        self.target_file = target_file
+        self.progress_file = target_file.with_name(target_file.name + self.PROGRESS_SUFFIX)
+        self.fsync_every = fsync_every
+
+    def resume_point(self) -> tuple[float, int]:
+        """
+        Reads the progress file of an interrupted run.
+        :return: tuple(seconds to continue from, byte offset of the persisted text)
+        """
+        if not (self.progress_file.is_file() and self.target_file.is_file()):
+            return 0.0, 0
+        try:
+            start, offset = self.progress_file.read_text().split()
+            return float(start), int(offset)
+        except ValueError:
+            logger.warning(f"Corrupted progress file {self.progress_file}, starting from scratch")
+            return 0.0, 0
+
+    def write(self, segments: Iterable[TranscriptionSegment], offset: int = 0) -> int:
+        """
+        Appends segments to the target file starting from offset, memory usage does not depend on the file length.
+        :param segments: iterable of TranscriptionSegment
+        :param offset: byte offset to truncate the target file to before writing
+        :return: amount of written segments
+        """
+        mode = "r+b" if offset and self.target_file.is_file() else "wb"
+        written = 0
+        with self.target_file.open(mode) as file:
+            file.truncate(offset)
+            file.seek(offset)
+            for segment in segments:
+                file.write(segment.text.encode("utf-8"))
+                written += 1
+                if written % self.fsync_every == 0:
+                    self._sync(file, segment.end)
+            file.flush()
+            os.fsync(file.fileno())
+        self.progress_file.unlink(missing_ok=True)
+
+        return written
+
+    def _sync(self, file, position: float) -> None:
+        file.flush()
+        os.fsync(file.fileno())
+        tmp_file = self.progress_file.with_suffix(".tmp")
+        tmp_file.write_text(f"{position} {file.tell()}")
+        tmp_file.replace(self.progress_file)
@@ -0,0 +1,197 @@
+"""
+Finds the fastest compute_type x cpu_threads x workers combination of FasterWhisperTranscriber on this host
+and saves it as the host profile, transcribers and process pools pick it up automatically.
+Usage: PYTHONPATH=src python -m transcribers.tuning [--model small] [--clip speech.wav] [--max-memory-mb 4000]
+Without --clip a generated reference clip is used, a real speech recording gives more representative numbers.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import resource
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from multiprocessing import get_context
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+from loguru import logger
+
+from transcribers.audio import SAMPLE_RATE, probe_duration, write_wav
+from transcribers.host_profile import HostProfile, host_id, save_profile
+from transcribers.process_pool import ProcessPoolTranscriber
+
+COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+REFERENCE_SECONDS = 60.0
+PAUSE_LEVEL = -0.7  # the reference clip pauses for a second every 5 seconds
+
+
+@dataclass(frozen=True, slots=True)
+class Candidate:
+    compute_type: str
+    cpu_threads: int
+    workers: int  # worker processes of a ProcessPoolTranscriber, each with its own model
+
+
+def candidates(
+    cores: int | None = None, compute_types: tuple[str, ...] = COMPUTE_TYPES, max_workers: int = 4
+) -> list[Candidate]:
+    """
+    Combinations worth measuring: thread counts are powers of two up to the core count,
+    worker processes never oversubscribe the cores (see plan_workers).
+    :param cores: amount of cores, os.cpu_count() by default
+    :param compute_types: CTranslate2 compute types supported on this CPU
+    :param max_workers: max amount of worker processes to try
+    :return: list of Candidate
+    """
+    cores = max(1, cores or os.cpu_count() or 1)
+    threads = sorted({min(2**power, cores) for power in range(cores.bit_length())} | {cores})
+    workers = [count for count in (1, 2, 4, 8) if count <= max_workers]
+    return [
+        Candidate(compute_type=compute_type, cpu_threads=cpu_threads, workers=workers_)
+        for compute_type, cpu_threads, workers_ in itertools.product(compute_types, threads, workers)
+        if cpu_threads * workers_ <= cores
+    ]
+
+
+def supported_compute_types() -> tuple[str, ...]:
+    import ctranslate2  # noqa PLC0415 installed with faster-whisper, only needed while tuning
+
+    supported = ctranslate2.get_supported_compute_types("cpu")
+    return tuple(compute_type for compute_type in COMPUTE_TYPES if compute_type in supported)
+
+
+def reference_clip(target: Path, seconds: float = REFERENCE_SECONDS) -> Path:
+    """
+    Generates a deterministic speech-like clip: harmonic "vowels" with a syllable-rate envelope and pauses,
+    so every 30-second window of the model is busy.
+    :param target: WAV path
+    :param seconds: clip duration
+    :return: Path of the clip
+    """
+    rng = np.random.default_rng(0)
+    time_ = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.3 * time_)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * time_), 0, None) * (np.sin(2 * np.pi * 0.2 * time_) > PAUSE_LEVEL)
+    audio = 0.2 * voice * envelope + 0.005 * rng.standard_normal(len(time_))
+    return write_wav(audio.astype(np.float32), target)
+
+
+def _children_peak_memory_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes on macOS, KB on Linux
+
+
+async def _transcribe_round(pool: ProcessPoolTranscriber, clip: Path, audio_seconds: float, jobs: int) -> None:
+    with TemporaryDirectory() as tmp_dir:
+        await asyncio.gather(
+            *(pool.transcribe_to_file(clip, Path(tmp_dir) / f"{i}.txt", audio_seconds) for i in range(jobs))
+        )
+
+
+def _measure(model: str, clip: Path, audio_seconds: float, candidate: Candidate) -> tuple[float, float]:
+    """
+    Runs inside a fresh process, so its worker processes are the only children counted in the peak memory.
+    Every worker transcribes the clip once to load its model, then twice more for the measurement.
+    """
+    from transcribers.faster_whisper_transcriber import FasterWhisperTranscriber  # noqa PLC0415
+
+    pool = ProcessPoolTranscriber(
+        FasterWhisperTranscriber,
+        model,
+        workers=candidate.workers,
+        cpu_threads=candidate.cpu_threads,
+        transcriber_kwargs={"compute_type": candidate.compute_type, "speech_only": False, "tuned": False},
+    )
+
+    async def run() -> float:
+        await _transcribe_round(pool, clip, audio_seconds, candidate.workers)  # warm-up: model loads
+        start = time.perf_counter()
+        await _transcribe_round(pool, clip, audio_seconds, 2 * candidate.workers)
+        return time.perf_counter() - start
+
+    try:
+        elapsed = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    # workers are alike: the largest one times their amount bounds the total
+    return elapsed / (audio_seconds * 2 * candidate.workers), _children_peak_memory_mb() * candidate.workers
+
+
+def measure_in_process(model: str, clip: Path, audio_seconds: float, candidate: Candidate) -> tuple[float, float]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_measure, model, clip, audio_seconds, candidate).result()
+
+
+def tune(  # noqa PLR0913
+    model: str,
+    clip: Path,
+    audio_seconds: float,
+    options: list[Candidate],
+    max_memory_mb: float | None = None,
+    measure: Callable[[str, Path, float, Candidate], tuple[float, float]] = measure_in_process,
+) -> HostProfile | None:
+    """
+    Measures every candidate and picks the one with the lowest real-time factor within the memory limit.
+    :param model: model name
+    :param clip: reference clip
+    :param audio_seconds: duration of the clip
+    :param options: candidates to measure
+    :param max_memory_mb: candidates with a higher peak memory are not chosen
+    :param measure: returns (real-time factor, peak memory MB) of a candidate
+    :return: best HostProfile or None if no candidate fits
+    """
+    best: HostProfile | None = None
+    for candidate in options:
+        try:
+            real_time_factor, peak_memory_mb = measure(model, clip, audio_seconds, candidate)
+        except Exception as error:  # noqa BLE001 an unsupported combination must not stop the tuning
+            logger.warning(f"Candidate {candidate} failed: {error!r}")
+            continue
+        logger.info(f"{candidate}: real-time factor {real_time_factor:.3f}, peak memory {peak_memory_mb:.0f} MB")
+        if max_memory_mb is not None and peak_memory_mb > max_memory_mb:
+            continue
+        if best is None or real_time_factor < best.real_time_factor:
+            best = HostProfile(
+                model=model,
+                real_time_factor=round(real_time_factor, 4),
+                peak_memory_mb=round(peak_memory_mb, 1),
+                host=host_id(),
+                tuned_at=datetime.now(UTC).isoformat(timespec="seconds"),
+                **asdict(candidate),
+            )
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--clip", type=Path, default=None)
+    parser.add_argument("--max-memory-mb", type=float, default=None)
+    parser.add_argument("--max-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as tmp_dir:
+        clip = args.clip or reference_clip(Path(tmp_dir) / "reference.wav")
+        audio_seconds = REFERENCE_SECONDS if args.clip is None else asyncio.run(probe_duration(clip))
+        options = candidates(compute_types=supported_compute_types(), max_workers=args.max_workers)
+        logger.info(f"Tuning {args.model} on {host_id()}: {len(options)} candidates")
+        profile = tune(args.model, clip, audio_seconds, options, args.max_memory_mb)
+    if profile is None:
+        logger.error("No candidate fits the memory limit, the host profile is not changed")
+        sys.exit(1)
+    save_profile(profile)
+    print(json.dumps(asdict(profile), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+from dataclasses import dataclass
+
+import numpy as np
+from loguru import logger
+
+from transcribers.audio import SAMPLE_RATE
+
+BLOCK_FRAMES = 10_000  # frames converted to float32 at once, bounds memory on memory-mapped input
+
+
+def frame_energy_db(audio: np.ndarray, sampling_rate: int = SAMPLE_RATE, frame_ms: int = 30) -> np.ndarray:
+    """
+    Computes RMS energy of non-overlapping frames in dBFS.
+    The audio is processed in blocks, so a memory-mapped file is never copied into memory as a whole.
+    :param audio: mono float32 array in [-1, 1] or int16 PCM
+    :param sampling_rate: sampling rate of the audio
+    :param frame_ms: frame length in milliseconds
+    :return: np.ndarray of shape (frames,)
+    """
+    frame = max(1, sampling_rate * frame_ms // 1000)
+    frames = len(audio) // frame
+    scale = 1 / 32768 if audio.dtype == np.int16 else 1.0
+    energy = np.empty(frames, dtype=np.float32)
+    for first in range(0, frames, BLOCK_FRAMES):
+        last = min(frames, first + BLOCK_FRAMES)
+        framed = audio[first * frame : last * frame].reshape(last - first, frame).astype(np.float32) * scale
+        rms = np.sqrt(np.mean(np.square(framed), axis=1))
+        energy[first:last] = 20 * np.log10(np.maximum(rms, 1e-10))
+    return energy
+
+
+def _runs(mask: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Finds runs of True values.
+    :return: list of (first index, last index + 1)
+    """
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist(), strict=True))
+
+
+def find_silences(
+    audio: np.ndarray,
+    sampling_rate: int = SAMPLE_RATE,
+    threshold_db: float = -40.0,
+    min_silence: float = 0.5,
+    frame_ms: int = 30,
+) -> list[tuple[float, float]]:
+    """
+    Finds silent regions, i.e. frames quieter than threshold_db lasting at least min_silence seconds.
+    :param audio: mono float32 array
+    :param sampling_rate: sampling rate of the audio
+    :param threshold_db: energy threshold in dBFS
+    :param min_silence: minimal silence duration in seconds
+    :param frame_ms: analysis frame length in milliseconds
+    :return: list of (start, end) in seconds
+    """
+    energy = frame_energy_db(audio, sampling_rate, frame_ms)
+    frame_seconds = frame_ms / 1000
+    return [
+        (start * frame_seconds, end * frame_seconds)
+        for start, end in _runs(energy < threshold_db)
+        if (end - start) * frame_seconds >= min_silence
+    ]
+
+
+@dataclass(slots=True)
+class VadStats:
+    total: float  # seconds of audio considered
+    speech: float  # seconds sent to the model
+
+    @property
+    def skipped(self) -> float:
+        return self.total - self.speech
+
+    @property
+    def skipped_fraction(self) -> float:
+        return self.skipped / self.total if self.total else 0.0
+
+    def log(self, name: str, inference_seconds: float | None = None) -> None:
+        """
+        Logs the skipped share, the saved time is extrapolated from the inference speed on speech.
+        """
+        message = f"VAD {name}: {self.speech:.1f}s of speech in {self.total:.1f}s, skipped {self.skipped_fraction:.0%}"
+        if inference_seconds is not None and self.speech:
+            message += f", ~{self.skipped * inference_seconds / self.speech:.1f}s of inference saved"
+        logger.info(message)
+
+
+def _steady_frames(energy: np.ndarray, loud: np.ndarray, window: int, steady_db: float) -> np.ndarray:
+    """
+    Marks loud frames inside windows with a flat energy envelope.
+    Speech is modulated by syllables and pauses (several dB of energy swing within a second),
+    held notes, drones, hum and steady noise are not. Only the energy envelope is looked at:
+    rhythmic music swings like speech and is kept. Quiet frames are left out, so a silence next to
+    a steady sound does not make the window look modulated.
+    """
+    steady = np.zeros(len(energy), dtype=bool)
+    windows = len(energy) // window
+    if not windows:
+        return steady
+    mask = loud[: windows * window].reshape(windows, window)
+    values = energy[: windows * window].reshape(windows, window)
+    counts = np.maximum(mask.sum(axis=1), 1)
+    mean = np.where(mask, values, 0).sum(axis=1) / counts
+    deviation = np.sqrt(np.where(mask, np.square(values - mean[:, None]), 0).sum(axis=1) / counts)
+    for index in np.flatnonzero((mask.sum(axis=1) > 1) & (deviation < steady_db)):
+        steady[index * window : (index + 1) * window] = True
+    return steady & loud
+
+
+def find_speech(  # noqa PLR0913
+    audio: np.ndarray,
+    sampling_rate: int = SAMPLE_RATE,
+    threshold_db: float = -40.0,
+    min_speech: float = 0.25,
+    min_silence: float = 0.5,
+    padding: float = 0.2,
+    steady_db: float = 2.0,
+    frame_ms: int = 30,
+) -> list[tuple[float, float]]:
+    """
+    Finds speech regions: loud frames whose energy envelope is not flat (see _steady_frames, music with a beat
+    counts as speech),
+    gaps shorter than min_silence are bridged, regions shorter than min_speech are dropped, the rest is padded.
+    :param audio: mono float32 array or int16 PCM
+    :param sampling_rate: sampling rate of the audio
+    :param threshold_db: energy threshold in dBFS
+    :param min_speech: minimal speech region duration in seconds
+    :param min_silence: shorter pauses do not split a region
+    :param padding: seconds added to both sides of a region
+    :param steady_db: max energy standard deviation in a second of a steady sound, 0 disables the check
+    :param frame_ms: analysis frame length in milliseconds
+    :return: list of (start, end) in seconds
+    """
+    energy = frame_energy_db(audio, sampling_rate, frame_ms)
+    frame_seconds = frame_ms / 1000
+    loud = energy >= threshold_db
+    if steady_db:
+        loud &= ~_steady_frames(energy, loud, max(1, round(1 / frame_seconds)), steady_db)
+
+    regions: list[list[float]] = []
+    for start, end in _runs(loud):
+        if regions and start * frame_seconds - regions[-1][1] < min_silence:
+            regions[-1][1] = end * frame_seconds
+        else:
+            regions.append([start * frame_seconds, end * frame_seconds])
+
+    duration = len(audio) / sampling_rate
+    padded: list[tuple[float, float]] = []
+    for region_start, region_end in regions:
+        if region_end - region_start < min_speech:
+            continue
+        start, end = max(0.0, region_start - padding), min(duration, region_end + padding)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+def speech_clips(
+    audio: np.ndarray, start: float = 0.0, sampling_rate: int = SAMPLE_RATE
+) -> tuple[list[float], VadStats]:
+    """
+    Speech regions after start as a flat clip_timestamps list ([start, end, start, end, ...]) of Whisper models,
+    which transcribe only these clips and keep the file timeline in segment timestamps.
+    :param audio: mono float32 array
+    :param start: offset in seconds, earlier audio is ignored (resume)
+    :param sampling_rate: sampling rate of the audio
+    :return: tuple(clip timestamps, VadStats)
+    """
+    duration = len(audio) / sampling_rate
+    clips: list[float] = []
+    speech = 0.0
+    for region_start, region_end in find_speech(audio, sampling_rate):
+        clip_start = max(region_start, start)
+        if region_end > clip_start:
+            clips += [round(clip_start, 3), round(region_end, 3)]
+            speech += region_end - clip_start
+    return clips, VadStats(total=max(0.0, duration - start), speech=speech)
+
+
+def speech_pieces(
+    audios: list[np.ndarray], sampling_rate: int = SAMPLE_RATE
+) -> tuple[list[tuple[int, float, np.ndarray]], VadStats]:
+    """
+    Cuts the speech regions out of short clips, so a batch carries no silence or steady sound inside a clip either.
+    :param audios: mono float32 arrays of the clips
+    :param sampling_rate: sampling rate of the audio
+    :return: tuple(list of (clip index, region start in the clip in seconds, region samples), VadStats of all clips)
+    """
+    pieces = []
+    stats = VadStats(total=0.0, speech=0.0)
+    for index, audio in enumerate(audios):
+        clips, clip_stats = speech_clips(audio, sampling_rate=sampling_rate)
+        stats.total += clip_stats.total
+        stats.speech += clip_stats.speech
+        for start, end in zip(clips[::2], clips[1::2], strict=True):
+            pieces.append((index, start, audio[int(start * sampling_rate) : int(end * sampling_rate)]))
+    return pieces, stats
@@ -1,32 +1,77 @@
+import time
 import warnings
+from collections.abc import Iterator
 from pathlib import Path
 
+import numpy as np
 import whisper
 from loguru import logger
 
+from objects import TranscriptionSegment
+from storage.audio_store import AudioStore
 from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import AudioSource, audio_name, load_audio
+from transcribers.language import language_sample
+from transcribers.model_pool import ModelKey, model_pool
+from transcribers.vad import speech_clips
 
 warnings.filterwarnings("ignore", message="FP16 is not supported on CPU; using FP32 instead")
 
 
 class WhisperTranscriber(AbstractTranscriber):
-    WHISPER_FORMATS = ["mp3", "mp4", "mpeg", "mpga", "m4a", "wav", "webm", "mov"]  # TODO take from config
+    WHISPER_FORMATS = ["mp3", "mp4", "mpeg", "mpga", "m4a", "wav", "webm", "mov", "ogg", "opus"]  # TODO from config
 
-    def __init__(self, model: str):
+    def __init__(self, model: str, speech_only: bool = True):
         if not self.validate_model(model):
             logger.error(f"Model {model} is not valid")
             raise ValueError
 
         self.model = model
+        self.speech_only = speech_only  # VAD pre-pass, silence and steady sounds are not sent to the model
+        self.model_key = ModelKey(backend="whisper", model=model)
         logger.info(f"WhisperTranscriber init with a model {self.model}")
 
-    def transcribe(self, path: Path) -> str:
-        if path.suffix.lstrip(".") not in self.WHISPER_FORMATS:
+    def detect_language(self, path: AudioSource) -> tuple[str | None, float]:
+        sample = language_sample(path, self.speech_only)
+        if not len(sample):
+            return None, 0.0
+        with model_pool.acquire(self.model_key, lambda: whisper.load_model(self.model)) as model:
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(sample), model.dims.n_mels).to(model.device)
+            _, probabilities = model.detect_language(mel)
+        language = max(probabilities, key=probabilities.get)
+        return language, probabilities[language]
+
+    def transcribe_stream(
+        self, path: AudioSource, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        if isinstance(path, Path) and path.suffix.lstrip(".") not in self.WHISPER_FORMATS:
             logger.error(f"File format is not supported: {path.suffix}")
             raise NotImplementedError("File format is not supported")
 
-        model = whisper.load_model(self.model)
-        logger.info("WhisperTranscriber transcription started")
-        result = model.transcribe(path.__fspath__())
+        if not self.speech_only:
+            # openai-whisper takes file names and arrays, file-like objects are decoded beforehand
+            result = self._transcribe(
+                path.__fspath__() if isinstance(path, Path) else load_audio(path), [start], language
+            )
+        else:
+            # the VAD pre-pass reads the decoded file through a memory map instead of holding it in memory
+            with AudioStore().samples(path) as audio:
+                clip_timestamps, stats = speech_clips(audio, start)
+                if not clip_timestamps:
+                    stats.log(audio_name(path))
+                    logger.info(f"No speech in {audio_name(path)}, transcription skipped")
+                    return
+                start_time = time.perf_counter()
+                result = self._transcribe(audio, clip_timestamps, language)
+                stats.log(audio_name(path), time.perf_counter() - start_time)
+
+        # openai-whisper decodes the whole file before returning, segments are only re-yielded here
+        for segment in result["segments"]:
+            yield TranscriptionSegment(
+                text=segment["text"], start=segment["start"], end=segment["end"], avg_logprob=segment["avg_logprob"]
+            )
 
-        return result["text"]
+    def _transcribe(self, audio: str | np.ndarray, clip_timestamps: list[float], language: str | None) -> dict:
+        with model_pool.acquire(self.model_key, lambda: whisper.load_model(self.model)) as model:
+            logger.info("WhisperTranscriber transcription started")
+            return model.transcribe(audio, clip_timestamps=clip_timestamps, language=language)
@@ -0,0 +1,234 @@
+import asyncio
+import contextlib
+import os
+import socket
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from metrics import metrics
+from objects import YouTubeVideo
+from storage.language_cache import LanguageCache
+from storage.transcript_cache import TranscriptCache
+from storage.work_store import ROLES, UnitKind, WorkStore, WorkUnit
+from transcribers.audio import probe_duration
+from transcribers.process_pool import ProcessPoolTranscriber
+from transcribers.transcript_writer import TranscriptWriter
+
+
+def download_unit(video: YouTubeVideo) -> tuple[str, dict[str, Any]]:
+    """
+    (key, payload) of the download unit of a video, see WorkStore.add_units.
+    """
+    return video.id, {"video": asdict(video)}
+
+
+class NodeWorker:
+    """
+    One node of a multi-host run: claims work units from a shared WorkStore and executes them,
+    download units with a YouTubeLoader (captions first, the audio otherwise) and transcribe units
+    with a ProcessPoolTranscriber. The role decides which units are claimed (see ROLES):
+    download nodes need no models, inference nodes no YouTube access.
+    Audio and transcripts are written to the loader directory, which is shared by the nodes;
+    units keep paths relative to it, so nodes may mount it at different paths.
+    Leases of the units in progress are extended every heartbeat_seconds, a unit reclaimed meanwhile
+    is dropped by this node and finished by its new holder. A running inference job cannot be stopped:
+    it is transcribed to a file of its own lease, moved onto the transcript only once the unit is completed
+    by this node, and discarded otherwise. Units in progress when the node stops
+    are reclaimed by other nodes once their leases expire.
+    internal settings: role, concurrency, lease, heartbeat and poll periods, max attempts, model
+    """
+
+    @dataclass
+    class Config:
+        role: str = "all"  # a ROLES key
+        concurrency: int = 4  # units processed at once
+        lease_seconds: float = 120.0
+        heartbeat_seconds: float = 30.0
+        poll_seconds: float = 2.0  # period of claims when the store is empty
+        max_attempts: int = 3  # claims after which a unit is given up
+        model: str = ""  # part of the transcript cache key
+        exit_when_idle: bool = False  # stop once no unit this node may still get is left
+
+    def __init__(  # noqa PLR0913
+        self,
+        store: WorkStore,
+        loader: Any,  # noqa ANN401 YouTubeLoader-like object providing get_captions and download_audio
+        process_pool: ProcessPoolTranscriber | None = None,
+        cache: TranscriptCache | None = None,
+        languages: LanguageCache | None = None,
+        config: Config | None = None,
+        worker_id: str | None = None,
+    ):
+        self.store = store
+        self.loader = loader
+        self.process_pool = process_pool
+        self.cache = cache
+        self.languages = languages
+        self.config = config or self.Config()
+        self.kinds = ROLES[self.config.role]
+        if UnitKind.TRANSCRIBE in self.kinds and process_pool is None:
+            raise ValueError(f"A process pool is required by the {self.config.role} role")
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{self.config.role}"
+        self.stats = {"processed": 0, "failed": 0, "lost": 0}
+        self._running: dict[int, tuple[WorkUnit, asyncio.Task]] = {}
+        self._lost: set[int] = set()  # reclaimed units still running
+        self._stopped = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    async def run(self) -> dict[str, int]:
+        """
+        Claims and executes units until stopped, or until idle with exit_when_idle.
+        :return: amount of processed, failed and lost (reclaimed by other nodes) units
+        """
+        # downloads produce transcribe units, an inference node waits for them too
+        watched = (*self.kinds, UnitKind.DOWNLOAD) if UnitKind.DOWNLOAD not in self.kinds else self.kinds
+        await self._call(self.store.heartbeat, self.worker_id, self.config.role, [], self.config.lease_seconds)
+        heartbeat = asyncio.create_task(self._heartbeat())
+        logger.info(f"Node {self.worker_id} started: {', '.join(self.kinds)} units")
+        try:
+            while not self._stopped.is_set():
+                free = self.config.concurrency - len(self._running)
+                units = await self._claim(free) if free > 0 else []
+                for unit in units:
+                    self._running[unit.id] = unit, asyncio.create_task(self._process(unit))
+                if self._running:
+                    await asyncio.wait(
+                        [task for _, task in self._running.values()],
+                        timeout=self.config.poll_seconds,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                elif self.config.exit_when_idle and not await self._call(self.store.unfinished, watched):
+                    break
+                else:
+                    await self._idle()
+        finally:
+            heartbeat.cancel()
+            tasks = [task for _, task in self._running.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(heartbeat, *tasks, return_exceptions=True)
+        logger.info(f"Node {self.worker_id} stopped: {self.stats}")
+        return self.stats
+
+    async def _idle(self) -> None:
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(self._stopped.wait(), self.config.poll_seconds)
+
+    @staticmethod
+    async def _call(func: Any, *args: Any) -> Any:  # noqa ANN401
+        # store calls may wait for the lock of another node, the event loop does not
+        return await asyncio.to_thread(func, *args)
+
+    async def _claim(self, limit: int) -> list[WorkUnit]:
+        return await self._call(
+            self.store.claim, self.worker_id, self.kinds, limit, self.config.lease_seconds, self.config.max_attempts
+        )
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.heartbeat_seconds)
+            running = dict(self._running)
+            held = await self._call(
+                self.store.heartbeat,
+                self.worker_id,
+                self.config.role,
+                running.keys() - self._lost,
+                self.config.lease_seconds,
+            )
+            for unit_id in running.keys() - held - self._lost:
+                self._lost.add(unit_id)
+                unit, task = running[unit_id]
+                if unit.kind == UnitKind.TRANSCRIBE:
+                    # the job goes on in the worker process, its transcript is discarded when it ends
+                    logger.warning(f"Unit {unit_id} was reclaimed from node {self.worker_id}, result is discarded")
+                    continue
+                logger.warning(f"Unit {unit_id} was reclaimed from node {self.worker_id}, dropped")
+                task.cancel()
+                self.stats["lost"] += 1
+            logger.info(f"Node {self.worker_id}: {len(running)} units in progress, {self.stats}")
+
+    async def _process(self, unit: WorkUnit) -> None:
+        start = time.perf_counter()
+        try:
+            follow_up = await (self._download(unit) if unit.kind == UnitKind.DOWNLOAD else self._transcribe(unit))
+        except Exception as error:  # noqa BLE001 a failed unit must not stop the node
+            logger.error(f"Unit {unit.kind} {unit.key} failed, attempt {unit.attempts}: {error!r}")
+            self._discard(unit)
+            await self._call(self.store.fail, unit, self.worker_id, repr(error), self.config.max_attempts)
+            self.stats["failed"] += 1
+            metrics.inc("work_units_total", kind=unit.kind, result="failed")
+            return
+        finally:
+            self._running.pop(unit.id, None)
+            self._lost.discard(unit.id)
+            metrics.observe("work_unit_seconds", time.perf_counter() - start, kind=unit.kind)
+        if not await self._call(self.store.complete, unit, self.worker_id, follow_up):
+            self._discard(unit)
+            self.stats["lost"] += 1
+            return
+        if unit.kind == UnitKind.TRANSCRIBE:
+            await self._publish(unit)
+        self.stats["processed"] += 1
+        metrics.inc("work_units_total", kind=unit.kind, result="processed")
+
+    def _audio(self, unit: WorkUnit) -> Path:
+        return self.loader.dir / unit.payload["audio"]
+
+    @staticmethod
+    def _part(target: Path, unit: WorkUnit) -> Path:
+        # every claim counts an attempt, so the attempt number identifies the lease
+        return target.with_name(f"{target.name}.{unit.attempts}.part")
+
+    def _discard(self, unit: WorkUnit) -> None:
+        if unit.kind != UnitKind.TRANSCRIBE:
+            return
+        part = self._part(self._audio(unit).with_suffix(".txt"), unit)
+        for path_ in (part, part.with_name(part.name + TranscriptWriter.PROGRESS_SUFFIX)):
+            path_.unlink(missing_ok=True)
+
+    async def _publish(self, unit: WorkUnit) -> None:
+        audio = self._audio(unit)
+        target = audio.with_suffix(".txt")
+        self._part(target, unit).replace(target)
+        if self.cache is not None:
+            key = TranscriptCache.key_for_video(unit.key, self.config.model)
+            await asyncio.to_thread(self.cache.put, key, target)
+        # only the holder of the finished unit removes the audio, a new holder of a lost unit still needs it
+        audio.unlink(missing_ok=True)
+        logger.info(f"Transcription saved\ntitle: {target}\n")
+
+    async def _download(self, unit: WorkUnit) -> tuple[UnitKind, dict[str, Any]] | None:
+        video = YouTubeVideo(**unit.payload["video"])
+        success, _ = await self.loader.get_captions(video)
+        if success:
+            return None
+        target = (self.loader.dir / self.loader.prepare_title(video.title)).with_suffix(".txt")
+        if self.cache is not None and self.cache.copy_to(
+            TranscriptCache.key_for_video(video.id, self.config.model), target
+        ):
+            return None
+        success, path_ = await self.loader.download_audio(video, for_transcription=True)
+        if not success:
+            raise RuntimeError(f"Audio download of {video.id} failed")
+        return UnitKind.TRANSCRIBE, {**unit.payload, "audio": str(path_.relative_to(self.loader.dir))}
+
+    async def _transcribe(self, unit: WorkUnit) -> None:
+        video = YouTubeVideo(**unit.payload["video"])
+        audio = self._audio(unit)
+        language = None
+        if self.languages is not None:
+            key = LanguageCache.key_for_video(video.id)
+            language = self.languages.get(key, video.channel_id)
+            if language is None:
+                detected = await self.process_pool.detect_language(audio)
+                language = self.languages.put(key, *detected, channel_id=video.channel_id)
+        duration = await probe_duration(audio)
+        part = self._part(audio.with_suffix(".txt"), unit)
+        await self.process_pool.transcribe_to_file(audio, part, duration=duration, language=language)
+        metrics.inc("audio_seconds_processed_total", duration)
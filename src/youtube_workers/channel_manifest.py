@@ -0,0 +1,81 @@
+import json
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+from objects import YouTubeVideo
+
+KEEP_IDS = 500  # amount of recent video ids remembered per channel
+
+
+@dataclass(slots=True)
+class ChannelManifest:
+    channel_id: str
+    playlist_id: str | None = None
+    last_video_id: str | None = None
+    last_published_at: str | None = None
+    etag: str | None = None  # ETag of the first uploads page, unchanged page means no new uploads
+    known_ids: list[str] = field(default_factory=list)  # most recent uploads, newest first
+    retry_ids: list[str] = field(default_factory=list)  # seen uploads not processed, returned by the next sync
+
+    def is_known(self, video_id: str, published_at: str) -> bool:
+        if video_id in self.known_ids:
+            return True
+        return bool(self.last_published_at) and published_at < self.last_published_at
+
+    def update(self, new_ids: list[str], newest_published_at: str | None, etag: str | None) -> None:
+        if new_ids:
+            self.last_video_id = new_ids[0]
+            self.last_published_at = max(newest_published_at or "", self.last_published_at or "")
+            self.known_ids = (new_ids + self.known_ids)[:KEEP_IDS]
+        if etag:
+            self.etag = etag
+
+
+class ManifestStore:
+    """
+    Per-channel manifests of already seen uploads, stored as <channel_id>.json.
+    Manifests are updated in memory while syncing and written by commit(),
+    so a failed run does not mark unprocessed uploads as seen;
+    videos that failed in a finished run are kept for retry and listed again by the next sync.
+    """
+
+    def __init__(self, directory: Path):
+        self.dir = directory
+        self._loaded: dict[str, ChannelManifest] = {}
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def load(self, channel_id: str) -> ChannelManifest:
+        if channel_id in self._loaded:
+            return self._loaded[channel_id]
+        path_ = self.dir / f"{channel_id}.json"
+        manifest = ChannelManifest(channel_id=channel_id)
+        if path_.is_file():
+            try:
+                manifest = ChannelManifest(**json.loads(path_.read_text(encoding="utf-8")))
+            except (ValueError, TypeError):
+                logger.warning(f"Corrupted manifest {path_}, channel will be synced from scratch")
+        self._loaded[channel_id] = manifest
+        return manifest
+
+    def commit(self, failed: Iterable[YouTubeVideo] = ()) -> None:
+        """
+        Writes the loaded manifests, the synced uploads are marked as seen.
+        :param failed: synced videos that were not processed, the next sync returns them again
+        :return: None
+        """
+        failed_ids: dict[str, list[str]] = {}
+        for video in failed:
+            failed_ids.setdefault(video.channel_id, []).append(video.id)
+        for manifest in self._loaded.values():
+            manifest.retry_ids = failed_ids.get(manifest.channel_id, [])
+            path_ = self.dir / f"{manifest.channel_id}.json"
+            tmp_path = path_.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(asdict(manifest)), encoding="utf-8")
+            tmp_path.replace(path_)
+            logger.info(
+                f"Manifest saved for channel {manifest.channel_id}, last video {manifest.last_video_id}, "
+                f"to retry: {len(manifest.retry_ids)}"
+            )
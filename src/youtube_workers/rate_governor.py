@@ -0,0 +1,234 @@
+import asyncio
+import random
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import TypeVar
+
+from loguru import logger
+
+from metrics import metrics
+
+T = TypeVar("T")
+
+# YouTube Data API v3 cost of one call in quota units, other endpoints (yt-dlp, captions) are free
+QUOTA_COSTS: dict[str, int] = {
+    "search": 100,
+    "channels": 1,
+    "playlistItems": 1,
+    "videos": 1,
+}
+DAILY_QUOTA = 10_000
+THROTTLING_MARKERS = ("429", "Too Many Requests", "RequestBlocked", "IpBlocked", "TooManyRequests")
+
+
+class RetryableError(Exception):
+    """
+    Throttling or a transient failure (429, 5xx, connection error), the request may be repeated.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parses the Retry-After header: delay in seconds or an HTTP date.
+    :param value: header value
+    :return: seconds to wait or None
+    """
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    text = f"{type(error).__name__} {error}"
+    return any(marker in text for marker in THROTTLING_MARKERS)
+
+
+class TokenBucket:
+    """
+    Allows rate requests per second on average with bursts of up to capacity requests.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AimdLimiter:
+    """
+    Concurrency limit with additive increase (about +1 per limit successful requests)
+    and multiplicative decrease on throttling, at most one decrease per cooldown.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease: float = 0.5, cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+    def on_throttle(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self._last_decrease = now
+            self.limit = max(float(self.minimum), self.limit * self.decrease)
+
+
+class QuotaTracker:
+    """
+    Counts spent quota units per endpoint, refuses requests that would exceed the budget.
+    """
+
+    def __init__(self, budget: int = DAILY_QUOTA):
+        self.budget = budget
+        self.used: Counter[str] = Counter()
+
+    @property
+    def total(self) -> int:
+        return self.used.total()
+
+    def charge(self, endpoint: str) -> None:
+        cost = QUOTA_COSTS.get(endpoint, 0)
+        if cost and self.total + cost > self.budget:
+            raise QuotaExceededError(f"Quota budget {self.budget} exhausted, {endpoint} costs {cost}")
+        self.used[endpoint] += cost
+
+    def exhaust(self) -> None:
+        self.used["exhausted"] += max(0, self.budget - self.total)
+
+
+class RequestGovernor:
+    """
+    Shared throttling policy for outgoing requests, every endpoint gets its own token bucket and AIMD limiter.
+    Retryable failures are repeated with exponential backoff and full jitter, Retry-After takes precedence.
+    API calls are charged to the quota budget, exhausted quota fails fast with QuotaExceededError.
+    internal settings: see Config
+    """
+
+    @dataclass(slots=True)
+    class Config:
+        rates: dict[str, float] = field(default_factory=dict)  # requests per second by endpoint
+        default_rate: float = 10.0
+        burst: float = 10.0
+        initial_concurrency: int = 8
+        min_concurrency: int = 1
+        max_concurrency: int = 20
+        attempts: int = 5
+        base_delay: float = 0.5
+        max_delay: float = 60.0
+        quota_budget: int = DAILY_QUOTA
+
+    def __init__(self, config: Config | None = None):
+        self.config = config or self.Config()
+        self.quota = QuotaTracker(self.config.quota_budget)
+        self.stats: Counter[str] = Counter()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._limiters: dict[str, AimdLimiter] = {}
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        if endpoint not in self._buckets:
+            rate = self.config.rates.get(endpoint, self.config.default_rate)
+            self._buckets[endpoint] = TokenBucket(rate, self.config.burst)
+        return self._buckets[endpoint]
+
+    def limiter(self, endpoint: str) -> AimdLimiter:
+        if endpoint not in self._limiters:
+            self._limiters[endpoint] = AimdLimiter(
+                self.config.initial_concurrency, self.config.min_concurrency, self.config.max_concurrency
+            )
+        return self._limiters[endpoint]
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.config.max_delay)
+        return random.uniform(0, min(self.config.max_delay, self.config.base_delay * 2**attempt))  # noqa S311
+
+    async def call(self, endpoint: str, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs a request under the endpoint limits, retries it on RetryableError.
+        :param endpoint: endpoint name, e.g. "playlistItems"
+        :param request: coroutine factory making one attempt
+        :return: request result
+        """
+        limiter = self.limiter(endpoint)
+        for attempt in range(self.config.attempts):
+            waiting_since = time.perf_counter()
+            await self.bucket(endpoint).acquire()
+            self.quota.charge(endpoint)
+            self.stats[f"{endpoint}.requests"] += 1
+            try:
+                async with limiter:
+                    # rate limit and concurrency limit together
+                    metrics.observe("governor_wait_seconds", time.perf_counter() - waiting_since, endpoint=endpoint)
+                    result = await request()
+            except RetryableError as error:
+                limiter.on_throttle()
+                self.stats[f"{endpoint}.retries"] += 1
+                metrics.inc("governor_retries_total", endpoint=endpoint)
+                if attempt + 1 == self.config.attempts:
+                    logger.error(f"{endpoint} failed after {attempt + 1} attempts: {error}")
+                    raise
+                delay = self.backoff(attempt, error.retry_after)
+                logger.warning(f"{endpoint} throttled ({error}), retry in {delay:.2f}s, limit {int(limiter.limit)}")
+                await asyncio.sleep(delay)
+            except QuotaExceededError:
+                self.quota.exhaust()
+                raise
+            else:
+                limiter.on_success()
+                return result
+
+        raise RetryableError(f"{endpoint}: no attempts configured")
+
+    def report(self) -> dict[str, float]:
+        return {
+            **self.stats,
+            "quota_used": self.quota.total,
+            **{f"{endpoint}.limit": limiter.limit for endpoint, limiter in self._limiters.items()},
+        }
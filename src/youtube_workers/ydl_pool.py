@@ -0,0 +1,134 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+
+from metrics import metrics
+
+if TYPE_CHECKING:
+    import yt_dlp
+
+_postprocessing = threading.local()  # start time of the running postprocessor of a thread
+
+
+def _progress_hook(status: dict[str, Any]) -> None:
+    if status.get("status") != "finished":
+        return
+    metrics.inc("download_bytes_total", status.get("total_bytes") or status.get("downloaded_bytes") or 0)
+    if status.get("elapsed") is not None:
+        metrics.observe("download_seconds", status["elapsed"])
+
+
+def _postprocessor_hook(status: dict[str, Any]) -> None:
+    # ffmpeg work of yt-dlp (audio extraction, merging) is measured apart from the network download
+    if status.get("status") == "started":
+        _postprocessing.start = time.perf_counter()
+    elif status.get("status") == "finished" and getattr(_postprocessing, "start", None) is not None:
+        metrics.observe(
+            "postprocess_seconds", time.perf_counter() - _postprocessing.start, postprocessor=status["postprocessor"]
+        )
+        _postprocessing.start = None
+
+
+class YdlPool:
+    """
+    Pre-configured yt_dlp.YoutubeDL instances, one per worker thread and option profile,
+    so extractors, cookies and HTTP state are initialized once per thread instead of once per video.
+    Extractor results (extract_info without format processing) are cached by URL for info_ttl seconds:
+    format URLs of YouTube expire after a few hours, within the TTL a repeated download skips the metadata fetch.
+    internal settings: info cache TTL and size
+    """
+
+    def __init__(self, base_options: dict[str, Any], info_ttl: float = 3600.0, info_cache_size: int = 256):
+        self.base_options = base_options
+        self.info_ttl = info_ttl
+        self.info_cache_size = info_cache_size
+        self.info_hits = 0
+        self.info_misses = 0
+        self._local = threading.local()
+        self._instances: list[yt_dlp.YoutubeDL] = []
+        self._info: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, profile: str, options: dict[str, Any]) -> "yt_dlp.YoutubeDL":
+        """
+        Returns the YoutubeDL of the current thread for the profile, creates it on the first call.
+        :param profile: profile name, the same name must always come with the same options
+        :param options: profile options on top of the base options
+        :return: YoutubeDL instance, must not be shared with other threads
+        """
+        import yt_dlp  # noqa PLC0415 a second of import time, loaded once something is downloaded
+
+        instances: dict[str, yt_dlp.YoutubeDL] = getattr(self._local, "instances", None) or {}
+        self._local.instances = instances
+        if profile not in instances:
+            hooks = {"progress_hooks": [_progress_hook], "postprocessor_hooks": [_postprocessor_hook]}
+            instances[profile] = yt_dlp.YoutubeDL(
+                {**copy.deepcopy(self.base_options), **copy.deepcopy(options), **hooks}
+            )
+            with self._lock:
+                self._instances.append(instances[profile])
+            logger.debug(f"YoutubeDL instance created for profile {profile} in {threading.current_thread().name}")
+        return instances[profile]
+
+    def extract_info(self, ydl: "yt_dlp.YoutubeDL", url: str) -> dict[str, Any]:
+        """
+        Fetches extractor metadata of the url or takes it from the cache.
+        :param ydl: YoutubeDL instance to extract with
+        :param url: media page url
+        :return: raw info dict, not processed by format selection
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._info.get(url)
+            if cached and now - cached[0] < self.info_ttl:
+                self._info.move_to_end(url)
+                self.info_hits += 1
+                metrics.inc("cache_lookups_total", cache="ydl_info", result="hit")
+                return cached[1]
+            self.info_misses += 1
+        metrics.inc("cache_lookups_total", cache="ydl_info", result="miss")
+        with metrics.timer("ydl_extract_seconds"):
+            info = ydl.extract_info(url, download=False, process=False)
+        with self._lock:
+            self._info[url] = (now, info)
+            self._info.move_to_end(url)
+            while len(self._info) > self.info_cache_size:
+                self._info.popitem(last=False)
+        return info
+
+    def download(self, profile: str, options: dict[str, Any], url: str, outtmpl: str) -> dict[str, Any]:
+        """
+        Downloads the url with the thread's instance of the profile.
+        :param profile: profile name
+        :param options: profile options, used when the instance is created
+        :param url: media page url
+        :param outtmpl: output template of this download
+        :return: processed info dict
+        """
+        ydl = self.get(profile, options)
+        info = self.extract_info(ydl, url)
+        ydl.params["outtmpl"]["default"] = outtmpl
+        # format selection and postprocessing modify the info dict, the cached one stays intact
+        return ydl.process_ie_result(copy.deepcopy(info), download=True)
+
+    def resolve(self, profile: str, options: dict[str, Any], url: str) -> dict[str, Any]:
+        """
+        Selects the format of the profile without downloading it.
+        :param profile: profile name
+        :param options: profile options, used when the instance is created
+        :param url: media page url
+        :return: processed info dict, "url" and "http_headers" describe the selected single-file format
+        """
+        ydl = self.get(profile, options)
+        return ydl.process_ie_result(copy.deepcopy(self.extract_info(ydl, url)), download=False)
+
+    def close(self) -> None:
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            ydl.close()
+        self._local = threading.local()
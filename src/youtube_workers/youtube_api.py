@@ -1,15 +1,128 @@
+import asyncio
 import re
+from collections.abc import AsyncIterator
+from http import HTTPStatus
+from typing import Self
 
-from aiohttp import ClientSession
+from aiohttp import ClientConnectionError, ClientSession, ClientTimeout, TCPConnector
 from loguru import logger
 
+from metrics import metrics
 from objects import YouTubeVideo
+from youtube_workers.channel_manifest import ChannelManifest
+from youtube_workers.rate_governor import QuotaExceededError, RequestGovernor, RetryableError, parse_retry_after
+
+VIDEO_ID_PATTERNS = [r"v=([^&]+)", r"shorts/([^&]+)", r"live/([^&]+)"]
+VIDEOS_PER_REQUEST = 50  # max ids per /videos call
+QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class ApiError(Exception):
+    """
+    The API rejected the request (4xx other than throttling), repeating it would not help.
+    """
+
+
+def _error_reason(response_json: dict) -> str | None:
+    errors = response_json.get("error", {}).get("errors") or [{}]
+    return errors[0].get("reason")
+
+
+def extract_video_id(link: str) -> str | None:
+    for pattern in VIDEO_ID_PATTERNS:
+        match = re.search(pattern, link)
+        if match:
+            return match.group(1)
+    return None
 
 
 class YouTubeClient:
-    def __init__(self, api_key: str):
+    """
+    YouTube Data API v3 client.
+    Owns one long-lived aiohttp session, so requests reuse TCP+TLS connections to the API host.
+    Every request goes through a RequestGovernor: per-endpoint rate limits, retries with backoff, quota accounting.
+    Use as an async context manager or call close() when done.
+    internal settings: connections limit, keep-alive timeout, DNS cache TTL, request timeout
+    """
+
+    def __init__(  # noqa PLR0913
+        self,
+        api_key: str,
+        base_url: str = "https://www.googleapis.com/youtube/v3",
+        connections_limit: int = 20,
+        keepalive_timeout: float = 60.0,
+        request_timeout: float = 30.0,
+        governor: RequestGovernor | None = None,
+    ):
         self.api_key = api_key
-        self.base_url = "https://www.googleapis.com/youtube/v3"
+        self.base_url = base_url
+        self.connections_limit = connections_limit
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.governor = governor or RequestGovernor()
+        self._session: ClientSession | None = None
+
+    async def __aenter__(self) -> Self:
+        self._get_session()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _get_session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(
+                limit=self.connections_limit,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = ClientSession(connector=connector, timeout=ClientTimeout(total=self.request_timeout))
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("YouTubeClient session closed")
+        self._session = None
+
+    async def _get_json(self, endpoint: str, params: dict, headers: dict | None = None) -> tuple[int, dict]:
+        """
+        Makes a governed GET request to the API endpoint.
+        429, 5xx, rate limit errors and connection failures are retried, exhausted quota raises QuotaExceededError,
+        any other 4xx raises ApiError, so a rejected request never passes for an empty page.
+        :param endpoint: endpoint name, e.g. "videos"
+        :param params: query parameters
+        :param headers: request headers
+        :return: tuple(HTTP status, response json), json is empty for 304
+        """
+        session = self._get_session()
+        url = f"{self.base_url}/{endpoint}"
+
+        async def attempt() -> tuple[int, dict]:
+            try:
+                with metrics.timer("youtube_api_request_seconds", endpoint=endpoint):
+                    async with session.get(url, params=params, headers=headers or {}) as response:
+                        metrics.inc("youtube_api_responses_total", endpoint=endpoint, status=response.status)
+                        if response.status == HTTPStatus.NOT_MODIFIED:
+                            return response.status, {}
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        if response.status in (HTTPStatus.TOO_MANY_REQUESTS, *range(500, 600)):
+                            raise RetryableError(f"HTTP {response.status}", retry_after)
+                        response_json = await response.json(content_type=None) or {}
+            except (ClientConnectionError, TimeoutError) as error:
+                raise RetryableError(repr(error)) from error
+            if response.status == HTTPStatus.FORBIDDEN:
+                reason = _error_reason(response_json)
+                if reason in RATE_LIMIT_REASONS:
+                    raise RetryableError(f"HTTP 403 {reason}", retry_after)
+                if reason in QUOTA_REASONS:
+                    raise QuotaExceededError(f"YouTube API quota exceeded: {reason}")
+            if response.status >= HTTPStatus.BAD_REQUEST:
+                raise ApiError(f"HTTP {response.status} {_error_reason(response_json) or ''}".rstrip())
+            return response.status, response_json
+
+        return await self.governor.call(endpoint, attempt)
 
     async def get_channel_id_by_link(self, link: str) -> str | None:
         """
@@ -19,155 +132,243 @@ class YouTubeClient:
         """
         channel_id = None
 
-        async with ClientSession() as session:
-            if "channel/" in link:
-                channel_id = link.split("channel/")[1]
-                url = f"{self.base_url}/channels"
-                params = {
-                    "part": "id",
-                    "id": channel_id,
-                    "key": self.api_key,
-                }
-                try:
-                    async with session.get(url, params=params) as response:
-                        response_json = await response.json()
-                        if not (response_json.get("items") and response_json["items"][0]["kind"] == "youtube#channel"):
-                            logger.warning(f"Unable to get channel id from link {link}")
-                            channel_id = None
-                        else:
-                            logger.info(f"Found a channel id: {channel_id}")
-                except Exception as error:
-                    logger.error(f"Error during http connection try: {error}")
-            elif "@" in link:
-                channel_name = link.split("@")[1]
-                url = f"{self.base_url}/search"
-                params = {
-                    "part": "id",
-                    "q": channel_name,
-                    "type": "channel",
-                    "maxResults": 1,
-                    "key": self.api_key,
-                }
-                try:
-                    async with session.get(url, params=params) as response:
-                        response_json = await response.json()
-                        if response_json.get("items") and response_json["items"][0]["id"]["kind"] == "youtube#channel":
-                            channel_id = response_json["items"][0]["id"]["channelId"]
-                            logger.info(f"Found a channel id: {channel_id}")
-                        else:
-                            logger.warning(f"Unable to get channel id from link {link}")
-                except Exception as error:
-                    logger.error(f"Error during http connection try: {error}")
-            else:
-                logger.warning(f"Unable to get channel id from link {link}")
-
-        return channel_id
-
-    async def get_channel_videos(self, channel_id: str) -> tuple[int, list[YouTubeVideo] | None]:
-        videos = []
-        amount = 0
-        logger.info("Collecting video links process started...")
-
-        async with ClientSession() as session:
-            url = f"{self.base_url}/channels"
+        if "channel/" in link:
+            channel_id = link.split("channel/")[1]
             params = {
-                "part": "contentDetails",
+                "part": "id",
                 "id": channel_id,
                 "key": self.api_key,
             }
             try:
-                async with session.get(url, params=params) as response:
-                    response_json = await response.json()
-                    if response_json.get("items") and response_json["items"][0]["contentDetails"]:
-                        playlist_id = response_json["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
-                        logger.info(f"Got the playlist id: {playlist_id}")
-                    else:
-                        logger.warning(f"Unable to get the playlist id for channel id: {channel_id}")
-                        return amount, None
+                _, response_json = await self._get_json("channels", params)
+                if not (response_json.get("items") and response_json["items"][0]["kind"] == "youtube#channel"):
+                    logger.warning(f"Unable to get channel id from link {link}")
+                    channel_id = None
+                else:
+                    logger.info(f"Found a channel id: {channel_id}")
             except Exception as error:
                 logger.error(f"Error during http connection try: {error}")
-                return amount, None
-
-            url = f"{self.base_url}/playlistItems"
+                channel_id = None
+        elif "@" in link:
+            channel_name = link.split("@")[1]
             params = {
-                "part": "snippet",
-                "playlistId": playlist_id,
-                "maxResults": 50,
+                "part": "id",
+                "q": channel_name,
+                "type": "channel",
+                "maxResults": 1,
                 "key": self.api_key,
             }
-            while True:
-                try:
-                    async with session.get(url, params=params) as response:
-                        response_json = await response.json()
-                        logger.info(
-                            f"Processing videos from {amount}.. to total: {response_json['pageInfo']['totalResults']}"
-                        )
-                        if response_json["items"] and response_json["items"][0]["snippet"]:
-                            for item in response_json["items"]:
-                                video = YouTubeVideo(
-                                    id=item["snippet"]["resourceId"]["videoId"],
-                                    kind=item["snippet"]["resourceId"]["kind"],
-                                    published_at=item["snippet"]["publishedAt"],
-                                    owner_username=item["snippet"]["channelTitle"],
-                                    channel_id=channel_id,
-                                    title=item["snippet"]["title"],
-                                    link=None,
-                                )
-                                amount += 1
-                                videos.append(video)
-                        else:
-                            logger.warning(f"Unable to get video #{amount} info for playlist_id: {playlist_id}")
-                except Exception as error:
-                    logger.error(f"Error during http connection try: {error}")
-                next_page_token = response_json.get("nextPageToken")
-                params["pageToken"] = next_page_token
-                if not next_page_token:
+            try:
+                _, response_json = await self._get_json("search", params)
+                if response_json.get("items") and response_json["items"][0]["id"]["kind"] == "youtube#channel":
+                    channel_id = response_json["items"][0]["id"]["channelId"]
+                    logger.info(f"Found a channel id: {channel_id}")
+                else:
+                    logger.warning(f"Unable to get channel id from link {link}")
+            except Exception as error:
+                logger.error(f"Error during http connection try: {error}")
+        else:
+            logger.warning(f"Unable to get channel id from link {link}")
+
+        return channel_id
+
+    async def get_channel_videos(self, channel_id: str) -> tuple[int, list[YouTubeVideo] | None]:
+        videos = []
+        async for page in self.iter_channel_videos(channel_id):
+            videos.extend(page)
+
+        return len(videos), videos
+
+    async def iter_channel_videos(
+        self, channel_id: str, manifest: ChannelManifest | None = None
+    ) -> AsyncIterator[list[YouTubeVideo]]:
+        """
+        Pages through the channel uploads playlist, yields videos page by page.
+        With a manifest only the delta is returned: paging stops at the first already known upload,
+        an unchanged first page (ETag match, 304) finishes the sync without requesting anything else.
+        Uploads kept for retry by the manifest (failed on a previous run) are yielded first.
+        The manifest is updated in memory only if the sync completed without errors.
+        :param channel_id: YouTube channel id
+        :param manifest: ChannelManifest of the channel for the incremental mode
+        :return: async generator of YouTubeVideo lists
+        """
+        logger.info("Collecting video links process started...")
+
+        playlist_id = manifest.playlist_id if manifest else None
+        playlist_id = playlist_id or await self._get_uploads_playlist_id(channel_id)
+        if not playlist_id:
+            return
+        if manifest:
+            manifest.playlist_id = playlist_id
+            retried = await self._fetch_retried(manifest.retry_ids)
+            if retried:
+                logger.info(f"Retrying {len(retried)} videos of channel {channel_id} failed on a previous run")
+                yield retried
+        async for videos in self._iter_uploads(channel_id, playlist_id, manifest):
+            yield videos
+
+    async def _iter_uploads(
+        self, channel_id: str, playlist_id: str, manifest: ChannelManifest | None
+    ) -> AsyncIterator[list[YouTubeVideo]]:
+        params = {
+            "part": "snippet",
+            "playlistId": playlist_id,
+            "maxResults": 50,
+            "key": self.api_key,
+        }
+        amount = 0
+        new_ids: list[str] = []
+        newest_published_at = None
+        etag = None
+        while True:
+            first_page = "pageToken" not in params
+            headers = {"If-None-Match": manifest.etag} if manifest and manifest.etag and first_page else {}
+            try:
+                status, response_json = await self._get_json("playlistItems", params, headers)
+            except Exception as error:
+                logger.error(f"Channel {channel_id} sync interrupted, manifest is not updated: {error}")
+                return
+            if status == HTTPStatus.NOT_MODIFIED:
+                logger.info(f"No new uploads on channel {channel_id}")
+                break
+            if first_page:
+                etag = response_json.get("etag")
+
+            videos = []
+            reached_known = False
+            for item in response_json.get("items", []):
+                if not item.get("snippet"):
+                    logger.warning(f"Unable to get video #{amount} info for playlist_id: {playlist_id}")
+                    continue
+                video = YouTubeVideo(
+                    id=item["snippet"]["resourceId"]["videoId"],
+                    kind=item["snippet"]["resourceId"]["kind"],
+                    published_at=item["snippet"]["publishedAt"],
+                    owner_username=item["snippet"]["channelTitle"],
+                    channel_id=channel_id,
+                    title=item["snippet"]["title"],
+                    link=None,
+                )
+                if manifest and manifest.is_known(video.id, video.published_at):
+                    reached_known = True
                     break
+                videos.append(video)
+                new_ids.append(video.id)
+                newest_published_at = max(newest_published_at or "", video.published_at)
 
-        return amount, videos
+            amount += len(videos)
+            total = response_json.get("pageInfo", {}).get("totalResults")
+            logger.info(f"Processed videos: {amount} of total: {total}")
+            if videos:
+                yield videos
 
-    async def get_video_by_link(self, link: str) -> YouTubeVideo | None:
-        patterns = [r"v=([^&]+)", r"shorts/([^&]+)", r"live/([^&]+)"]
-        video_obj = None
-        for pattern in patterns:
-            match = re.search(pattern, link)
-            if match:
-                video_id = match.group(1)
-                video_obj = await self._form_object_from_video(video_id)
+            next_page_token = response_json.get("nextPageToken")
+            if reached_known or not next_page_token:
                 break
+            params["pageToken"] = next_page_token
+
+        if manifest:
+            manifest.update(new_ids, newest_published_at, etag)
+
+    async def _fetch_retried(self, video_ids: list[str]) -> list[YouTubeVideo]:
+        videos = []
+        for i in range(0, len(video_ids), VIDEOS_PER_REQUEST):
+            found = await self._fetch_videos(video_ids[i : i + VIDEOS_PER_REQUEST])
+            videos.extend(found[video_id] for video_id in video_ids[i : i + VIDEOS_PER_REQUEST] if video_id in found)
+        return videos
+
+    async def _get_uploads_playlist_id(self, channel_id: str) -> str | None:
+        params = {
+            "part": "contentDetails",
+            "id": channel_id,
+            "key": self.api_key,
+        }
+        try:
+            _, response_json = await self._get_json("channels", params)
+            if response_json.get("items") and response_json["items"][0]["contentDetails"]:
+                playlist_id = response_json["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+                logger.info(f"Got the playlist id: {playlist_id}")
+                return playlist_id
+            logger.warning(f"Unable to get the playlist id for channel id: {channel_id}")
+        except Exception as error:
+            logger.error(f"Error during http connection try: {error}")
+
+        return None
+
+    async def get_video_by_link(self, link: str) -> YouTubeVideo | None:
+        video_id = extract_video_id(link)
+        video_obj = await self._form_object_from_video(video_id) if video_id else None
 
         if not video_obj:
             logger.warning(f"Unable to get video id from link {link}")
 
         return video_obj
 
-    async def _form_object_from_video(self, video_id: str) -> YouTubeVideo | None:
-        video = None
+    async def get_videos_by_links(self, links: list[str], concurrency: int = 4) -> tuple[list[YouTubeVideo], list[str]]:
+        """
+        Bulk version of get_video_by_link: ids are deduplicated and requested up to 50 per /videos call,
+        chunks are fetched concurrently.
+        :param links: YouTube video links
+        :param concurrency: max amount of simultaneous requests
+        :return: tuple(videos in the input order without duplicates, links that failed)
+        """
+        ids_by_link = {link: extract_video_id(link) for link in links}
+        unique_ids = list(dict.fromkeys(video_id for video_id in ids_by_link.values() if video_id))
+        chunks = [unique_ids[i : i + VIDEOS_PER_REQUEST] for i in range(0, len(unique_ids), VIDEOS_PER_REQUEST)]
+        semaphore = asyncio.Semaphore(concurrency)
 
-        async with ClientSession() as session:
-            url = f"{self.base_url}/videos"
-            params = {
-                "part": "snippet",
-                "id": video_id,
-                "key": self.api_key,
-            }
-            try:
-                async with session.get(url, params=params) as response:
-                    response_json = await response.json()
-                    if response_json.get("items") and response_json["items"][0]:
-                        video = YouTubeVideo(
-                            id=video_id,
-                            kind=response_json["items"][0]["kind"],
-                            published_at=response_json["items"][0]["snippet"]["publishedAt"],
-                            owner_username=response_json["items"][0]["snippet"]["channelTitle"],
-                            channel_id=response_json["items"][0]["snippet"]["channelId"],
-                            title=response_json["items"][0]["snippet"]["title"],
-                            link=None,
-                        )
-                        logger.info(f"Got the video by id: {video_id}")
-                    else:
-                        logger.warning(f"Unable to get video by id: {video_id}")
-            except Exception as error:
-                logger.error(f"Error during http connection try: {error}")
+        async def fetch(chunk: list[str]) -> dict[str, YouTubeVideo]:
+            async with semaphore:
+                return await self._fetch_videos(chunk)
+
+        found: dict[str, YouTubeVideo] = {}
+        for result in await asyncio.gather(*(fetch(chunk) for chunk in chunks)):
+            found.update(result)
+
+        videos = [found[video_id] for video_id in unique_ids if video_id in found]
+        failed = [link for link, video_id in ids_by_link.items() if video_id not in found]
+        logger.info(f"Got {len(videos)} videos in {len(chunks)} requests, failed links: {len(failed)}")
+        for link in failed:
+            logger.warning(f"Unable to get video from link {link}")
+
+        return videos, failed
+
+    async def _form_object_from_video(self, video_id: str) -> YouTubeVideo | None:
+        video = (await self._fetch_videos([video_id])).get(video_id)
+        if video:
+            logger.info(f"Got the video by id: {video_id}")
+        else:
+            logger.warning(f"Unable to get video by id: {video_id}")
 
         return video
+
+    async def _fetch_videos(self, video_ids: list[str]) -> dict[str, YouTubeVideo]:
+        """
+        Requests snippets of up to 50 videos in one /videos call.
+        :param video_ids: list of video ids
+        :return: dict video id -> YouTubeVideo for the found videos
+        """
+        videos = {}
+
+        params = {
+            "part": "snippet",
+            "id": ",".join(video_ids),
+            "maxResults": VIDEOS_PER_REQUEST,
+            "key": self.api_key,
+        }
+        try:
+            _, response_json = await self._get_json("videos", params)
+            for item in response_json.get("items", []):
+                videos[item["id"]] = YouTubeVideo(
+                    id=item["id"],
+                    kind=item["kind"],
+                    published_at=item["snippet"]["publishedAt"],
+                    owner_username=item["snippet"]["channelTitle"],
+                    channel_id=item["snippet"]["channelId"],
+                    title=item["snippet"]["title"],
+                    link=None,
+                )
+        except Exception as error:
+            logger.error(f"Error during http connection try: {error}")
+
+        return videos
@@ -1,34 +1,76 @@
 import asyncio
-import copy
-from collections.abc import Callable
+import itertools
+import time
+from collections.abc import AsyncIterator, Callable, Iterable
 from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from pathlib import Path
 from typing import Any
 
-import yt_dlp
+import numpy as np
 from loguru import logger
-from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled, YouTubeTranscriptApi
 
+from metrics import metrics
 from objects import YouTubeVideo
+from storage.language_cache import LanguageCache
+from storage.transcript_cache import TranscriptCache
+from transcribers.audio import decode_audio
+from youtube_workers.rate_governor import QuotaExceededError, RequestGovernor, RetryableError, is_throttling_error
+from youtube_workers.ydl_pool import YdlPool
 
 
 class YouTubeLoader:
     """
     Client loader.
     Using yt_dlp and youtube_transcript_api libs.
-    internal settings: Semaphore number, ThreadPoolExecutor workers number
+    Calls are throttled by a RequestGovernor ("media" and "captions" endpoints): the concurrency adapts
+    to throttling responses, throttled calls are retried with backoff.
+    yt_dlp.YoutubeDL instances are reused per worker thread and download profile (see YdlPool).
+    Captions are requested in the language known from a LanguageCache (the video's own or its channel majority),
+    the language of auto-generated captions is recorded there as the spoken language of the video.
+    internal settings: ThreadPoolExecutor workers number
     """
     __config: dict[str, Any] = {
         "quiet": True,
     }
+    AUDIO_PROFILE: dict[str, Any] = {
+        "format": "bestaudio[ext=m4a]/best",
+        "postprocessors": [
+            {
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": "mp3",
+                "preferredquality": "192",
+            }
+        ],
+    }
+    DEFAULT_CAPTIONS_LANGUAGE = "ru"  # used until the language of a video or its channel is known
+    # native audio stream without re-encoding, the transcriber decodes it to 16 kHz PCM anyway
+    TRANSCRIPTION_PROFILE: dict[str, Any] = {
+        "format": "bestaudio[acodec=opus]/bestaudio[ext=m4a]/bestaudio/best",
+    }
 
-    def __init__(self, directory: Path):
+    def __init__(
+        self,
+        directory: Path,
+        cache: TranscriptCache | None = None,
+        governor: RequestGovernor | None = None,
+        languages: LanguageCache | None = None,
+        workers: int = 20,
+    ):
         self.dir = directory
-        self.semaphore = asyncio.Semaphore(20)
-        self.pool = ThreadPoolExecutor(max_workers=20)
+        self.cache = cache
+        self.languages = languages
+        self.governor = governor or RequestGovernor()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.ydl_pool = YdlPool(self.__config)
         logger.info("YouTubeLoader initialized")
 
+    def media_url(self, video: YouTubeVideo) -> str:
+        """
+        URL yt-dlp downloads the media of the video from, the watch page by default.
+        """
+        return video.generate_link()
+
     @staticmethod
     def prepare_title(title: str) -> str:
         """
@@ -49,44 +91,94 @@ class YouTubeLoader:
         return new_title.strip("_").lower()
 
     @staticmethod
-    def _async_wrap(func: Callable[..., Any]) -> Callable[..., Any]:
-        @wraps(func)
-        async def wrapper(self, *args, **kwargs):  # noqa ANN202
-            async with self.semaphore:
+    def _async_wrap(
+        endpoint: str, failure: tuple[bool, Any] = (False, Path())
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """
+        Runs the method in the loader pool under the endpoint limits of the governor.
+        :param endpoint: governor endpoint of the calls, e.g. "media"
+        :param failure: result of a call given up after the retries or with the quota exhausted
+        """
+
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            @wraps(func)
+            async def wrapper(self, *args, **kwargs):  # noqa ANN202
                 loop = asyncio.get_running_loop()
-                return await loop.run_in_executor(self.pool, lambda: func(self, *args, **kwargs))
 
-        return wrapper
+                def dispatch() -> asyncio.Future:
+                    submitted = time.perf_counter()
+
+                    def run() -> Any:  # noqa ANN401
+                        metrics.observe("executor_queue_seconds", time.perf_counter() - submitted, task=func.__name__)
+                        with metrics.timer("executor_run_seconds", task=func.__name__):
+                            return func(self, *args, **kwargs)
+
+                    return loop.run_in_executor(self.pool, run)
+
+                try:
+                    return await self.governor.call(endpoint, dispatch)
+                except (RetryableError, QuotaExceededError) as error:
+                    logger.error(f"{func.__name__} gave up: {error!r}")
+                    return failure
 
-    @_async_wrap
-    def download_audio(self, video: YouTubeVideo) -> (bool, Path):
+            return wrapper
+
+        return decorator
+
+    @_async_wrap("media")
+    def download_audio(self, video: YouTubeVideo, for_transcription: bool = False) -> (bool, Path):
         """
         Downloads audio from the YouTube video.
         :param video: YouTubeVideo instance with the checked video meta
+        :param for_transcription: keep the native m4a/opus stream instead of encoding MP3
         :return: tuple(bool, Path)
         """
+        import yt_dlp  # noqa PLC0415 see YdlPool.get
+
         title = self.prepare_title(video.title)
-        config = copy.deepcopy(self.__config)
-        config["postprocessors"] = [
-            {
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": "mp3",
-                "preferredquality": "192",
-            }
-        ]
-        ext = config["postprocessors"][0]["preferredcodec"]
-        config["format"] = "bestaudio[ext=m4a]/best"
-        config["outtmpl"] = f"{self.dir}/{title}.%(ext)s"
+        link, outtmpl = self.media_url(video), f"{self.dir}/{title}.%(ext)s"
         try:
-            with yt_dlp.YoutubeDL(config) as ydl:
-                ydl.download([video.generate_link()])
-                logger.info(f"Audio downloaded to {self.dir}/{title}.{ext}")
-                return True, Path(f"{self.dir}/{title}.{ext}")
-        except yt_dlp.utils.DownloadError:
+            if for_transcription:
+                info = self.ydl_pool.download("transcription", self.TRANSCRIPTION_PROFILE, link, outtmpl)
+                path_ = Path(info["requested_downloads"][0]["filepath"])
+            else:
+                self.ydl_pool.download("audio", self.AUDIO_PROFILE, link, outtmpl)
+                path_ = Path(f"{self.dir}/{title}.{self.AUDIO_PROFILE['postprocessors'][0]['preferredcodec']}")
+            logger.info(f"Audio downloaded to {path_}")
+            metrics.inc("media_files_total", kind="audio")
+            return True, path_
+        except yt_dlp.utils.DownloadError as error:
+            if is_throttling_error(error):
+                raise RetryableError(str(error)) from error
             logger.error(f"Exception during audio download for video id: {video.id}")
             return False, Path()
 
-    @_async_wrap
+    @_async_wrap("media", failure=(False, None))
+    def load_audio(self, video: YouTubeVideo) -> (bool, np.ndarray | None):
+        """
+        Streams the native audio track through ffmpeg straight into a 16 kHz mono float32 buffer,
+        nothing is written to disk. The whole track is held in memory: 16000 * 4 bytes per second, ~230 MB per hour.
+        :param video: YouTubeVideo instance with the checked video meta
+        :return: tuple(bool, np.ndarray or None)
+        """
+        import yt_dlp  # noqa PLC0415 see YdlPool.get
+
+        try:
+            info = self.ydl_pool.resolve("transcription", self.TRANSCRIPTION_PROFILE, self.media_url(video))
+            audio = decode_audio(info["url"], headers=info.get("http_headers"))
+        except yt_dlp.utils.DownloadError as error:
+            if is_throttling_error(error):
+                raise RetryableError(str(error)) from error
+            logger.error(f"Exception during audio loading for video id: {video.id}")
+            return False, None
+        except RuntimeError:
+            return False, None
+        logger.info(f"Audio of video {video.id} loaded to memory: {audio.nbytes / 2**20:.1f} MB")
+        metrics.inc("media_files_total", kind="memory")
+        metrics.inc("decoded_bytes_total", audio.nbytes)
+        return True, audio
+
+    @_async_wrap("media")
     def download_video(
             self,
             video: YouTubeVideo,
@@ -102,46 +194,70 @@ class YouTubeLoader:
         :param fps_limit: 30 or 60
         :return: tuple(bool, Path)
         """
-        video.generate_link()
+        import yt_dlp  # noqa PLC0415 see YdlPool.get
 
+        link = self.media_url(video)
         title = self.prepare_title(video.title)
-        config = copy.deepcopy(self.__config)
-        config["outtmpl"] = f"{self.dir}/{title}.%(ext)s"
-        config["format"] = (
-            f"bestvideo[height<={required_height}][ext={required_ext}][fps<={fps_limit}]+bestaudio[ext=m4a]/worst"
-        )
+        video_format = f"bestvideo[height<={required_height}][ext={required_ext}][fps<={fps_limit}]"
+        profile = {"format": f"{video_format}+bestaudio[ext=m4a]/worst"}
 
         try:
-            with yt_dlp.YoutubeDL(config) as ydl:
-                ydl.download([video.link])
-                logger.info(f"Video downloaded to {self.dir}/{title}.{required_ext}")
+            self.ydl_pool.download(f"video:{profile['format']}", profile, link, f"{self.dir}/{title}.%(ext)s")
+            logger.info(f"Video downloaded to {self.dir}/{title}.{required_ext}")
+            metrics.inc("media_files_total", kind="video")
 
-                return True, Path(f"{self.dir}/{title}.{required_ext}")
+            return True, Path(f"{self.dir}/{title}.{required_ext}")
 
-        except yt_dlp.utils.DownloadError:
+        except yt_dlp.utils.DownloadError as error:
+            if is_throttling_error(error):
+                raise RetryableError(str(error)) from error
             logger.error(f"Exception during video download for video id: {video.id}")
         except Exception as e:
             logger.error(f"Exception during video download for video id: {video.id}, {e.__repr__()}")
 
         return False, Path()
 
-    @_async_wrap
-    def get_captions(self, video: YouTubeVideo, preferred_language: str | None = "ru") -> (bool, Path):
+    def caption_language(self, video: YouTubeVideo) -> str:
+        if self.languages is not None:
+            language = self.languages.get(LanguageCache.key_for_video(video.id), video.channel_id)
+            if language:
+                return language
+        return self.DEFAULT_CAPTIONS_LANGUAGE
+
+    def _remember_language(self, video: YouTubeVideo, transcripts: list[Any]) -> None:
+        if self.languages is None:
+            return
+        for transcript_obj in transcripts:
+            if transcript_obj.is_generated:  # speech recognition output, in the spoken language
+                language = transcript_obj.language_code.split("-")[0]
+                self.languages.put(LanguageCache.key_for_video(video.id), language, 1.0, video.channel_id)
+                return
+
+    @_async_wrap("captions")
+    def get_captions(self, video: YouTubeVideo, preferred_language: str | None = None) -> (bool, Path):
         """
         Downloads captions from the YouTube video.
         :param video: YouTubeVideo instance with the checked video meta
-        :param preferred_language: e.g. "ru"
+        :param preferred_language: e.g. "ru", the known language of the video by default (see caption_language)
         :return: tuple(bool, Path)
         """
+        from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled, YouTubeTranscriptApi  # noqa PLC0415
+
+        preferred_language = preferred_language or self.caption_language(video)
         title = self.prepare_title(video.title)
         transcript = None
+        target_path: Path = (self.dir / title).with_suffix(".txt")
+        cache_key = TranscriptCache.key_for_video(video.id, "captions", preferred_language)
+        if self.cache and self.cache.copy_to(cache_key, target_path):
+            return True, target_path
 
         try:
-            available_transcripts = YouTubeTranscriptApi.list_transcripts(video_id=video.id)
+            available_transcripts = list(YouTubeTranscriptApi.list_transcripts(video_id=video.id))
+            self._remember_language(video, available_transcripts)
             transcript_obj_any = None
             for transcript_obj in available_transcripts:
                 transcript_obj_any = transcript_obj
-                if transcript_obj.language_code == preferred_language:
+                if transcript_obj.language_code.split("-")[0] == preferred_language:
                     transcript = transcript_obj.fetch()
                     break
             if (
@@ -156,14 +272,52 @@ class YouTubeLoader:
             logger.info(f"Successfully got a transcript for video: {video.id}")
 
         except (NoTranscriptFound, TranscriptsDisabled, Exception) as e:
+            if is_throttling_error(e):
+                raise RetryableError(repr(e)) from e
             logger.error(f"{e.__repr__()}")
 
             return False, Path()
 
-        target_path: Path = (self.dir / title).with_suffix(".txt")
         with target_path.open("w", encoding="utf-8") as file:
             for entry in transcript:
                 file.write(entry["text"].replace("\n", "") + " ")
         logger.info(f"Transcript saved to: {target_path}")
+        if self.cache:
+            self.cache.put(cache_key, target_path)
 
         return True, target_path
+
+    async def iter_captions(
+        self, videos: Iterable[YouTubeVideo], preferred_language: str | None = None, concurrency: int = 10
+    ) -> AsyncIterator[tuple[YouTubeVideo, bool, Path]]:
+        """
+        Fetches captions of many videos concurrently, yields results in completion order.
+        No more than concurrency requests are in flight, videos are taken from the iterable lazily.
+        :param videos: YouTubeVideo instances with the checked video meta
+        :param preferred_language: e.g. "ru", the known language of every video by default
+        :param concurrency: max amount of simultaneous caption requests
+        :return: async generator of tuple(video, success, Path)
+        """
+        iterator = iter(videos)
+        pending: set[asyncio.Task] = set()
+
+        def launch() -> None:
+            for video in itertools.islice(iterator, concurrency - len(pending)):
+                pending.add(asyncio.create_task(self._video_captions(video, preferred_language)))
+
+        launch()
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                launch()
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _video_captions(
+        self, video: YouTubeVideo, preferred_language: str | None
+    ) -> tuple[YouTubeVideo, bool, Path]:
+        success, path_ = await self.get_captions(video, preferred_language=preferred_language)
+        return video, success, path_
@@ -0,0 +1,124 @@
+import hashlib
+from collections import Counter, defaultdict, deque
+
+from aiohttp import web
+
+CHANNEL_ID = "UCstubchannel000000000000"
+PLAYLIST_ID = "UUstubchannel000000000000"
+
+
+class YouTubeApiStub:
+    """
+    Local stand-in of the YouTube Data API v3 endpoints used by YouTubeClient.
+    Uploads are kept newest first, like in the real uploads playlist.
+    Failures queued by fail_next() are returned instead of the next responses of an endpoint.
+    """
+
+    def __init__(self, videos: int = 120, page_size: int = 50):
+        self.page_size = page_size
+        self.uploads: list[dict] = []
+        self.requests: Counter[str] = Counter()
+        self.connections: set[tuple] = set()  # client (host, port) pairs, one per TCP connection
+        self.failures: defaultdict[str, deque[web.Response]] = defaultdict(deque)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        for _ in range(videos):
+            self.add_upload()
+        self.app = web.Application(middlewares=[self._track_connections])
+        self.app.router.add_get("/youtube/v3/channels", self.channels)
+        self.app.router.add_get("/youtube/v3/playlistItems", self.playlist_items)
+        self.app.router.add_get("/youtube/v3/videos", self.videos)
+
+    @web.middleware
+    async def _track_connections(self, request: web.Request, handler) -> web.StreamResponse:
+        self.connections.add(request.transport.get_extra_info("peername"))
+        endpoint = request.path.rsplit("/", 1)[-1]
+        if self.failures[endpoint]:
+            self.requests[f"{endpoint}.failed"] += 1
+            return self.failures[endpoint].popleft()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    def fail_next(
+        self, endpoint: str, status: int, times: int = 1, retry_after: str | None = None, reason: str | None = None
+    ) -> None:
+        for _ in range(times):
+            headers = {"Retry-After": retry_after} if retry_after else None
+            body = {"error": {"code": status, "errors": [{"reason": reason}]}} if reason else {}
+            self.failures[endpoint].append(web.json_response(body, status=status, headers=headers))
+
+    def add_upload(self) -> dict:
+        number = len(self.uploads)
+        video = {
+            "id": f"vid{number:08d}",
+            "title": f"Stub video {number}",
+            "publishedAt": f"2024-01-01T00:{number // 60 % 60:02d}:{number % 60:02d}Z",
+        }
+        self.uploads.insert(0, video)
+        return video
+
+    async def channels(self, request: web.Request) -> web.Response:
+        self.requests["channels"] += 1
+        if request.query.get("id") != CHANNEL_ID:
+            return web.json_response({"items": []})
+        return web.json_response(
+            {
+                "items": [
+                    {
+                        "kind": "youtube#channel",
+                        "id": CHANNEL_ID,
+                        "contentDetails": {"relatedPlaylists": {"uploads": PLAYLIST_ID}},
+                    }
+                ]
+            }
+        )
+
+    def _snippet(self, video: dict) -> dict:
+        return {
+            "publishedAt": video["publishedAt"],
+            "channelId": CHANNEL_ID,
+            "channelTitle": "Stub channel",
+            "title": video["title"],
+        }
+
+    async def playlist_items(self, request: web.Request) -> web.Response:
+        self.requests["playlistItems"] += 1
+        offset = int(request.query.get("pageToken", 0))
+        page = self.uploads[offset : offset + self.page_size]
+        etag = hashlib.md5("".join(video["id"] for video in page).encode()).hexdigest()  # noqa S324
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+        body = {
+            "etag": etag,
+            "pageInfo": {"totalResults": len(self.uploads)},
+            "items": [
+                {
+                    "snippet": {
+                        **self._snippet(video),
+                        "resourceId": {"kind": "youtube#video", "videoId": video["id"]},
+                    }
+                }
+                for video in page
+            ],
+        }
+        if offset + self.page_size < len(self.uploads):
+            body["nextPageToken"] = str(offset + self.page_size)
+        return web.json_response(body)
+
+    async def videos(self, request: web.Request) -> web.Response:
+        self.requests["videos"] += 1
+        ids = request.query.get("id", "").split(",")
+        by_id = {video["id"]: video for video in self.uploads}
+        return web.json_response(
+            {
+                "items": [
+                    {"kind": "youtube#video", "id": id_, "snippet": self._snippet(by_id[id_])}
+                    for id_ in ids
+                    if id_ in by_id
+                ]
+            }
+        )
@@ -0,0 +1,127 @@
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import main
+from objects import TranscriptionSegment
+from storage.audio_store import AudioStore
+from storage.language_cache import LanguageCache
+from storage.transcript_cache import TranscriptCache
+from transcribers import vad
+from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import SAMPLE_RATE
+from transcribers.vad import find_silences, frame_energy_db
+
+SECONDS = 30
+FRAME = SAMPLE_RATE * 30 // 1000  # default 30 ms analysis frame
+
+
+@pytest.fixture
+def tone() -> np.ndarray:
+    audio = 0.5 * np.sin(np.linspace(0, 440 * 2 * np.pi * SECONDS, SECONDS * SAMPLE_RATE, dtype=np.float32))
+    audio[10 * SAMPLE_RATE : 12 * SAMPLE_RATE] = 0
+    return audio
+
+
+def stored(tmp_path, audio: np.ndarray, dtype: str) -> tuple[AudioStore, Path]:
+    """
+    Places decoded PCM next to a fake source file, as the ffmpeg decoding would do.
+    """
+    source = tmp_path / "source.mp3"
+    source.write_bytes(b"encoded")
+    store = AudioStore(dtype=dtype)
+    pcm = (audio * 32767).astype(np.int16) if dtype == "int16" else audio
+    pcm.tofile(store.path_for(source))
+    return store, source
+
+
+def test_float32_slices_are_zero_copy(tmp_path, tone):
+    store, source = stored(tmp_path, tone, "float32")
+
+    audio = store.open(source)
+    window = audio.slice(5.0, 6.0)
+
+    assert isinstance(audio.samples, np.memmap)
+    assert audio.duration == SECONDS
+    assert len(window) == SAMPLE_RATE
+    assert np.shares_memory(window, audio.samples)
+    np.testing.assert_array_equal(window, tone[5 * SAMPLE_RATE : 6 * SAMPLE_RATE])
+
+
+def test_int16_store_and_vad(tmp_path, tone):
+    store, source = stored(tmp_path, tone, "int16")
+
+    audio = store.open(source)
+
+    np.testing.assert_allclose(audio.slice(0.0, 1.0), tone[:SAMPLE_RATE], atol=1e-4)
+    silences = find_silences(audio.samples, audio.sampling_rate)
+    assert len(silences) == 1
+    assert silences[0] == pytest.approx((10.0, 12.0), abs=0.05)
+
+
+def test_samples_keep_stored_pcm_only(tmp_path, tone, monkeypatch):
+    store, source = stored(tmp_path, tone, "float32")
+    with store.samples(source) as samples:
+        np.testing.assert_array_equal(samples, tone)
+    assert store.path_for(source).is_file()
+
+    store.remove(source)
+    monkeypatch.setattr(store, "_decode", lambda _, pcm_path: tone.tofile(pcm_path))
+    with store.samples(source) as samples:
+        assert isinstance(samples, np.memmap)
+        assert len(samples) == len(tone)
+    assert not store.path_for(source).exists()
+
+
+def test_blocked_energy_matches_whole_array(tone, monkeypatch):
+    monkeypatch.setattr(vad, "BLOCK_FRAMES", 64)
+
+    energy = frame_energy_db(tone)
+    framed = tone[: len(energy) * FRAME].reshape(len(energy), FRAME)
+    expected = 20 * np.log10(np.maximum(np.sqrt(np.mean(np.square(framed), axis=1)), 1e-10))
+
+    np.testing.assert_allclose(energy, expected, rtol=1e-5)
+
+
+def test_stale_pcm_is_detected(tmp_path, tone):
+    store, source = stored(tmp_path, tone, "float32")
+    assert store.is_fresh(source)
+
+    pcm_mtime = store.path_for(source).stat().st_mtime
+    os.utime(source, (pcm_mtime + 10, pcm_mtime + 10))
+
+    assert not store.is_fresh(source)
+
+
+class PeakTranscriber(AbstractTranscriber):
+    """
+    The transcript is the peak amplitude of the audio it is given.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def detect_language(self, path: np.ndarray) -> tuple[str | None, float]:
+        assert path.dtype == np.float32
+        return "en", 1.0
+
+    def transcribe_stream(
+        self, path: np.ndarray, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        assert path.dtype == np.float32
+        yield TranscriptionSegment(text=f"{np.abs(path).max():.2f}", start=0.0, end=len(path) / SAMPLE_RATE)
+
+
+@pytest.mark.asyncio
+async def test_int16_store_is_transcribed_normalized(tmp_path, tone, monkeypatch):
+    store, source = stored(tmp_path, tone, "int16")
+    monkeypatch.setattr(main, "get_transcriber", lambda _: PeakTranscriber)
+
+    await main.process_file(
+        source, TranscriptCache(tmp_path / "cache"), LanguageCache(tmp_path / "languages"), store=store
+    )
+
+    assert source.with_suffix(".txt").read_text(encoding="utf-8").strip() == "0.50"
@@ -0,0 +1,35 @@
+from objects import TranscriptionSegment
+from transcribers.batching import WINDOW_SECONDS, assign_segments, choose_batch_size, pack_clips
+
+MEMORY_CAP_MB = 300
+
+
+def test_choose_batch_size():
+    assert choose_batch_size([10.0, 20.0], "small", MEMORY_CAP_MB) == len([10.0, 20.0])
+    assert choose_batch_size([45.0] * 20, "small", MEMORY_CAP_MB) == MEMORY_CAP_MB // 60
+    assert choose_batch_size([10.0], "large-v3", 1) == 1
+
+
+def test_pack_clips_windows_never_span_clips():
+    durations = [10.0, 45.0, 5.0, 20.0]
+    groups = pack_clips(durations, batch_size=2, batches_per_group=1)
+
+    assert [group.indexes for group in groups] == [[0], [1], [2, 3]]
+    assert groups[1].windows == [(0.0, WINDOW_SECONDS), (WINDOW_SECONDS, 45.0)]
+    assert groups[2].offsets == [0.0, 5.0]
+    assert all(end - start <= WINDOW_SECONDS for group in groups for start, end in group.windows)
+
+
+def test_assign_segments_to_clips():
+    group = pack_clips([10.0, 20.0], batch_size=4)[0]
+    segments = [
+        TranscriptionSegment(text=" first", start=1.0, end=9.0),
+        TranscriptionSegment(text=" second", start=11.0, end=15.0),
+        TranscriptionSegment(text=" third", start=15.0, end=29.0),
+    ]
+
+    result = assign_segments(group, segments)
+
+    assert [segment.text for segment in result[0]] == [" first"]
+    assert [segment.text for segment in result[1]] == [" second", " third"]
+    assert (result[1][0].start, result[1][0].end) == (1.0, 5.0)
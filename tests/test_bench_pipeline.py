@@ -0,0 +1,34 @@
+import pytest
+
+from benchmarks.bench_pipeline import _run_model, compare
+
+VIDEOS = 3
+
+
+def result(**metrics) -> dict:
+    return {"models": {"null": {"videos": 10, "stage_latency_ms": {"download": 100.0}, **metrics}}}
+
+
+def test_compare_respects_metric_direction():
+    baseline = result(wall_seconds=10.0, videos_per_min=60.0, peak_rss_mb=100.0)
+
+    assert compare(result(wall_seconds=11.0, videos_per_min=70.0, peak_rss_mb=90.0), baseline, 0.25) == []
+    regressions = compare(
+        {"models": {"null": {"videos": 1, "stage_latency_ms": {"download": 200.0}, "videos_per_min": 30.0}}},
+        baseline,
+        0.25,
+    )
+    assert [regression.split(":")[0] for regression in regressions] == [
+        "null.stage_latency_ms.download",
+        "null.videos_per_min",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_offline_pipeline_run():
+    metrics = await _run_model("null", VIDEOS, [1.0, 2.0], decode=False)
+
+    assert metrics["failed"] == 0
+    assert metrics["videos"] == VIDEOS
+    assert metrics["audio_seconds"] == pytest.approx(4.0)
+    assert all(latency is not None for latency in metrics["stage_latency_ms"].values())
@@ -0,0 +1,60 @@
+import asyncio
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+
+from objects import YouTubeVideo
+from pipeline import TranscriptionPipeline
+from youtube_workers.yt_dlp_loader import YouTubeLoader
+
+CONCURRENCY = 2
+
+
+class SlowCaptionsLoader(YouTubeLoader):
+    def __init__(self, directory: Path, missing_ids: set[str]):
+        super().__init__(directory)
+        self.missing_ids = missing_ids
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_captions(self, video: YouTubeVideo, preferred_language: str | None = "ru") -> tuple[bool, Path]:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # videos without captions answer fast, as YouTube does
+        await asyncio.sleep(0.01 if video.id in self.missing_ids else 0.2)
+        self.in_flight -= 1
+        return video.id not in self.missing_ids, self.dir / f"{video.id}.txt"
+
+
+@pytest.mark.asyncio
+async def test_iter_captions_respects_concurrency(saving_path, fake_videos):
+    loader = SlowCaptionsLoader(saving_path, missing_ids={fake_videos[-1].id})
+
+    results = [result async for result in loader.iter_captions(fake_videos, concurrency=CONCURRENCY)]
+
+    assert sorted(video.id for video, _, _ in results) == sorted(video.id for video in fake_videos)
+    assert loader.max_in_flight == CONCURRENCY
+    assert [video.id for video, success, _ in results if not success] == [fake_videos[-1].id]
+
+
+@pytest.mark.asyncio
+async def test_missing_captions_are_transcribed_before_fetching_ends(
+    saving_path, fake_videos, fake_loader, fake_transcriber
+):
+    missing = fake_videos[0]
+    captions_loader = SlowCaptionsLoader(saving_path, missing_ids={missing.id})
+    started: list[float] = []
+
+    async def videos_without_captions() -> AsyncIterator[YouTubeVideo]:
+        async for video, success, _ in captions_loader.iter_captions(fake_videos, concurrency=len(fake_videos)):
+            if not success:
+                started.append(asyncio.get_running_loop().time())
+                yield video
+
+    pipeline = TranscriptionPipeline(fake_loader, fake_transcriber, TranscriptionPipeline.Config(decode=False))
+    finished_fetching = asyncio.get_running_loop().time() + 0.2
+    results = await pipeline.run(videos_without_captions())
+
+    assert [path_.stem for path_ in results] == [missing.id]
+    assert started[0] < finished_fetching
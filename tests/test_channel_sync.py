@@ -0,0 +1,84 @@
+import functools
+from pathlib import Path
+
+import pytest
+
+import main
+from objects import Job, YouTubeVideo
+from support.youtube_stub import CHANNEL_ID
+from youtube_workers.channel_manifest import ManifestStore
+from youtube_workers.youtube_api import YouTubeClient
+
+NEW_UPLOADS = 3
+FAILING_UPLOAD = 5
+
+
+@pytest.mark.asyncio
+async def test_channel_videos_full_listing(youtube_stub, youtube_stub_client):
+    amount, videos = await youtube_stub_client.get_channel_videos(CHANNEL_ID)
+
+    assert amount == len(videos) == len(youtube_stub.uploads)
+    assert videos[0].id == youtube_stub.uploads[0]["id"]
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_returns_delta(youtube_stub, youtube_stub_client, tmp_path):
+    store = ManifestStore(tmp_path)
+    pages = [page async for page in youtube_stub_client.iter_channel_videos(CHANNEL_ID, store.load(CHANNEL_ID))]
+    assert sum(len(page) for page in pages) == len(youtube_stub.uploads)
+    assert all(len(page) <= youtube_stub.page_size for page in pages)
+    store.commit()
+
+    new_ids = [youtube_stub.add_upload()["id"] for _ in range(NEW_UPLOADS)]
+    youtube_stub.requests.clear()
+    store = ManifestStore(tmp_path)
+    pages = [page async for page in youtube_stub_client.iter_channel_videos(CHANNEL_ID, store.load(CHANNEL_ID))]
+    assert sorted(video.id for page in pages for video in page) == sorted(new_ids)
+    assert youtube_stub.requests == {"playlistItems": 1}
+    store.commit()
+
+    youtube_stub.requests.clear()
+    store = ManifestStore(tmp_path)
+    pages = [page async for page in youtube_stub_client.iter_channel_videos(CHANNEL_ID, store.load(CHANNEL_ID))]
+    assert pages == []
+    assert youtube_stub.requests == {"playlistItems": 1}
+
+
+@pytest.mark.asyncio
+async def test_manifest_not_updated_without_commit(youtube_stub, youtube_stub_client, tmp_path):
+    store = ManifestStore(tmp_path)
+    async for _ in youtube_stub_client.iter_channel_videos(CHANNEL_ID, store.load(CHANNEL_ID)):
+        pass
+
+    assert ManifestStore(tmp_path).load(CHANNEL_ID).last_video_id is None
+
+
+class FlakyDownloads:
+    def __init__(self, directory: Path, downloads: list[str], fail_once: str):
+        self.dir = directory
+        self.downloads = downloads
+        self.fail_once = fail_once
+
+    async def download_audio(self, video: YouTubeVideo, for_transcription: bool = False) -> tuple[bool, Path]:
+        self.downloads.append(video.id)
+        if video.id == self.fail_once and self.downloads.count(video.id) == 1:
+            return False, Path()
+        return True, self.dir / f"{video.id}.mp3"
+
+
+@pytest.mark.asyncio
+async def test_incremental_job_retries_failed_videos(youtube_stub, tmp_path, monkeypatch):
+    downloads: list[str] = []
+    failing = youtube_stub.uploads[FAILING_UPLOAD]["id"]
+    monkeypatch.setenv("YOUTUBE_API", "stub_key")
+    monkeypatch.setattr(main, "YouTubeClient", functools.partial(YouTubeClient, base_url=youtube_stub.base_url))
+    monkeypatch.setattr(main, "YouTubeLoader", lambda directory, **_: FlakyDownloads(directory, downloads, failing))
+    job = Job(mode="audio", channel=f"https://www.youtube.com/channel/{CHANNEL_ID}", incremental=True)
+    workspace = main.Workspace(tmp_path)
+
+    await main.run_job(job, workspace)
+    await main.run_job(job, workspace)
+    await main.run_job(job, workspace)
+
+    assert len(downloads) == len(youtube_stub.uploads) + 1
+    assert downloads[-1] == failing
@@ -0,0 +1,109 @@
+import pytest
+import pytest_asyncio
+
+import main
+from daemon import DaemonClient, DaemonServer
+from objects import Job
+
+FAILING_PATH = "/missing.mp3"
+
+
+class InProcessRunner:
+    def __init__(self):
+        self.jobs: list[Job] = []
+
+    async def __call__(self, job: Job, workspace: main.Workspace) -> None:
+        self.jobs.append(job)
+
+
+class FakeHandler:
+    def __init__(self):
+        self.jobs: list[Job] = []
+
+    async def __call__(self, job: Job) -> None:
+        if job.path == FAILING_PATH:
+            raise FileNotFoundError(job.path)
+        self.jobs.append(job)
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return tmp_path / "daemon.sock"
+
+
+@pytest_asyncio.fixture
+async def daemon(socket_path):
+    handler = FakeHandler()
+    server = DaemonServer(handler, socket_path)
+    await server.start()
+    yield server, handler
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_daemon_runs_jobs(daemon, socket_path):
+    server, handler = daemon
+    client = DaemonClient(socket_path)
+    job = Job(mode="text", links=["https://www.youtube.com/watch?v=stub"], force=True)
+
+    assert await client.alive()
+    result = await client.submit(job)
+    failed = await client.submit(Job(mode="file", path=FAILING_PATH))
+
+    assert result.ok
+    assert result.seconds >= 0
+    assert handler.jobs == [job]
+    assert not failed.ok
+    assert "FileNotFoundError" in failed.error
+    assert server.health()["jobs"] == len([result, failed])
+    assert server.health()["failed"] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("payload", [{"mode": "text", "unknown": 1}, {"mode": "exit"}, {"mode": "anything"}])
+async def test_daemon_rejects_invalid_jobs(daemon, socket_path, payload):
+    server, handler = daemon
+    session = DaemonClient(socket_path)._session(None)
+    async with session, session.post("http://daemon/jobs", json=payload) as response:
+        assert response.status == 400  # noqa PLR2004
+        assert "Invalid job" in (await response.json())["error"]
+    assert not handler.jobs
+    assert server.health()["jobs"] == 0
+
+
+@pytest.mark.asyncio
+async def test_daemon_socket_is_owner_only(daemon, socket_path):
+    assert socket_path.stat().st_mode & 0o777 == 0o600  # noqa PLR2004
+
+
+@pytest.mark.asyncio
+async def test_daemon_replaces_stale_socket(socket_path):
+    socket_path.touch()
+    assert not await DaemonClient(socket_path).alive()
+
+    server = DaemonServer(FakeHandler(), socket_path)
+    await server.start()
+    try:
+        assert await DaemonClient(socket_path).alive()
+        with pytest.raises(RuntimeError, match="already listening"):
+            await DaemonServer(FakeHandler(), socket_path).start()
+    finally:
+        await server.stop()
+
+    assert not socket_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_cli_prefers_daemon(daemon, socket_path, tmp_path, monkeypatch):
+    _, handler = daemon
+    in_process = InProcessRunner()
+    monkeypatch.setattr(main, "run_job", in_process)
+    monkeypatch.setattr(main, "make_save_dir", lambda: tmp_path)
+    job = Job(mode="audio", links=["https://www.youtube.com/watch?v=stub"])
+
+    assert (await main.submit_job(job, DaemonClient(socket_path))).ok
+    assert (await main.submit_job(job, DaemonClient(tmp_path / "missing.sock"))).ok
+    assert (await main.submit_job(job, None)).ok
+
+    assert handler.jobs == [job]
+    assert in_process.jobs == [job, job]
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_import import IMPORT_BUDGET_MS, SRC, profile_import
+from transcribers import registry
+from transcribers.abscract import AbstractTranscriber
+
+BACKENDS = ("faster_whisper", "whisper", "yt_dlp")  # imported by the first job needing them, never by the CLI
+SHARED_HOST_SLACK = 3  # headroom for loaded CI runners, the backends themselves are caught by the sys.modules check
+
+
+@pytest.fixture(scope="module")
+def main_profile():
+    return profile_import("main")
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    monkeypatch.setattr(registry, "_BACKENDS", dict(registry._BACKENDS))
+    registry.get_transcriber.cache_clear()
+    yield registry
+    registry.get_transcriber.cache_clear()
+
+
+def test_entry_point_does_not_import_backends(main_profile):
+    assert main_profile.heavy() == []
+    assert "transcribers.faster_whisper_transcriber" not in main_profile.modules
+
+
+def test_entry_point_import_budget(main_profile):
+    assert 0 < main_profile.total_ms <= SHARED_HOST_SLACK * IMPORT_BUDGET_MS
+
+
+def test_entry_point_leaves_backends_out_of_sys_modules():
+    loaded = f"import sys, main; print(*(name for name in {BACKENDS} if name in sys.modules))"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, (str(SRC), os.getenv("PYTHONPATH"))))}
+    process = subprocess.run([sys.executable, "-c", loaded], env=env, capture_output=True, text=True, check=True)  # noqa S603
+
+    assert process.stdout.split() == []
+
+
+def test_registry_imports_backends_on_demand(backends):
+    backends.register("fake", "transcribers.abscract:AbstractTranscriber")
+
+    assert "fake" in backends.backends()
+    assert backends.get_transcriber("fake") is AbstractTranscriber
+    with pytest.raises(ValueError, match="not valid"):
+        backends.get_transcriber("unknown")
@@ -0,0 +1,158 @@
+from pathlib import Path
+
+import pytest
+
+import main
+import pipeline
+from objects import BatchSpec, Job, YouTubeVideo
+from storage.job_journal import DONE_STATES, JobJournal, VideoState
+
+MAX_ATTEMPTS = 2
+CHANNEL = "https://www.youtube.com/@stub"
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal_ = JobJournal(tmp_path / "jobs.sqlite", "batch")
+    yield journal_
+    journal_.close()
+
+
+def test_journal_tracks_video_states(journal, fake_videos):
+    assert journal.add_source(CHANNEL, fake_videos) == len(fake_videos)
+    assert journal.add_source(CHANNEL, fake_videos) == 0
+    assert journal.collected(CHANNEL)
+
+    journal.mark(fake_videos[0].id, VideoState.CAPTIONED)
+    journal.mark(fake_videos[1].id, VideoState.DOWNLOADED)
+    for _ in range(MAX_ATTEMPTS):
+        journal.mark(fake_videos[2].id, VideoState.FAILED, "download failed")
+
+    pending = journal.pending(DONE_STATES["text"], MAX_ATTEMPTS)
+    assert [video.id for video, _ in pending] == [video.id for video in fake_videos[1:2] + fake_videos[3:]]
+    assert pending[0] == (fake_videos[1], VideoState.DOWNLOADED)
+    assert journal.counts() == {"captioned": 1, "downloaded": 1, "failed": 1, "queued": 2}
+
+
+def test_journal_survives_reopening(tmp_path, fake_videos):
+    journal = JobJournal(tmp_path / "jobs.sqlite", "batch")
+    journal.add_source(CHANNEL, fake_videos)
+    journal.mark(fake_videos[0].id, VideoState.TRANSCRIBED)
+    journal.close()
+
+    reopened = JobJournal(tmp_path / "jobs.sqlite", "batch")
+    other_batch = JobJournal(tmp_path / "jobs.sqlite", "other")
+    try:
+        assert reopened._db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert reopened.state(fake_videos[0].id) == VideoState.TRANSCRIBED
+        assert len(reopened.pending(DONE_STATES["text"], MAX_ATTEMPTS)) == len(fake_videos) - 1
+        assert not other_batch.collected(CHANNEL)
+    finally:
+        reopened.close()
+        other_batch.close()
+
+
+class FlakyLoader:
+    """
+    Downloads fail once for video1 and always for video2, video3 crashes the first run.
+    """
+
+    def __init__(self, directory: Path):
+        self.dir = directory
+        self.attempts: dict[str, int] = {}
+
+    async def download_audio(self, video: YouTubeVideo, for_transcription: bool = False) -> tuple[bool, Path]:
+        self.attempts[video.id] = self.attempts.get(video.id, 0) + 1
+        if video.id == "video3" and self.attempts[video.id] == 1:
+            raise KeyboardInterrupt
+        if video.id == "video2" or (video.id == "video1" and self.attempts[video.id] == 1):
+            return False, Path()
+        return True, self.dir / f"{video.id}.mp3"
+
+
+@pytest.mark.asyncio
+async def test_batch_resumes_after_crash(tmp_path, fake_videos, monkeypatch):
+    collected: list[str | None] = []
+
+    async def collect_videos(channel_link, links, manifests=None, governor=None) -> list[YouTubeVideo]:
+        collected.append(channel_link)
+        return fake_videos
+
+    monkeypatch.setattr(main, "collect_videos", collect_videos)
+    loader = FlakyLoader(tmp_path)
+    monkeypatch.setattr(main, "YouTubeLoader", lambda *_, **__: loader)
+    spec = BatchSpec(name="audio", mode="audio", channels=[CHANNEL], max_attempts=MAX_ATTEMPTS)
+
+    with pytest.raises(KeyboardInterrupt):
+        await main.run_batch(spec, main.Workspace(tmp_path))
+    counts = await main.run_batch(spec, main.Workspace(tmp_path))
+
+    assert collected == [CHANNEL]
+    assert counts == {"downloaded": len(fake_videos) - 1, "failed": 1}
+    assert loader.attempts == {"video0": 1, "video1": 2, "video2": MAX_ATTEMPTS, "video3": 2, "video4": 1}
+
+
+async def no_resampling(path: Path) -> Path:
+    return path
+
+
+@pytest.mark.asyncio
+async def test_text_batch_of_links_resumes_after_crash(
+    tmp_path, fake_videos, fake_loader, fake_process_pool, monkeypatch
+):
+    process_links = main.process_links
+    crashed: list[str] = []
+
+    async def collect_videos(channel_link, links, manifests=None, governor=None) -> list[YouTubeVideo]:
+        assert links == [video.id for video in fake_videos]
+        return fake_videos
+
+    async def crashing_process_links(save_dir, videos, *args, **kwargs) -> set[str]:
+        if crashed:
+            return await process_links(save_dir, videos, *args, **kwargs)
+        # the first run is killed after two transcriptions
+        async for video in videos:
+            crashed.append(video.id)
+            if len(crashed) == 2:  # noqa PLR2004
+                break
+        await process_links(save_dir, [video for video in fake_videos if video.id in crashed], *args, **kwargs)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(main, "collect_videos", collect_videos)
+    monkeypatch.setattr(main, "process_links", crashing_process_links)
+    monkeypatch.setattr(main, "YouTubeLoader", lambda *_, **__: fake_loader)
+    monkeypatch.setattr(main, "make_process_pool", lambda *_: fake_process_pool)
+    monkeypatch.setattr(pipeline, "resample_to_wav", no_resampling)
+    monkeypatch.setattr(main, "SHORT_CLIP_SECONDS", 0)
+    spec = BatchSpec(name="text", mode="text", links=[video.id for video in fake_videos], max_attempts=MAX_ATTEMPTS)
+
+    with pytest.raises(KeyboardInterrupt):
+        await main.run_batch(spec, main.Workspace(tmp_path))
+    counts = await main.run_batch(spec, main.Workspace(tmp_path))
+
+    assert crashed == ["video1", "video2"]
+    assert counts == {"captioned": 1, "transcribed": len(fake_videos) - 2, "failed": 1}
+    assert fake_process_pool.transcribed == ["video1.opus", "video2.opus", "video3.opus"]
+    assert fake_loader.downloads == {"video1": 1, "video2": 1, "video3": 1, "video4": MAX_ATTEMPTS}
+
+
+def test_batch_spec_rejects_unknown_mode():
+    with pytest.raises(ValueError, match="Unknown batch mode"):
+        BatchSpec(name="batch", mode="file")
+
+
+@pytest.mark.asyncio
+async def test_batch_job_takes_cli_flags(tmp_path, monkeypatch):
+    specs: list[BatchSpec] = []
+
+    async def run_batch(spec: BatchSpec, workspace: main.Workspace) -> dict[str, int]:
+        specs.append(spec)
+        return {}
+
+    monkeypatch.setattr(main, "run_batch", run_batch)
+    spec_path = tmp_path / "nightly.json"
+    spec_path.write_text('{"mode": "text", "links": ["video0"]}', encoding="utf-8")
+
+    await main.run_job(Job(mode="batch", path=str(spec_path), force=True, in_memory=True), main.Workspace(tmp_path))
+
+    assert specs == [BatchSpec(name="nightly", links=["video0"], force=True, in_memory=True)]
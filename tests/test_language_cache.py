@@ -0,0 +1,111 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from objects import TranscriptionSegment
+from pipeline import TranscriptionPipeline
+from storage.language_cache import LanguageCache
+from storage.transcript_cache import TranscriptCache
+from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import SAMPLE_RATE, AudioSource
+from transcribers.language import SAMPLE_SECONDS, language_sample
+
+VOTES = 3
+SPEECH_AMPLITUDE = 0.1
+
+
+class DetectingTranscriber(AbstractTranscriber):
+    def __init__(self):
+        self.detections = 0
+        self.languages: list[str | None] = []
+
+    def detect_language(self, path: AudioSource) -> tuple[str | None, float]:
+        self.detections += 1
+        return "en", 0.9
+
+    def transcribe_stream(
+        self, path: Path, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        self.languages.append(language)
+        yield TranscriptionSegment(text=path.stem, start=0.0, end=1.0)
+
+
+def test_channel_majority_vote(tmp_path):
+    languages = LanguageCache(tmp_path, channel_votes=VOTES)
+    for i, language in enumerate(["ru", "en", "ru"]):
+        assert languages.channel_language("channel") is None
+        languages.put(LanguageCache.key_for_video(f"video{i}"), language, 0.9, "channel")
+
+    assert languages.channel_language("channel") == "ru"
+    assert languages.get(LanguageCache.key_for_video("video1"), "channel") == "en"  # own detection wins
+    assert languages.get(LanguageCache.key_for_video("new"), "channel") == "ru"
+    assert LanguageCache(tmp_path, channel_votes=VOTES).channel_language("channel") == "ru"
+
+
+def test_no_majority_and_uncertain_detections(tmp_path):
+    languages = LanguageCache(tmp_path, channel_votes=2)
+    languages.put("youtube:a", "ru", 0.9, "channel")
+    languages.put("youtube:b", "en", 0.9, "channel")
+
+    assert languages.put("youtube:c", "de", 0.1, "channel") is None
+    assert languages.get("youtube:c") is None
+    assert languages.channel_language("channel") is None
+
+
+@pytest.mark.asyncio
+async def test_pipeline_detects_until_channel_language_is_known(saving_path, fake_videos, fake_loader):
+    fake_loader.fail_ids = set()
+    languages = LanguageCache(saving_path / "languages", channel_votes=VOTES)
+    transcriber = DetectingTranscriber()
+    pipeline = TranscriptionPipeline(
+        fake_loader,
+        lambda: transcriber,
+        TranscriptionPipeline.Config(decode=False),
+        languages=languages,
+    )
+    results = []
+    try:
+        results = await pipeline.run(fake_videos)
+
+        assert len(results) == len(fake_videos)
+        assert transcriber.detections == VOTES
+        assert transcriber.languages == ["en"] * len(fake_videos)
+    finally:
+        for path_ in results:
+            path_.unlink()
+        for path_ in (saving_path / "languages").iterdir():
+            path_.unlink()
+        (saving_path / "languages").rmdir()
+
+
+@pytest.mark.asyncio
+async def test_transcripts_of_detected_languages_are_cached_for_the_next_run(tmp_path, fake_videos, fake_loader):
+    fake_loader.fail_ids = set()
+    cache = TranscriptCache(tmp_path / "cache")
+    config = TranscriptionPipeline.Config(decode=False, model="small")
+    transcribers = []
+
+    for _ in range(2):
+        languages = LanguageCache(tmp_path / "languages", channel_votes=VOTES)
+        transcribers.append(transcriber := DetectingTranscriber())
+        pipeline = TranscriptionPipeline(fake_loader, lambda: transcriber, config, cache=cache, languages=languages)
+        await pipeline.run(fake_videos)
+
+    assert transcribers[0].languages == ["en"] * len(fake_videos)
+    assert transcribers[1].languages == []
+    assert all(cache.get_path(TranscriptCache.key_for_video(video.id, "small")) for video in fake_videos)
+
+
+def test_language_sample_starts_at_speech():
+    audio = np.zeros(60 * SAMPLE_RATE, dtype=np.float32)
+    speech = np.arange(40 * SAMPLE_RATE) / SAMPLE_RATE
+    # amplitude-modulated tone: a fluctuating envelope, as speech has
+    audio[20 * SAMPLE_RATE :] = 0.3 * np.sin(2 * np.pi * 200 * speech) * (0.55 + 0.45 * np.sin(2 * np.pi * 3 * speech))
+
+    sample = language_sample(audio)
+
+    assert len(sample) == SAMPLE_SECONDS * SAMPLE_RATE
+    assert np.abs(sample[: SAMPLE_RATE // 2]).max() > SPEECH_AMPLITUDE
+    assert not len(language_sample(np.zeros(10 * SAMPLE_RATE, dtype=np.float32)))
@@ -0,0 +1,19 @@
+import pytest
+
+from benchmarks.load_service import _run
+from service import TranscriptionService
+
+JOBS = 6
+
+
+@pytest.mark.asyncio
+async def test_offline_load_run():
+    config = TranscriptionService.Config(
+        queue_size=1, io_workers=1, inference_workers=1, models=("null",), retry_after=0
+    )
+    result = await _run(JOBS, clients=3, duplicates=0.5, config=config, pool_workers=1, clip_seconds=1.0)
+
+    assert result["statuses"] == {"done": JOBS}
+    assert result["unique_videos"] < JOBS
+    assert result["rejected"] > 0
+    assert result["job_latency"]["max_ms"] is not None
@@ -0,0 +1,142 @@
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from objects import TranscriptionSegment
+from storage.audio_store import AudioStore
+from transcribers.audio import SAMPLE_RATE
+from transcribers.long_file import ChunkedTranscriber, plan_chunks, stitch_segments
+from transcribers.vad import find_silences, find_speech, speech_clips, speech_pieces
+
+TONE_SECONDS = 2
+SILENCE_SECONDS = 1
+SPEECH_SECONDS = 5
+TOLERANCE = 0.05
+CHUNKS = 6
+
+
+def test_find_silences():
+    tone = 0.5 * np.sin(np.linspace(0, 440 * 2 * np.pi * TONE_SECONDS, TONE_SECONDS * SAMPLE_RATE))
+    silence = np.zeros(SILENCE_SECONDS * SAMPLE_RATE)
+    audio = np.concatenate([tone, silence, tone]).astype(np.float32)
+
+    silences = find_silences(audio)
+
+    assert len(silences) == 1
+    start, end = silences[0]
+    assert abs(start - TONE_SECONDS) < TOLERANCE
+    assert abs(end - (TONE_SECONDS + SILENCE_SECONDS)) < TOLERANCE
+
+
+def test_plan_chunks_cuts_at_silence():
+    chunks = plan_chunks(25.0, [(8.0, 9.0), (17.5, 18.0)], chunk_seconds=10.0, search_window=3.0)
+
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [(0.0, 8.5), (8.5, 17.75), (17.75, 25.0)]
+    assert all(chunk.keep_start == chunk.start for chunk in chunks)
+
+
+def test_plan_chunks_overlaps_without_silence():
+    chunks = plan_chunks(15.0, [], chunk_seconds=10.0, overlap_seconds=2.0)
+
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [(0.0, 12.0), (10.0, 15.0)]
+    assert chunks[0].keep_end == chunks[1].keep_start == (chunks[0].end + chunks[1].start) / 2
+
+
+def test_plan_chunks_advances_with_a_window_wider_than_chunks():
+    chunks = plan_chunks(25.0, [(4.0, 6.0)], chunk_seconds=10.0, overlap_seconds=2.0, search_window=20.0)
+
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [(0.0, 5.0), (5.0, 17.0), (15.0, 25.0)]
+    assert all(chunk.end > chunk.start for chunk in chunks)
+
+
+def test_stitch_segments_removes_overlap_duplicates():
+    chunks = plan_chunks(15.0, [], chunk_seconds=10.0, overlap_seconds=2.0)
+    first = [
+        TranscriptionSegment(text=" one", start=0.0, end=9.0),
+        TranscriptionSegment(text=" two", start=9.0, end=11.5),
+        TranscriptionSegment(text=" three", start=11.5, end=12.0),
+    ]
+    second = [
+        TranscriptionSegment(text=" two.", start=0.0, end=1.4),
+        TranscriptionSegment(text=" three", start=1.5, end=2.0),
+        TranscriptionSegment(text=" four", start=2.0, end=5.0),
+    ]
+
+    stitched = stitch_segments(chunks, [first, second])
+
+    assert [segment.text.strip(" .") for segment in stitched] == ["one", "two", "three", "four"]
+    assert stitched[-1].start == chunks[1].start + second[-1].start
+
+
+def test_find_speech_skips_silence_and_steady_tones():
+    rng = np.random.default_rng(0)
+    time_ = np.arange(SPEECH_SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    # noise modulated at a syllable rate stands in for speech, a steady tone for a held note or hum
+    speech = rng.standard_normal(len(time_)) * 0.2 * np.abs(np.sin(2 * np.pi * 2 * time_)) ** 2
+    music = 0.3 * np.sin(2 * np.pi * 440 * time_)
+    silence = np.zeros(SILENCE_SECONDS * SAMPLE_RATE)
+    audio = np.concatenate([silence, music, speech, silence]).astype(np.float32)
+    speech_start = SILENCE_SECONDS + SPEECH_SECONDS
+
+    regions = find_speech(audio)
+
+    assert len(regions) == 1
+    assert regions[0] == pytest.approx((speech_start, speech_start + SPEECH_SECONDS), abs=0.5)
+    clips, stats = speech_clips(audio, start=speech_start + 1)
+    assert clips[0] == speech_start + 1
+    assert stats.skipped_fraction > 0
+    assert speech_clips(np.concatenate([silence, music]).astype(np.float32))[0] == []
+
+
+def test_speech_pieces_trim_clips_to_speech():
+    rng = np.random.default_rng(0)
+    time_ = np.arange(SPEECH_SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    speech = rng.standard_normal(len(time_)) * 0.2 * np.abs(np.sin(2 * np.pi * 2 * time_)) ** 2
+    silence = np.zeros(SILENCE_SECONDS * SAMPLE_RATE)
+    audios = [np.concatenate(parts).astype(np.float32) for parts in ([silence, speech, silence], [silence], [speech])]
+
+    pieces, stats = speech_pieces(audios)
+
+    assert [index for index, _, _ in pieces] == [0, 2]
+    assert pieces[0][1] == pytest.approx(SILENCE_SECONDS, abs=0.5)
+    assert len(pieces[0][2]) / SAMPLE_RATE == pytest.approx(SPEECH_SECONDS, abs=0.5)
+    assert stats.total == sum(len(audio) for audio in audios) / SAMPLE_RATE
+    assert stats.speech == pytest.approx(sum(len(audio) for _, _, audio in pieces) / SAMPLE_RATE, abs=0.01)
+
+
+class ChunkPool:
+    """
+    ProcessPoolTranscriber double recording how many chunk files exist while a chunk is transcribed.
+    """
+
+    workers = 1
+
+    def __init__(self):
+        self.files_on_disk: list[int] = []
+
+    async def detect_language(self, path: Path) -> tuple[str | None, float]:
+        return "en", 1.0
+
+    async def transcribe_stream(
+        self, path: Path, duration: float | None = None, language: str | None = None
+    ) -> AsyncIterator[TranscriptionSegment]:
+        self.files_on_disk.append(len(list(path.parent.glob("*.wav"))))
+        yield TranscriptionSegment(text=path.stem, start=0.0, end=duration)
+
+
+@pytest.mark.asyncio
+async def test_chunks_are_written_only_while_transcribed(tmp_path):
+    source = tmp_path / "long.mp3"
+    source.write_bytes(b"encoded")
+    store = AudioStore()
+    np.zeros(CHUNKS * SAMPLE_RATE, dtype=np.float32).tofile(store.path_for(source))
+    pool = ChunkPool()
+
+    segments = await ChunkedTranscriber(pool, chunk_seconds=1.0, overlap_seconds=0.0, store=store).transcribe(source)
+
+    assert [segment.text for segment in segments] == [f"chunk_{i:04d}" for i in range(CHUNKS)]
+    assert len(pool.files_on_disk) == CHUNKS
+    assert max(pool.files_on_disk) <= 2 * pool.workers
+    assert sorted(path_.name for path_ in tmp_path.iterdir()) == sorted([source.name, store.path_for(source).name])
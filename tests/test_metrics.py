@@ -0,0 +1,110 @@
+import json
+
+import pytest
+import pytest_asyncio
+from aiohttp import ClientSession
+
+from metrics import Metrics, metrics
+from pipeline import TranscriptionPipeline
+from support.youtube_stub import CHANNEL_ID
+from tests.test_rate_governor import ATTEMPTS, make_governor
+from youtube_workers.youtube_api import YouTubeClient
+
+BUCKETS = (0.1, 1.0)
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.clear()
+    metrics.enable()
+    yield metrics
+    metrics.enabled = False
+    metrics.clear()
+
+
+@pytest_asyncio.fixture
+async def governed_client(youtube_stub):
+    async with YouTubeClient("stub_key", base_url=youtube_stub.base_url, governor=make_governor()) as client:
+        yield client
+
+
+def test_disabled_metrics_record_nothing():
+    disabled = Metrics()
+    disabled.inc("jobs_total")
+    disabled.observe("stage_seconds", 1.0)
+    with disabled.timer("stage_seconds"):
+        pass
+
+    assert disabled.snapshot() == {"counters": {}, "histograms": {}}
+
+
+def test_counters_and_histograms():
+    metrics_ = Metrics(enabled=True, buckets=BUCKETS)
+    metrics_.inc("jobs_total", stage="download")
+    metrics_.inc("jobs_total", 2, stage="download")
+    for value in (0.05, 0.5, 5.0):
+        metrics_.observe("stage_seconds", value, stage="download")
+
+    snapshot = metrics_.snapshot()
+    assert snapshot["counters"]["jobs_total"] == {"stage=download": 3}
+    assert snapshot["histograms"]["stage_seconds"]["stage=download"]["count"] == len((0.05, 0.5, 5.0))
+
+    text = metrics_.render_prometheus()
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{stage="download"} 3' in text
+    assert 'stage_seconds_bucket{stage="download",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="download",le="1.0"} 2' in text
+    assert 'stage_seconds_bucket{stage="download",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="download"} 3' in text
+
+
+def test_timer_and_dump(tmp_path):
+    metrics_ = Metrics(enabled=True, buckets=BUCKETS)
+    with metrics_.timer("stage_seconds", stage="write"):
+        pass
+    metrics_.dump(tmp_path / "metrics.json")
+
+    dumped = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert dumped["histograms"]["stage_seconds"]["stage=write"]["count"] == 1
+    assert not (tmp_path / "metrics.tmp").exists()
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(unused_tcp_port):
+    metrics_ = Metrics(enabled=True)
+    metrics_.inc("jobs_total")
+    runner = await metrics_.serve(port=unused_tcp_port)
+    try:
+        async with ClientSession() as session, session.get(f"http://127.0.0.1:{unused_tcp_port}/metrics") as response:
+            text = await response.text()
+    finally:
+        await runner.cleanup()
+
+    assert "jobs_total 1" in text
+
+
+@pytest.mark.asyncio
+async def test_youtube_requests_are_instrumented(youtube_stub, governed_client, enabled_metrics):
+    youtube_stub.fail_next("playlistItems", 429, times=ATTEMPTS - 1, retry_after="0")
+    [video async for page in governed_client.iter_channel_videos(CHANNEL_ID) for video in page]
+
+    snapshot = enabled_metrics.snapshot()
+    assert snapshot["counters"]["governor_retries_total"] == {"endpoint=playlistItems": ATTEMPTS - 1}
+    assert snapshot["counters"]["youtube_api_responses_total"]["endpoint=playlistItems,status=429"] == ATTEMPTS - 1
+    assert snapshot["counters"]["youtube_api_responses_total"]["endpoint=playlistItems,status=200"] >= 1
+    assert snapshot["histograms"]["governor_wait_seconds"]["endpoint=channels"]["count"] >= 1
+    assert "endpoint=playlistItems" in snapshot["histograms"]["youtube_api_request_seconds"]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stages_are_instrumented(fake_videos, fake_loader, fake_transcriber, enabled_metrics):
+    pipeline = TranscriptionPipeline(fake_loader, fake_transcriber, TranscriptionPipeline.Config(decode=False))
+
+    await pipeline.run(fake_videos)
+
+    snapshot = enabled_metrics.snapshot()
+    jobs = snapshot["counters"]["pipeline_jobs_total"]
+    assert jobs["result=failed,stage=download"] == 1
+    assert jobs["result=processed,stage=write"] == len(fake_videos) - 1
+    assert snapshot["histograms"]["pipeline_stage_seconds"]["stage=transcribe"]["count"] == len(fake_videos) - 1
+    assert snapshot["counters"]["audio_seconds_processed_total"][""] > 0
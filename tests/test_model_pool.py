@@ -0,0 +1,136 @@
+import itertools
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from loguru import logger
+
+from objects import TranscriptionSegment
+from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import AudioSource
+from transcribers.model_pool import ModelKey, ModelPool
+
+ACQUIRES = 3
+BUDGET_MB = 100
+MODEL_MB = 60
+REPLICAS = 2
+
+
+def test_model_loaded_once():
+    pool = ModelPool()
+    key = ModelKey(backend="fake", model="tiny")
+    loads = []
+
+    for _ in range(ACQUIRES):
+        with pool.acquire(key, lambda: loads.append(1) or object()) as model:
+            assert model is not None
+
+    assert len(loads) == 1
+    assert pool.stats.misses == 1
+    assert pool.stats.hits == ACQUIRES - 1
+    assert pool.report()["resident_models"] == 1
+
+
+def test_lru_eviction_under_budget():
+    pool = ModelPool(memory_budget_mb=BUDGET_MB)
+    keys = [ModelKey(backend="fake", model=name) for name in ("a", "b", "c")]
+
+    for key in keys:
+        with pool.acquire(key, object, size_mb=MODEL_MB):
+            pass
+
+    assert pool.stats.evictions == len(keys) - 1  # only one model fits the budget
+    assert pool.resident_mb <= BUDGET_MB
+    with pool.acquire(keys[-1], object, size_mb=MODEL_MB):
+        pass
+    assert pool.stats.hits == 1
+
+
+def test_replicas_limit():
+    pool = ModelPool(replicas=REPLICAS)
+    key = ModelKey(backend="fake", model="tiny")
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def worker() -> None:
+        with pool.acquire(key, object):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pool.stats.loads == REPLICAS
+    assert max(peak) == REPLICAS
+
+
+def test_replicas_validation():
+    with pytest.raises(ValueError, match="replicas must be"):
+        ModelPool(replicas=0)
+
+
+def test_replica_is_not_loaded_again_before_it_is_registered():
+    pool = ModelPool(replicas=1)
+    key = ModelKey(backend="fake", model="tiny")
+    loading = threading.Event()
+
+    def load() -> object:
+        loading.set()
+        return object()
+
+    def slow_log(message: str) -> None:  # widens the gap between the load and the registration
+        if "loaded in" in message:
+            time.sleep(0.1)
+
+    def worker() -> None:
+        with pool.acquire(key, load):
+            time.sleep(0.2)
+
+    sink = logger.add(slow_log)
+    try:
+        first = threading.Thread(target=worker)
+        first.start()
+        loading.wait()
+        second = threading.Thread(target=worker)
+        second.start()
+        first.join()
+        second.join()
+    finally:
+        logger.remove(sink)
+
+    assert pool.stats.loads == 1
+
+
+class PooledTranscriber(AbstractTranscriber):
+    def __init__(self, pool: ModelPool):
+        self.pool = pool
+
+    def transcribe_stream(
+        self, path: AudioSource, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        with self.pool.acquire(ModelKey(backend="fake", model="tiny"), object):
+            for i in itertools.count():
+                yield TranscriptionSegment(text=str(i), start=float(i), end=float(i + 1))
+
+
+@pytest.mark.asyncio
+async def test_stopped_stream_releases_the_replica():
+    pool = ModelPool()
+    segments = PooledTranscriber(pool).atranscribe_stream(Path("endless.wav"), buffer=1)
+
+    async for segment in segments:
+        assert segment.text == "0"
+        break
+    await segments.aclose()
+
+    assert not any(replica.busy for replicas in pool._entries.values() for replica in replicas)
@@ -0,0 +1,159 @@
+import asyncio
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import pipeline as pipeline_module
+from objects import TranscriptionSegment, YouTubeVideo
+from pipeline import TranscriptionPipeline
+from transcribers.abscract import AbstractTranscriber
+from transcribers.audio import SAMPLE_RATE, AudioSource
+
+
+@pytest.mark.asyncio
+async def test_pipeline_processes_all_videos(fake_videos, fake_loader, fake_transcriber):
+    pipeline = TranscriptionPipeline(
+        fake_loader, fake_transcriber, TranscriptionPipeline.Config(queue_size=1, decode=False)
+    )
+
+    results = await pipeline.run(fake_videos)
+
+    assert sorted(path_.stem for path_ in results) == sorted(video.id for video in fake_videos[:-1])
+    for path_ in results:
+        assert path_.read_text(encoding="utf-8") == path_.stem
+        assert not path_.with_suffix(".opus").exists()
+
+    report = pipeline.report()
+    assert report["download"]["failed"] == 1
+    assert report["write"]["processed"] == len(fake_videos) - 1
+    assert all(stage["queue_depth"] == 0 for stage in report.values())
+
+
+class BatchingTranscriber(AbstractTranscriber):
+    def __init__(self):
+        self.batch_sizes: list[int] = []
+
+    def transcribe_stream(
+        self, path: Path, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        yield TranscriptionSegment(text=path.stem, start=0.0, end=1.0)
+
+    def transcribe_batch(self, clips: list[tuple[YouTubeVideo, Path]]):
+        self.batch_sizes.append(len(clips))
+        return [(video, [TranscriptionSegment(text=video.id, start=0.0, end=1.0)]) for video, _ in clips]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_batches_short_clips(fake_videos, fake_loader):
+    fake_loader.fail_ids = set()
+    config = TranscriptionPipeline.Config(decode=False, batch_clip_seconds=60, batch_max_items=3, batch_max_wait=0.1)
+    transcriber = BatchingTranscriber()
+    pipeline = TranscriptionPipeline(fake_loader, lambda: transcriber, config)
+
+    results = await pipeline.run(fake_videos)
+
+    assert len(results) == len(fake_videos)
+    assert sum(transcriber.batch_sizes) == len(fake_videos)
+    assert max(transcriber.batch_sizes) > 1
+    for path_ in results:
+        assert path_.read_text(encoding="utf-8") == path_.stem
+
+
+@pytest.mark.asyncio
+async def test_pipeline_batches_short_clips_in_process_pool(monkeypatch, fake_videos, fake_loader, fake_process_pool):
+    probed = []
+
+    async def probe_duration(path: Path) -> float:
+        probed.append(path.name)
+        return 1.0
+
+    monkeypatch.setattr(pipeline_module, "probe_duration", probe_duration)
+    fake_loader.fail_ids = set()
+    transcriber = BatchingTranscriber()
+    config = TranscriptionPipeline.Config(decode=False, batch_clip_seconds=60, batch_max_items=3, batch_max_wait=0.1)
+    pipeline = TranscriptionPipeline(fake_loader, lambda: transcriber, config, process_pool=fake_process_pool)
+
+    results = await pipeline.run(fake_videos)
+
+    assert len(results) == len(fake_videos)
+    assert not transcriber.batch_sizes
+    assert sum(fake_process_pool.batch_sizes) == len(fake_videos)
+    assert max(fake_process_pool.batch_sizes) > 1
+    assert sum(fake_process_pool.batch_durations) == len(fake_videos)
+    assert len(probed) == len(fake_videos)
+    for path_ in results:
+        assert path_.read_text(encoding="utf-8") == path_.stem
+
+
+class ArrayTranscriber(AbstractTranscriber):
+    def transcribe_stream(
+        self, path: AudioSource, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        assert isinstance(path, np.ndarray)
+        yield TranscriptionSegment(text=f"{len(path) / SAMPLE_RATE:.0f}s", start=0.0, end=1.0)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_in_memory_mode(tmp_path, fake_videos, fake_loader):
+    pipeline = TranscriptionPipeline(fake_loader, ArrayTranscriber, TranscriptionPipeline.Config(in_memory=True))
+
+    results = await pipeline.run(fake_videos)
+
+    assert len(results) == len(fake_videos) - 1
+    for video in fake_videos[:-1]:
+        target = (tmp_path / fake_loader.prepare_title(video.title)).with_suffix(".txt")
+        assert target.read_text(encoding="utf-8") == f"{int(video.id[-1]) + 1}s"
+    assert sorted(tmp_path.iterdir()) == sorted(results)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_removes_audio_failing_to_decode(monkeypatch, fake_videos, fake_loader, fake_transcriber):
+    async def resample_to_wav(path: Path) -> Path:
+        raise RuntimeError(f"Unable to decode {path}")
+
+    monkeypatch.setattr(pipeline_module, "resample_to_wav", resample_to_wav)
+    pipeline = TranscriptionPipeline(fake_loader, fake_transcriber)
+
+    assert await pipeline.run(fake_videos) == []
+    assert pipeline.report()["decode"]["failed"] == len(fake_videos) - 1
+    assert not list(fake_loader.dir.glob("*.opus"))
+
+
+class FailingTranscriber(AbstractTranscriber):
+    def transcribe_stream(
+        self, path: Path, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        raise RuntimeError(f"Unable to transcribe {path}")
+
+    def transcribe_batch(self, clips: list[tuple[YouTubeVideo, Path]]):
+        raise RuntimeError(f"Unable to transcribe {len(clips)} clips")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("batch_clip_seconds", [0, 60])
+async def test_pipeline_removes_audio_failing_to_transcribe(fake_videos, fake_loader, batch_clip_seconds):
+    config = TranscriptionPipeline.Config(decode=False, batch_clip_seconds=batch_clip_seconds, batch_max_wait=0.1)
+    pipeline = TranscriptionPipeline(fake_loader, FailingTranscriber, config)
+
+    assert await pipeline.run(fake_videos) == []
+    assert pipeline.report()["transcribe"]["failed"] == len(fake_videos) - 1
+    assert not list(fake_loader.dir.glob("*.opus"))
+
+
+@pytest.mark.asyncio
+async def test_cancelled_pipeline_stops_its_stages(fake_videos, fake_loader, fake_transcriber):
+    fake_loader.gate.clear()
+    pipeline = TranscriptionPipeline(fake_loader, fake_transcriber, TranscriptionPipeline.Config(decode=False))
+    running = asyncio.create_task(pipeline.run(fake_videos))
+    while not fake_loader.downloads:
+        await asyncio.sleep(0.01)
+    before = asyncio.all_tasks() - {running, asyncio.current_task()}
+
+    running.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await running
+
+    assert before
+    assert all(task.done() for task in before)
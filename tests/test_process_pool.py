@@ -0,0 +1,76 @@
+import asyncio
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from objects import TranscriptionSegment
+from transcribers.abscract import AbstractTranscriber
+from transcribers.process_pool import ProcessPoolTranscriber, plan_workers
+
+SEGMENTS_PER_FILE = 3
+
+
+class EchoTranscriber(AbstractTranscriber):
+    def __init__(self, model: str):
+        self.model = model
+
+    def transcribe_stream(
+        self, path: Path, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        for i in range(SEGMENTS_PER_FILE):
+            yield TranscriptionSegment(text=f"{path.stem}-{i} ", start=float(i), end=float(i + 1))
+
+
+@pytest.mark.parametrize(
+    ("cores", "workers", "cpu_threads", "expected"),
+    [
+        (64, None, None, (16, 4)),
+        (64, 8, None, (8, 8)),
+        (64, None, 16, (4, 16)),
+        (8, 4, 8, (4, 2)),
+        (1, None, None, (1, 1)),
+    ],
+)
+def test_plan_workers(cores, workers, cpu_threads, expected):
+    planned_workers, planned_threads = plan_workers(cores, workers, cpu_threads)
+    assert (planned_workers, planned_threads) == expected
+    assert planned_workers * planned_threads <= cores
+
+
+@pytest.mark.asyncio
+async def test_process_pool_transcription(saving_path):
+    pool = ProcessPoolTranscriber(EchoTranscriber, "tiny", workers=2, cpu_threads=1)
+    sources = [saving_path / f"pool_source_{i}.wav" for i in range(3)]
+    try:
+        targets = [source.with_suffix(".txt") for source in sources]
+        results = await asyncio.gather(
+            *(
+                pool.transcribe_to_file(source, target, duration=i)
+                for i, (source, target) in enumerate(zip(sources, targets, strict=True))
+            )
+        )
+        assert all(amount == SEGMENTS_PER_FILE for amount, _ in results)
+        for source, target in zip(sources, targets, strict=True):
+            assert target.read_text(encoding="utf-8").startswith(f"{source.stem}-0")
+            target.unlink()
+
+        segments = [segment async for segment in pool.transcribe_stream(sources[0], duration=1.0)]
+        assert [segment.text for segment in segments] == [f"{sources[0].stem}-{i} " for i in range(SEGMENTS_PER_FILE)]
+    finally:
+        await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_process_pool_cancels_jobs_dropped_by_shutdown(saving_path):
+    pool = ProcessPoolTranscriber(EchoTranscriber, "tiny", workers=1, cpu_threads=1)
+    try:
+        job = await pool._submit(saving_path / "pool_source.wav", None, stream=False, duration=1.0)
+        dropped = asyncio.get_running_loop().create_future()
+        dropped.cancel()
+
+        pool._finish(job, dropped)
+
+        assert job.future.cancelled()
+    finally:
+        await pool.aclose()
@@ -0,0 +1,161 @@
+import time
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+from support.youtube_stub import CHANNEL_ID
+from youtube_workers.channel_manifest import ChannelManifest
+from youtube_workers.rate_governor import AimdLimiter, RequestGovernor, RetryableError, TokenBucket, parse_retry_after
+from youtube_workers.youtube_api import YouTubeClient
+from youtube_workers.yt_dlp_loader import YouTubeLoader
+
+ATTEMPTS = 3
+RETRY_AFTER = 7
+MAX_CONCURRENCY = 2
+INITIAL_LIMIT = 8
+
+
+def make_governor(**overrides) -> RequestGovernor:
+    config = {"attempts": ATTEMPTS, "base_delay": 0.01, "max_delay": 0.1, "burst": 100.0, "default_rate": 1000.0}
+    return RequestGovernor(RequestGovernor.Config(**(config | overrides)))
+
+
+@pytest_asyncio.fixture
+async def governed_client(youtube_stub):
+    async with YouTubeClient("stub_key", base_url=youtube_stub.base_url, governor=make_governor()) as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50.0, capacity=1.0)
+    start = time.monotonic()
+    for _ in range(11):
+        await bucket.acquire()
+
+    assert time.monotonic() - start >= 10 / bucket.rate - 0.01
+
+
+def test_aimd_limiter_adapts():
+    limiter = AimdLimiter(initial=INITIAL_LIMIT, minimum=1, maximum=10)
+    limiter.on_throttle()
+    limiter.on_throttle()  # within the cooldown, counted once
+    assert limiter.limit == INITIAL_LIMIT * limiter.decrease
+
+    halved = limiter.limit
+    for _ in range(int(halved)):
+        limiter.on_success()
+    assert limiter.limit == pytest.approx(halved + 1, abs=0.2)
+
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.limit == limiter.maximum
+
+
+def test_backoff_prefers_retry_after():
+    governor = make_governor(max_delay=60.0)
+    http_date = format_datetime(datetime.now(UTC) + timedelta(seconds=30), usegmt=True)
+
+    assert parse_retry_after(str(RETRY_AFTER)) == RETRY_AFTER
+    assert 25 < parse_retry_after(http_date) <= 30  # noqa PLR2004
+    assert parse_retry_after("soon") is None
+    assert governor.backoff(10, retry_after=RETRY_AFTER) == RETRY_AFTER
+    assert 0 <= governor.backoff(2) <= governor.config.base_delay * 4
+
+
+@pytest.mark.asyncio
+async def test_throttled_requests_are_retried(youtube_stub, governed_client):
+    youtube_stub.fail_next("playlistItems", 429, times=ATTEMPTS - 1, retry_after="0")
+    youtube_stub.fail_next("channels", 503)
+
+    amount, _ = await governed_client.get_channel_videos(CHANNEL_ID)
+
+    assert amount == len(youtube_stub.uploads)
+    assert youtube_stub.requests["playlistItems.failed"] == ATTEMPTS - 1
+    assert governed_client.governor.stats["playlistItems.retries"] == ATTEMPTS - 1
+    assert governed_client.governor.stats["channels.retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_sync_keeps_manifest(youtube_stub, governed_client):
+    youtube_stub.fail_next("playlistItems", 500, times=ATTEMPTS)
+    manifest = ChannelManifest(channel_id=CHANNEL_ID)
+
+    pages = [page async for page in governed_client.iter_channel_videos(CHANNEL_ID, manifest)]
+
+    assert pages == []
+    assert manifest.known_ids == []
+    assert manifest.etag is None
+
+
+@pytest.mark.asyncio
+async def test_client_error_keeps_manifest(youtube_stub, governed_client):
+    manifest = ChannelManifest(channel_id=CHANNEL_ID)
+    pages = []
+    async for page in governed_client.iter_channel_videos(CHANNEL_ID, manifest):
+        pages.append(page)
+        youtube_stub.fail_next("playlistItems", 404, reason="playlistNotFound")
+
+    assert len(pages) == 1  # the second page is not found, the first one alone must not update the manifest
+    assert manifest.known_ids == []
+    assert manifest.etag is None
+    assert youtube_stub.requests["playlistItems.failed"] == 1
+    assert governed_client.governor.stats["playlistItems.retries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_quota_budget_stops_requests(youtube_stub):
+    governor = make_governor(quota_budget=3)  # channels + 2 pages of playlistItems, out of 3 pages
+    async with YouTubeClient("stub_key", base_url=youtube_stub.base_url, governor=governor) as client:
+        manifest = ChannelManifest(channel_id=CHANNEL_ID)
+        pages = [page async for page in client.iter_channel_videos(CHANNEL_ID, manifest)]
+
+    assert sum(len(page) for page in pages) == 2 * youtube_stub.page_size
+    assert youtube_stub.requests["playlistItems"] == governor.quota.used["playlistItems"]
+    assert governor.quota.used == {"channels": 1, "playlistItems": 2}
+    assert manifest.known_ids == []
+
+
+@pytest.mark.asyncio
+async def test_server_quota_error_is_not_retried(youtube_stub, governed_client):
+    youtube_stub.fail_next("videos", 403, reason="quotaExceeded")
+    ids = [video["id"] for video in youtube_stub.uploads[:3]]
+
+    videos, failed = await governed_client.get_videos_by_links(
+        [f"https://www.youtube.com/watch?v={id_}" for id_ in ids]
+    )
+    assert videos == []
+    assert len(failed) == len(ids)
+
+    videos, _ = await governed_client.get_videos_by_links([f"https://www.youtube.com/watch?v={ids[0]}"])
+    assert videos == []
+    assert youtube_stub.requests["videos.failed"] == 1
+    assert youtube_stub.requests["videos"] == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped_by_governor(youtube_stub):
+    governor = make_governor(initial_concurrency=MAX_CONCURRENCY, max_concurrency=MAX_CONCURRENCY)
+    links = [f"https://www.youtube.com/watch?v={video['id']}" for video in youtube_stub.uploads]
+    async with YouTubeClient("stub_key", base_url=youtube_stub.base_url, governor=governor) as client:
+        videos, _ = await client.get_videos_by_links(links, concurrency=10)
+
+    assert len(videos) == len(links)
+    assert youtube_stub.max_in_flight <= MAX_CONCURRENCY  # 3 chunks of ids requested at once otherwise
+
+
+@pytest.mark.asyncio
+async def test_loader_gives_up_with_the_method_result_type(tmp_path, fake_videos):
+    def throttled(*args) -> None:
+        raise RetryableError("HTTP Error 429: Too Many Requests")
+
+    loader = YouTubeLoader(tmp_path, governor=make_governor())
+    loader.ydl_pool.resolve = throttled
+    loader.ydl_pool.download = throttled
+
+    assert await loader.load_audio(fake_videos[0]) == (False, None)
+    assert await loader.download_audio(fake_videos[0], for_transcription=True) == (False, Path())
+    assert loader.governor.stats["media.retries"] == 2 * ATTEMPTS
@@ -0,0 +1,164 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+import pytest_asyncio
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+
+from objects import YouTubeVideo
+from service import TranscriptionService
+from storage.transcript_cache import TranscriptCache
+
+CHANNEL = "https://www.youtube.com/@stub"
+
+
+class FakeClient:
+    def __init__(self, videos: list[YouTubeVideo]):
+        self.videos = {video.id: video for video in videos}
+
+    async def get_videos_by_links(self, links: list[str]) -> tuple[list[YouTubeVideo], list[str]]:
+        ids = [link.rsplit("=", 1)[-1] for link in links]
+        return [self.videos[id_] for id_ in ids if id_ in self.videos], []
+
+    async def get_channel_id_by_link(self, link: str) -> str | None:
+        return "channel" if link == CHANNEL else None
+
+    async def iter_channel_videos(self, channel_id: str):
+        yield list(self.videos.values())
+
+
+@pytest_asyncio.fixture
+async def service(tmp_path, fake_videos, fake_loader, fake_process_pool):
+    service_ = TranscriptionService(
+        tmp_path,
+        FakeClient(fake_videos),
+        fake_loader,
+        lambda _: fake_process_pool,
+        cache=TranscriptCache(tmp_path / ".cache"),
+        config=TranscriptionService.Config(queue_size=1, io_workers=2, inference_workers=1, models=("tiny",)),
+    )
+    async with TestClient(TestServer(service_.app)) as client:
+        yield service_, client
+
+
+async def wait_for(client: TestClient, job_id: str) -> list[dict]:
+    async with client.get(f"/jobs/{job_id}/events") as response:
+        return [json.loads(line) async for line in response.content]
+
+
+@pytest.mark.asyncio
+async def test_service_transcribes_channel(service):
+    service_, client = service
+    response = await client.post("/jobs", json={"channel": CHANNEL})
+    job = await response.json()
+
+    assert response.status == HTTPStatus.ACCEPTED
+    assert response.headers["Location"] == f"/jobs/{job['id']}"
+    events = await wait_for(client, job["id"])
+    result = await (await client.get(f"/jobs/{job['id']}/result")).json()
+
+    assert events[-1]["status"] == "done"
+    assert [event["status"] for event in events].count("done") == 1
+    assert (result["videos"], result["done"], result["failed"]) == (5, 4, 1)
+    assert "video4" in result["error"]
+    assert sorted(transcript["text"] for transcript in result["transcripts"]) == [
+        "captions",
+        "text of video1",
+        "text of video2",
+        "text of video3",
+    ]
+    assert not list(service_.loader.dir.glob("*.opus"))
+
+    cached = await wait_for(client, (await (await client.post("/jobs", json={"video": "v=video1"})).json())["id"])
+    assert cached[-1]["done"] == 1
+    assert service_.loader.downloads["video1"] == 1
+
+
+@pytest.mark.asyncio
+async def test_service_transcribes_video_once_for_concurrent_jobs(service):
+    service_, client = service
+    service_.loader.gate.clear()
+    first = await (await client.post("/jobs", json={"video": "v=video2"})).json()
+    while service_.loader.downloads["video2"] == 0:
+        await asyncio.sleep(0.01)
+    second = await (await client.post("/jobs", json={"video": "v=video2", "model": "tiny"})).json()
+    while (await (await client.get(f"/jobs/{second['id']}")).json())["status"] != "running":
+        await asyncio.sleep(0.01)
+    service_.loader.gate.set()
+
+    assert (await wait_for(client, first["id"]))[-1]["status"] == "done"
+    assert (await wait_for(client, second["id"]))[-1]["status"] == "done"
+    assert service_.loader.downloads["video2"] == 1
+
+
+@pytest.mark.asyncio
+async def test_service_applies_backpressure(service):
+    service_, client = service
+    service_.loader.gate.clear()
+    running = [await (await client.post("/jobs", json={"video": f"v={id_}"})).json() for id_ in ("video1", "video2")]
+    while len(service_.loader.downloads) < len(running):
+        await asyncio.sleep(0.01)
+    queued = await client.post("/jobs", json={"video": "v=video3"})
+    rejected = await client.post("/jobs", json={"video": "v=video0"})
+    rejected_upload = await client.post("/jobs/upload", data={"file": b"audio"})
+    unfinished = await client.get(f"/jobs/{running[0]['id']}/result")
+    service_.loader.gate.set()
+
+    assert queued.status == HTTPStatus.ACCEPTED
+    assert rejected.status == HTTPStatus.TOO_MANY_REQUESTS
+    assert rejected.headers["Retry-After"] == str(service_.config.retry_after)
+    assert rejected_upload.status == HTTPStatus.TOO_MANY_REQUESTS
+    assert unfinished.status == HTTPStatus.CONFLICT
+    assert len(service_.jobs) == len([*running, queued])
+    assert (await wait_for(client, (await queued.json())["id"]))[-1]["status"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_service_validates_requests(service):
+    _, client = service
+
+    assert (await client.post("/jobs", json={"video": "v=video1", "channel": CHANNEL})).status == HTTPStatus.BAD_REQUEST
+    assert (await client.post("/jobs", json={"video": "v=video1", "model": "large"})).status == HTTPStatus.BAD_REQUEST
+    assert (await client.post("/jobs", data=b"not json")).status == HTTPStatus.BAD_REQUEST
+    assert (await client.get("/jobs/unknown")).status == HTTPStatus.NOT_FOUND
+    missing = await wait_for(client, (await (await client.post("/jobs", json={"video": "v=missing"})).json())["id"])
+    assert missing[-1]["status"] == "failed"
+    assert "No videos found" in missing[-1]["error"]
+
+
+@pytest.mark.asyncio
+async def test_service_transcribes_uploaded_file(service):
+    service_, client = service
+    form = FormData()
+    form.add_field("file", b"uploaded audio", filename="My Lecture.mp3")
+    response = await client.post("/jobs/upload", data=form)
+    job = await response.json()
+
+    assert response.status == HTTPStatus.ACCEPTED
+    assert job["kind"] == "file"
+    assert (await wait_for(client, job["id"]))[-1]["status"] == "done"
+    result = await (await client.get(f"/jobs/{job['id']}/result")).json()
+    assert result["transcripts"] == [{"name": f"{job['id']}_my_lecture.txt", "text": f"text of {job['id']}_my_lecture"}]
+    assert not list(service_.uploads.glob("*.mp3"))
+
+
+@pytest.mark.asyncio
+async def test_service_fails_upload_once_when_io_fails(service, monkeypatch):
+    service_, client = service
+
+    async def put(_) -> None:
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(service_._inference, "put", put)
+    form = FormData()
+    form.add_field("file", b"uploaded audio", filename="lecture.mp3")
+    job = await (await client.post("/jobs/upload", data=form)).json()
+
+    events = await wait_for(client, job["id"])
+
+    assert [event["status"] for event in events].count("failed") == 1
+    assert "No space left on device" in events[-1]["error"]
+    assert service_._in_flight == {}
+    assert not list(service_.uploads.iterdir())
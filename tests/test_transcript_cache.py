@@ -0,0 +1,63 @@
+from storage.transcript_cache import TranscriptCache
+
+TEXT = "cached transcript"
+
+
+def test_cache_hit_and_force(tmp_path):
+    cache_dir = tmp_path / "cache_test"
+    source = tmp_path / "cache_source.txt"
+    source.write_text(TEXT, encoding="utf-8")
+    key = TranscriptCache.key_for_video("video_id", "small")
+
+    cache = TranscriptCache(cache_dir)
+    assert cache.get_path(key) is None
+    cache.put(key, source)
+
+    reloaded = TranscriptCache(cache_dir)
+    target = tmp_path / "cache_target.txt"
+    assert reloaded.copy_to(key, target)
+    assert target.read_text(encoding="utf-8") == TEXT
+    assert not TranscriptCache(cache_dir, force=True).copy_to(key, target)
+    assert key != TranscriptCache.key_for_video("video_id", "small", "en")
+
+
+def test_cache_lru_eviction(tmp_path):
+    cache_dir = tmp_path / "cache_eviction_test"
+    source = tmp_path / "cache_eviction_source.txt"
+    source.write_text(TEXT, encoding="utf-8")
+    cache = TranscriptCache(cache_dir, max_bytes=2 * len(TEXT))
+    keys = [TranscriptCache.key_for_video(f"video{i}", "small") for i in range(3)]
+
+    cache.put(keys[0], source)
+    cache.put(keys[1], source)
+    assert cache.get_path(keys[0]) is not None
+    cache.put(keys[2], source)
+
+    reloaded = TranscriptCache(cache_dir, max_bytes=2 * len(TEXT))
+    assert reloaded.get_path(keys[1]) is None
+    assert reloaded.get_path(keys[0]) is not None
+    assert reloaded.get_path(keys[2]) is not None
+
+
+def test_file_key_depends_on_content(tmp_path):
+    first, second = tmp_path / "cache_key_a.wav", tmp_path / "cache_key_b.wav"
+    first.write_bytes(b"audio")
+    second.write_bytes(b"audio")
+    assert TranscriptCache.key_for_file(first, "small") == TranscriptCache.key_for_file(second, "small")
+    second.write_bytes(b"other audio")
+    assert TranscriptCache.key_for_file(first, "small") != TranscriptCache.key_for_file(second, "small")
+
+
+def test_bypassed_cache_shares_the_index(tmp_path):
+    cache_dir = tmp_path / "cache_bypass_test"
+    source = tmp_path / "cache_source.txt"
+    source.write_text(TEXT, encoding="utf-8")
+    key = TranscriptCache.key_for_video("video_id", "small")
+    cache = TranscriptCache(cache_dir)
+
+    bypassed = cache.bypassed()
+    bypassed.put(key, source)
+
+    assert bypassed.get_path(key) is None
+    assert cache.get_path(key) is not None
+    assert TranscriptCache(cache_dir).get_path(key) is not None
@@ -0,0 +1,44 @@
+from collections.abc import Iterator
+
+import pytest
+
+from objects import TranscriptionSegment
+from transcribers.transcript_writer import TranscriptWriter
+
+SEGMENTS = 5
+FSYNC_EVERY = 2  # segments between progress records
+
+
+def make_segments(amount: int, start: int = 0) -> list[TranscriptionSegment]:
+    return [TranscriptionSegment(text=f" s{i}", start=float(i), end=float(i + 1)) for i in range(start, amount)]
+
+
+def test_write_segments(saving_path):
+    target = saving_path / "writer_test.txt"
+    writer = TranscriptWriter(target, fsync_every=FSYNC_EVERY)
+
+    assert writer.write(make_segments(SEGMENTS)) == SEGMENTS
+    assert target.read_text(encoding="utf-8") == " s0 s1 s2 s3 s4"
+    assert not writer.progress_file.exists()
+    target.unlink()
+
+
+def test_resume_after_crash(saving_path):
+    target = saving_path / "writer_resume_test.txt"
+    writer = TranscriptWriter(target, fsync_every=FSYNC_EVERY)
+
+    def crashing() -> Iterator[TranscriptionSegment]:
+        yield from make_segments(3)
+        raise RuntimeError("crash")
+
+    with pytest.raises(RuntimeError):
+        writer.write(crashing())
+
+    start, offset = writer.resume_point()
+    assert start == FSYNC_EVERY  # end of the last synced segment
+    assert target.read_bytes()[:offset] == b" s0 s1"
+
+    writer.write(make_segments(4, start=int(start)), offset=offset)
+    assert target.read_text(encoding="utf-8") == " s0 s1 s2 s3"
+    assert writer.resume_point() == (0.0, 0)
+    target.unlink()
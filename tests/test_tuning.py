@@ -0,0 +1,90 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from objects import TranscriptionSegment
+from transcribers import host_profile
+from transcribers.abscract import AbstractTranscriber
+from transcribers.host_profile import HostProfile, load_profile, profile_path, save_profile
+from transcribers.process_pool import ProcessPoolTranscriber
+from transcribers.tuning import Candidate, candidates, tune
+
+CORES = 8
+MEMORY_LIMIT_MB = 1000
+
+
+class TunedTranscriber(AbstractTranscriber):
+    def __init__(self, model: str, cpu_threads: int | None = None, tuned: bool = True):
+        self.model = model
+
+    def transcribe_stream(
+        self, path: Path, start: float = 0.0, language: str | None = None
+    ) -> Iterator[TranscriptionSegment]:
+        yield TranscriptionSegment(text=path.stem, start=0.0, end=1.0)
+
+
+def profile(**overrides) -> HostProfile:
+    values = {
+        "model": "small",
+        "compute_type": "int8",
+        "cpu_threads": 2,
+        "workers": 3,
+        "real_time_factor": 0.1,
+        "peak_memory_mb": 900.0,
+    }
+    return HostProfile(**{**values, **overrides})
+
+
+def test_candidates_do_not_oversubscribe_cores():
+    options = candidates(CORES, compute_types=("int8", "float32"))
+
+    assert all(option.cpu_threads * option.workers <= CORES for option in options)
+    assert {option.cpu_threads for option in options} == {1, 2, 4, 8}
+    assert Candidate("float32", 2, 4) in options
+    assert Candidate("int8", 8, 2) not in options
+
+
+def test_tune_picks_fastest_candidate_within_memory_limit():
+    results = {
+        Candidate("int8", 8, 1): (0.05, 2000.0),  # fastest, but over the limit
+        Candidate("int8", 4, 2): (0.08, 900.0),
+        Candidate("float32", 8, 1): (0.2, 700.0),
+        Candidate("int8_float32", 8, 1): None,  # unsupported on this CPU
+    }
+
+    def measure(model: str, clip: Path, audio_seconds: float, candidate: Candidate) -> tuple[float, float]:
+        if results[candidate] is None:
+            raise ValueError("unsupported compute type")
+        return results[candidate]
+
+    best = tune("small", Path("clip.wav"), 60.0, list(results), MEMORY_LIMIT_MB, measure)
+
+    assert (best.compute_type, best.cpu_threads, best.workers) == ("int8", 4, 2)
+    assert best.peak_memory_mb <= MEMORY_LIMIT_MB
+    assert tune("small", Path("clip.wav"), 60.0, [Candidate("int8", 8, 1)], MEMORY_LIMIT_MB, measure) is None
+
+
+def test_profiles_are_stored_per_model(tmp_path):
+    save_profile(profile(), tmp_path)
+    save_profile(profile(model="medium", compute_type="float32"), tmp_path)
+
+    assert load_profile("small", tmp_path) == profile()
+    assert load_profile("medium", tmp_path).compute_type == "float32"
+    assert load_profile("tiny", tmp_path) is None
+
+    profile_path(tmp_path).write_text("{broken", encoding="utf-8")
+    assert load_profile("small", tmp_path) is None
+
+
+@pytest.mark.parametrize(("workers", "expected"), [(None, (3, 2)), (1, (1, CORES))])
+def test_process_pool_uses_host_profile(tmp_path, monkeypatch, workers, expected):
+    monkeypatch.setattr(host_profile, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr("os.cpu_count", lambda: CORES)
+    save_profile(profile())
+
+    pool = ProcessPoolTranscriber(TunedTranscriber, "small", workers=workers)
+    try:
+        assert (pool.workers, pool.cpu_threads) == expected
+    finally:
+        pool.shutdown()
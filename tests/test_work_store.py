@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import pytest
+
+from storage.work_store import SqliteWorkStore, UnitKind, UnitState
+from worker import download_unit
+
+LEASE = 60.0
+MAX_ATTEMPTS = 2
+UNITS = 40
+
+
+@pytest.fixture
+def store(tmp_path):
+    store_ = SqliteWorkStore(tmp_path / "work.sqlite")
+    yield store_
+    store_.close()
+
+
+def test_claims_are_exclusive_and_follow_kinds(store, fake_videos):
+    assert store.add_units("batch", UnitKind.DOWNLOAD, map(download_unit, fake_videos)) == len(fake_videos)
+    assert store.add_units("batch", UnitKind.DOWNLOAD, map(download_unit, fake_videos)) == 0
+
+    first = store.claim("node-a", [UnitKind.DOWNLOAD], 3, LEASE, MAX_ATTEMPTS)
+    second = store.claim("node-b", [UnitKind.DOWNLOAD], 3, LEASE, MAX_ATTEMPTS)
+
+    assert store.claim("node-c", [UnitKind.TRANSCRIBE], 3, LEASE, MAX_ATTEMPTS) == []
+    assert [unit.key for unit in first + second] == [video.id for video in fake_videos]
+    assert first[0].payload["video"]["title"] == fake_videos[0].title
+    assert store.complete(first[0], "node-a", (UnitKind.TRANSCRIBE, {"audio": "video0.opus"}))
+    [transcribe] = store.claim("node-c", [UnitKind.TRANSCRIBE], 3, LEASE, MAX_ATTEMPTS)
+    assert (transcribe.key, transcribe.payload) == ("video0", {"audio": "video0.opus"})
+    assert store.unfinished() == len(fake_videos)
+    assert store.unfinished([UnitKind.TRANSCRIBE]) == 1
+
+
+def test_expired_leases_are_reclaimed(store, fake_videos):
+    store.add_units("batch", UnitKind.DOWNLOAD, map(download_unit, fake_videos[:2]))
+    lost, kept = store.claim("node-a", [UnitKind.DOWNLOAD], 2, 0.05, MAX_ATTEMPTS)
+    assert store.heartbeat("node-a", "download", [kept.id], LEASE) == {kept.id}
+    time.sleep(0.1)
+
+    [reclaimed] = store.claim("node-b", [UnitKind.DOWNLOAD], 2, LEASE, MAX_ATTEMPTS)
+
+    assert reclaimed.key == lost.key
+    assert reclaimed.attempts == lost.attempts + 1
+    assert store.heartbeat("node-a", "download", [lost.id, kept.id], LEASE) == {kept.id}
+    assert not store.complete(lost, "node-a")
+    assert store.complete(reclaimed, "node-b")
+    assert store.report()["units"] == {"download": {"done": 1, "leased": 1}}
+
+
+def test_failed_units_are_retried_until_out_of_attempts(store, fake_videos):
+    store.add_units("batch", UnitKind.DOWNLOAD, map(download_unit, fake_videos[:1]))
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        [unit] = store.claim("node", [UnitKind.DOWNLOAD], 1, LEASE, MAX_ATTEMPTS)
+        assert unit.attempts == attempt
+        assert store.fail(unit, "node", "download failed", MAX_ATTEMPTS)
+
+    assert store.claim("node", [UnitKind.DOWNLOAD], 1, LEASE, MAX_ATTEMPTS) == []
+    assert store.report()["units"] == {"download": {UnitState.FAILED: 1}}
+
+
+def test_report_aggregates_nodes(store, fake_videos):
+    store.add_units("batch", UnitKind.DOWNLOAD, map(download_unit, fake_videos))
+    for node, limit in (("node-a", 3), ("node-b", 2)):
+        store.heartbeat(node, "download", [], LEASE)
+        for unit in store.claim(node, [UnitKind.DOWNLOAD], limit, LEASE, MAX_ATTEMPTS):
+            store.complete(unit, node)
+
+    report = store.report(window=60.0)
+
+    assert report["units_per_min"] == {"download": len(fake_videos)}
+    assert {node: stats["units_per_min"] for node, stats in report["nodes"].items()} == {"node-a": 3, "node-b": 2}
+    assert report["nodes"]["node-a"]["role"] == "download"
+
+
+def claim_all(path_: Path, worker: str) -> list[str]:
+    store = SqliteWorkStore(path_)
+    claimed = []
+    try:
+        while units := store.claim(worker, [UnitKind.DOWNLOAD], 2, LEASE, MAX_ATTEMPTS):
+            claimed.extend(unit.key for unit in units)
+            for unit in units:
+                store.complete(unit, worker)
+    finally:
+        store.close()
+    return claimed
+
+
+def test_processes_never_claim_the_same_unit(store, tmp_path):
+    store.add_units("batch", UnitKind.DOWNLOAD, [(f"video{i}", {}) for i in range(UNITS)])
+
+    with ProcessPoolExecutor(max_workers=3, mp_context=get_context("spawn")) as executor:
+        claimed = [
+            key for keys in executor.map(claim_all, [store.path] * 3, ["node-a", "node-b", "node-c"]) for key in keys
+        ]
+
+    assert sorted(claimed) == sorted(f"video{i}" for i in range(UNITS))
+    assert store.unfinished() == 0
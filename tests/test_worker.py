@@ -0,0 +1,113 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from storage.work_store import SqliteWorkStore, UnitKind
+from worker import NodeWorker, download_unit
+
+MAX_ATTEMPTS = 2
+
+
+def config(role: str) -> NodeWorker.Config:
+    return NodeWorker.Config(
+        role=role, poll_seconds=0.01, heartbeat_seconds=0.05, max_attempts=MAX_ATTEMPTS, exit_when_idle=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_download_and_inference_nodes_share_the_work(tmp_path, fake_videos, fake_loader, fake_process_pool):
+    path_ = tmp_path / "work.sqlite"
+    SqliteWorkStore(path_).add_units("batch", UnitKind.DOWNLOAD, map(download_unit, fake_videos))
+    download_store, inference_store = SqliteWorkStore(path_), SqliteWorkStore(path_)
+    downloader = NodeWorker(download_store, fake_loader, config=config("download"), worker_id="downloader")
+    transcriber = NodeWorker(
+        inference_store, fake_loader, fake_process_pool, config=config("inference"), worker_id="transcriber"
+    )
+
+    download_stats, inference_stats = await asyncio.gather(downloader.run(), transcriber.run())
+
+    assert download_stats == {"processed": 4, "failed": MAX_ATTEMPTS, "lost": 0}
+    assert inference_stats == {"processed": 3, "failed": 0, "lost": 0}
+    assert fake_loader.downloads["video4"] == MAX_ATTEMPTS
+    assert sorted(path.name for path in tmp_path.glob("video*")) == [f"video{i}.txt" for i in range(4)]
+    report = download_store.report()
+    assert report["units"] == {"download": {"done": 4, "failed": 1}, "transcribe": {"done": 3}}
+    assert set(report["nodes"]) == {"downloader", "transcriber"}
+    assert report["units_per_min"] == {"download": pytest.approx(4 / 5), "transcribe": pytest.approx(3 / 5)}
+
+
+@pytest.mark.asyncio
+async def test_units_of_dead_nodes_are_reclaimed(tmp_path, fake_videos, fake_loader, fake_process_pool):
+    store = SqliteWorkStore(tmp_path / "work.sqlite")
+    store.add_units("batch", UnitKind.DOWNLOAD, map(download_unit, fake_videos[1:2]))
+    [abandoned] = store.claim("dead", [UnitKind.DOWNLOAD], 1, 0.2, MAX_ATTEMPTS)
+    node = NodeWorker(store, fake_loader, fake_process_pool, config=config("all"), worker_id="alive")
+
+    start = time.perf_counter()
+    stats = await node.run()
+
+    assert time.perf_counter() - start >= 0.1  # noqa PLR2004 the lease of the dead node expired first
+    assert stats == {"processed": 2, "failed": 0, "lost": 0}
+    assert not store.complete(abandoned, "dead")
+    assert (tmp_path / "video1.txt").read_text(encoding="utf-8") == "text of video1"
+
+
+def test_inference_nodes_need_a_process_pool(tmp_path, fake_loader):
+    with pytest.raises(ValueError, match="process pool"):
+        NodeWorker(SqliteWorkStore(tmp_path / "work.sqlite"), fake_loader, config=config("inference"))
+
+
+class BlockedProcessPool:
+    """
+    Transcription starts and waits for release(), like a job running on in a worker process.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.started = asyncio.Event()
+        self.released = asyncio.Event()
+
+    async def transcribe_to_file(
+        self, path: Path, target: Path, duration: float | None = None, language: str | None = None
+    ) -> tuple[int, float]:
+        self.started.set()
+        await self.released.wait()
+        target.write_text(self.text, encoding="utf-8")
+        return 1, 0.0
+
+
+@pytest.mark.asyncio
+async def test_transcript_of_a_stolen_lease_is_discarded(tmp_path, fake_videos, fake_loader):
+    store = SqliteWorkStore(tmp_path / "work.sqlite")
+    (tmp_path / "video1.opus").write_bytes(b"audio")
+    store.add_units(
+        "batch", UnitKind.TRANSCRIBE, [("video1", {**download_unit(fake_videos[1])[1], "audio": "video1.opus"})]
+    )
+    stale_pool, fresh_pool = BlockedProcessPool("stale"), BlockedProcessPool("fresh")
+    fresh_pool.released.set()
+    # the stale node misses its heartbeats, e.g. cut off from the store, and its lease expires
+    stale = NodeWorker(
+        store,
+        fake_loader,
+        stale_pool,
+        config=NodeWorker.Config(
+            role="inference", concurrency=1, lease_seconds=0.1, heartbeat_seconds=60, poll_seconds=0.01
+        ),
+        worker_id="stale",
+    )
+    stale_run = asyncio.create_task(stale.run())
+    await stale_pool.started.wait()
+    await asyncio.sleep(0.2)
+
+    fresh_stats = await NodeWorker(store, fake_loader, fresh_pool, config=config("inference"), worker_id="fresh").run()
+    stale_pool.released.set()
+    while stale.stats["lost"] == 0:
+        await asyncio.sleep(0.01)
+    stale.stop()
+
+    assert fresh_stats == {"processed": 1, "failed": 0, "lost": 0}
+    assert await stale_run == {"processed": 0, "failed": 0, "lost": 1}
+    assert (tmp_path / "video1.txt").read_text(encoding="utf-8") == "fresh"
+    assert sorted(path.name for path in tmp_path.glob("video1*")) == ["video1.txt"]
@@ -0,0 +1,57 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from support.http_server import QuietHandler, QuietServer
+from transcribers.audio import SAMPLE_RATE, write_wav
+from youtube_workers.ydl_pool import YdlPool
+
+PROFILE = {"format": "best"}
+THREADS = 2
+
+
+@pytest.fixture
+def media_url(tmp_path):
+    write_wav(np.zeros(SAMPLE_RATE, dtype=np.float32), tmp_path / "clip.wav")
+    server = QuietServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=tmp_path))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/clip.wav"
+    server.shutdown()
+
+
+def test_instances_are_reused_per_thread_and_profile():
+    pool = YdlPool({"quiet": True})
+    ydl = pool.get("audio", PROFILE)
+
+    assert pool.get("audio", PROFILE) is ydl
+    assert pool.get("video", PROFILE) is not ydl
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(pool.get, "audio", PROFILE).result() is not ydl
+    pool.close()
+
+
+def test_download_reuses_cached_info(media_url, tmp_path):
+    pool = YdlPool({"quiet": True, "noprogress": True})
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        infos = list(
+            executor.map(lambda i: pool.download("audio", PROFILE, media_url, f"{tmp_path}/out_{i}.%(ext)s"), range(4))
+        )
+
+    assert all((tmp_path / f"out_{i}.wav").is_file() for i in range(4))
+    assert len({info["requested_downloads"][0]["filepath"] for info in infos}) == len(infos)
+    assert pool.info_hits + pool.info_misses == len(infos)
+    assert pool.info_misses <= THREADS  # only the first concurrent downloads fetch the metadata
+    pool.close()
+
+
+def test_info_cache_expires(media_url, tmp_path):
+    pool = YdlPool({"quiet": True, "noprogress": True}, info_ttl=0.0)
+    pool.download("audio", PROFILE, media_url, f"{tmp_path}/first.%(ext)s")
+    pool.download("audio", PROFILE, media_url, f"{tmp_path}/second.%(ext)s")
+
+    assert pool.info_hits == 0
+    assert pool.info_misses == len(["first", "second"])
+    pool.close()
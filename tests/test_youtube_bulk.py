@@ -0,0 +1,31 @@
+import pytest
+
+from youtube_workers.youtube_api import VIDEOS_PER_REQUEST
+
+LINKS_AMOUNT = 120
+
+
+@pytest.mark.asyncio
+async def test_get_videos_by_links(youtube_stub, youtube_stub_client):
+    ids = [video["id"] for video in youtube_stub.uploads[:LINKS_AMOUNT]]
+    links = [f"https://www.youtube.com/watch?v={video_id}&pp=abc" for video_id in ids]
+    links.insert(1, f"https://www.youtube.com/shorts/{ids[0]}")
+    wrong = ["https://www.youtube.com/watch?=nothing", "https://www.youtube.com/live/missing_video"]
+    links.extend(wrong)
+
+    videos, failed = await youtube_stub_client.get_videos_by_links(links)
+
+    assert [video.id for video in videos] == ids
+    assert failed == wrong
+    assert youtube_stub.requests["videos"] == -(-LINKS_AMOUNT // VIDEOS_PER_REQUEST)
+
+
+@pytest.mark.asyncio
+async def test_get_video_by_link_single(youtube_stub, youtube_stub_client):
+    video_id = youtube_stub.uploads[0]["id"]
+
+    video = await youtube_stub_client.get_video_by_link(f"https://www.youtube.com/live/{video_id}")
+
+    assert video.id == video_id
+    assert video.title == youtube_stub.uploads[0]["title"]
+    assert await youtube_stub_client.get_video_by_link("https://www.google.com/") is None
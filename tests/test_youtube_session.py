@@ -0,0 +1,52 @@
+import time
+
+import pytest
+from loguru import logger
+
+from youtube_workers.youtube_api import YouTubeClient
+
+CALLS = 10
+
+
+async def timed_lookups(client: YouTubeClient, links: list[str]) -> float:
+    start = time.perf_counter()
+    for link in links:
+        assert await client.get_video_by_link(link) is not None
+    return (time.perf_counter() - start) / len(links)
+
+
+@pytest.mark.asyncio
+async def test_session_reuses_connections(youtube_stub, youtube_stub_client):
+    links = [f"https://www.youtube.com/watch?v={video['id']}" for video in youtube_stub.uploads[:CALLS]]
+
+    latency = await timed_lookups(youtube_stub_client, links)
+
+    logger.info(f"Shared session: {latency * 1000:.2f} ms per call, {len(youtube_stub.connections)} connection(s)")
+    assert youtube_stub.requests["videos"] == CALLS
+    assert len(youtube_stub.connections) == 1
+
+
+@pytest.mark.asyncio
+async def test_session_closed_by_context_manager(youtube_stub):
+    async with YouTubeClient("stub_key", base_url=youtube_stub.base_url) as client:
+        session = client._get_session()
+        await client.get_channel_videos("unknown")
+    assert session.closed
+
+    # the client is reusable after close, a new session is opened lazily
+    links = [f"https://www.youtube.com/watch?v={youtube_stub.uploads[0]['id']}"]
+    assert await timed_lookups(client, links) > 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_fresh_clients_open_new_connections(youtube_stub):
+    links = [f"https://www.youtube.com/watch?v={video['id']}" for video in youtube_stub.uploads[:CALLS]]
+
+    latencies = []
+    for link in links:
+        async with YouTubeClient("stub_key", base_url=youtube_stub.base_url) as client:
+            latencies.append(await timed_lookups(client, [link]))
+
+    logger.info(f"Session per call: {sum(latencies) / CALLS * 1000:.2f} ms per call")
+    assert len(youtube_stub.connections) == CALLS